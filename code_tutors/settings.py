@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+from decimal import Decimal
 from pathlib import Path
 from django.contrib.messages import constants as messages
 
@@ -83,6 +84,17 @@ DATABASES = {
     }
 }
 
+# Caches are shared through the database, so that an invalidation in one process, such as the
+# run_jobs worker, reaches every other. Create the table with: python3 manage.py createcachetable
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'django_cache',
+        # Each user's dashboard takes a few entries, so allow for many more than the default 300
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -142,3 +154,27 @@ REDIRECT_URL_WHEN_LOGGED_IN = 'dashboard'
 MESSAGE_TAGS = {
     messages.ERROR: 'danger',
 }
+
+# Price of one hour of tutoring, used to project invoice amounts
+LESSON_HOURLY_RATE = Decimal('25.00')
+
+# Number of lessons shown on each page of the dashboard and past lessons lists
+LESSON_PAGE_SIZE = 20
+
+# Number of lesson requests shown on each page of the admin request list
+ADMIN_REQUEST_PAGE_SIZE = 50
+
+# How long the counts shown beside the admin request filters are cached for, in seconds
+REQUEST_FACETS_CACHE_SECONDS = 30
+
+# How long the admin dashboard figures are cached for, in seconds
+ADMIN_OVERVIEW_CACHE_SECONDS = 60
+
+# How long each user's dashboard lesson table and invoice badge are cached for, in seconds
+DASHBOARD_CACHE_SECONDS = 600
+
+# Exports of up to this many rows are streamed straight to the browser; larger ones are written to a file by the job worker
+EXPORT_STREAM_ROWS = 10000
+
+# Where the job worker writes the files of large exports
+EXPORT_ROOT = BASE_DIR / 'exports'
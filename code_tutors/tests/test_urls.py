@@ -78,4 +78,57 @@ class TestURLPatterns(SimpleTestCase):
 
     def test_generate_invoice_url(self):
         url = reverse('generate_invoice', kwargs={'lesson_request_id': 1})
-        self.assertEqual(resolve(url).func, views.generate_invoice)
\ No newline at end of file
+        self.assertEqual(resolve(url).func, views.generate_invoice)
+
+    def test_batch_allocate_requests_url(self):
+        url = reverse('batch_allocate_requests')
+        self.assertEqual(resolve(url).func, views.batch_allocate_requests)
+
+    def test_suggest_allocations_url(self):
+        url = reverse('suggest_allocations')
+        self.assertEqual(resolve(url).func, views.suggest_allocations)
+
+    def test_job_status_url(self):
+        url = reverse('job_status', kwargs={'pk': 1})
+        self.assertEqual(resolve(url).func, views.job_status)
+
+    def test_past_lessons_url(self):
+        url = reverse('past_lessons')
+        self.assertEqual(resolve(url).func, views.past_lessons)
+
+    def test_lesson_calendar_url(self):
+        url = reverse('lesson_calendar')
+        self.assertEqual(resolve(url).func, views.lesson_calendar)
+
+    def test_calendar_subscription_url(self):
+        url = reverse('calendar_subscription')
+        self.assertEqual(resolve(url).func, views.calendar_subscription)
+
+    def test_calendar_feed_url(self):
+        url = reverse('calendar_feed', kwargs={'token': 'abc'})
+        self.assertEqual(resolve(url).func, views.calendar_feed)
+
+    def test_api_lessons_url(self):
+        url = reverse('api_lessons')
+        self.assertEqual(resolve(url).func, views.api_lessons)
+
+    def test_api_lesson_requests_url(self):
+        url = reverse('api_lesson_requests')
+        self.assertEqual(resolve(url).func, views.api_lesson_requests)
+
+    def test_api_invoices_url(self):
+        url = reverse('api_invoices')
+        self.assertEqual(resolve(url).func, views.api_invoices)
+
+    def test_export_data_url(self):
+        url = reverse('export_data', kwargs={'name': 'invoices', 'format': 'csv'})
+        self.assertEqual(url, '/exports/invoices.csv')
+        self.assertEqual(resolve(url).func, views.export_data)
+
+    def test_bulk_invoice_action_url(self):
+        url = reverse('bulk_invoice_action')
+        self.assertEqual(resolve(url).func, views.bulk_invoice_action)
+
+    def test_generate_term_invoices_url(self):
+        url = reverse('generate_term_invoices')
+        self.assertEqual(resolve(url).func, views.generate_term_invoices)
@@ -24,6 +24,10 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('', views.home, name='home'),
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('lessons/past/', views.past_lessons, name='past_lessons'),
+    path('lessons/calendar/', views.lesson_calendar, name='lesson_calendar'),
+    path('lessons/calendar/subscribe/', views.calendar_subscription, name='calendar_subscription'),
+    path('calendar/<str:token>.ics', views.calendar_feed, name='calendar_feed'),
     path('log_in/', views.LogInView.as_view(), name='log_in'),
     path('log_out/', views.log_out, name='log_out'),
     path('password/', views.PasswordView.as_view(), name='password'),
@@ -39,8 +43,19 @@ urlpatterns = [
     # Admin views
     path('lesson_requests/admin/', views.admin_view_requests, name='admin_view_requests'),
     path('lesson_requests/<int:pk>/update-status/', views.update_request_status, name='update_request_status'),
+    path('lesson_requests/batch-allocate/', views.batch_allocate_requests, name='batch_allocate_requests'),
+    path('lesson_requests/suggest-allocations/', views.suggest_allocations, name='suggest_allocations'),
+    path('exports/<str:name>.<str:format>', views.export_data, name='export_data'),
+    path('exports/jobs/<int:pk>/download', views.export_download, name='export_download'),
+    path('jobs/<int:pk>/', views.job_status, name='job_status'),
+    # Read-only JSON API
+    path('api/lessons/', views.api_lessons, name='api_lessons'),
+    path('api/lesson-requests/', views.api_lesson_requests, name='api_lesson_requests'),
+    path('api/invoices/', views.api_invoices, name='api_invoices'),
     path('cancel_lesson/<int:lesson_id>/', views.cancel_lesson, name='cancel_lesson'),
     path('toggle-invoice-paid/<int:invoice_id>/', views.toggle_invoice_paid, name='toggle_invoice_paid'),
+    path('invoices/bulk/', views.bulk_invoice_action, name='bulk_invoice_action'),
+    path('invoices/generate/', views.generate_term_invoices, name='generate_term_invoices'),
     path('generate_invoice/<int:lesson_request_id>/', views.generate_invoice, name='generate_invoice'),
 ] 
 urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
@@ -1,6 +1,38 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User
+from .models import User, TermCalendar, TermExclusion, Job, InvoiceSummary, PricingRule
+
+
+class TermExclusionInline(admin.TabularInline):
+    model = TermExclusion
+    extra = 1
+
+
+@admin.register(TermCalendar)
+class TermCalendarAdmin(admin.ModelAdmin):
+    list_display = ('term', 'year', 'start_date', 'end_date')
+    list_filter = ('term', 'year')
+    inlines = [TermExclusionInline]
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'progress', 'attempts', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('name', 'status')
+    readonly_fields = ('attempts', 'started_at', 'finished_at')
+
+
+@admin.register(InvoiceSummary)
+class InvoiceSummaryAdmin(admin.ModelAdmin):
+    list_display = ('student', 'unpaid_count')
+    readonly_fields = ('student', 'unpaid_count')
+
+
+@admin.register(PricingRule)
+class PricingRuleAdmin(admin.ModelAdmin):
+    list_display = ('language', 'duration', 'min_lessons', 'hourly_rate', 'discount_percent')
+    list_filter = ('language', 'duration')
+
 
 # Register your models here.
 admin.site.register(User, UserAdmin)
@@ -0,0 +1,351 @@
+"""Materialise lesson requests into allocated lessons."""
+from collections import Counter, defaultdict
+from datetime import datetime
+from django.db import transaction
+from django.utils.timezone import now
+from .dashboard_cache import invalidate_dashboards
+from .matching import to_minutes
+from .pricing import projected_invoice_amount
+from .models import User, Schedule, LessonRequest, AllocatedLesson
+from .recurrence import (
+    bulk_lesson_request_dates, clear_term_calendar_cache, lesson_request_dates, refresh_term_calendars,
+)
+
+
+def parse_start_time(value):
+    """Parse an HH:MM string into a time, raising ValueError if it is invalid."""
+
+    return datetime.strptime(value, '%H:%M').time()
+
+
+def format_dates(dates):
+    """Return a comma separated list of dates for messages."""
+
+    return ', '.join(lesson_date.strftime('%Y-%m-%d') for lesson_date in dates)
+
+
+def _to_id(value):
+    """Return value as an integer primary key, or None if it is not one."""
+
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def sync_allocated_lessons(plans):
+    """
+    Bring the allocated lessons of several lesson requests in line with a plan.
+
+    Each plan is a (lesson_request, start_time, dates) tuple; occurrence n of the
+    request should fall on dates[n - 1] at start_time, taught by the request's
+    tutor. Existing lessons are matched with the plan by date instead of being
+    recreated: lessons on a planned date keep their id and have any changed
+    fields, their occurrence number included, applied with bulk UPDATEs,
+    lessons on dates no longer in the plan are removed with one DELETE, and
+    only the dates that are new are inserted. A date dropped early in a term,
+    say for a new exclusion, therefore renumbers the later lessons without
+    replacing them. Returns the number of lessons created, updated and deleted.
+    """
+
+    plans = list(plans)
+    desired = {}
+    for lesson_request, start_time, dates in plans:
+        for occurrence, lesson_date in enumerate(dates, start=1):
+            desired[(lesson_request.pk, lesson_date)] = (lesson_request, start_time, occurrence)
+
+    stale = []
+    changed = []
+    renumbered = []
+    kept = set()
+    highest_occurrence = max((len(dates) for _, _, dates in plans), default=0)
+    affected_users = set()
+    for lesson_request, _, _ in plans:
+        affected_users.update((lesson_request.student_id_id, lesson_request.tutor_id_id))
+    for lesson in AllocatedLesson.objects.filter(lesson_request__in=[plan[0] for plan in plans]):
+        affected_users.update((lesson.student_id_id, lesson.tutor_id_id))
+        highest_occurrence = max(highest_occurrence, lesson.occurrence)
+        key = (lesson.lesson_request_id, lesson.date)
+        if key not in desired or key in kept:
+            stale.append(lesson.id)
+            continue
+        kept.add(key)
+        lesson_request, start_time, occurrence = desired[key]
+        if lesson.occurrence != occurrence:
+            renumbered.append(lesson)
+        fields = {
+            'occurrence': occurrence,
+            'time': start_time,
+            'language': lesson_request.language,
+            'student_id_id': lesson_request.student_id_id,
+            'tutor_id_id': lesson_request.tutor_id_id,
+        }
+        if any(getattr(lesson, field) != value for field, value in fields.items()):
+            for field, value in fields.items():
+                setattr(lesson, field, value)
+            # bulk_update does not apply auto_now, and calendar feeds rely on updated_at changing
+            lesson.updated_at = now()
+            changed.append(lesson)
+
+    created = [
+        AllocatedLesson(
+            lesson_request=lesson_request,
+            occurrence=occurrence,
+            date=lesson_date,
+            time=start_time,
+            language=lesson_request.language,
+            student_id_id=lesson_request.student_id_id,
+            tutor_id_id=lesson_request.tutor_id_id,
+        )
+        for (_, lesson_date), (lesson_request, start_time, occurrence) in desired.items()
+        if (lesson_request.pk, lesson_date) not in kept
+    ]
+
+    # Bulk queries send no signals, so the dashboards of everyone involved are invalidated here
+    if stale or changed or created:
+        invalidate_dashboards(affected_users)
+
+    with transaction.atomic(savepoint=False):
+        if stale:
+            AllocatedLesson.objects.filter(id__in=stale).delete()
+        if renumbered:
+            # Move renumbered lessons past every occurrence in use first, so that no
+            # (lesson_request, occurrence) pair is ever held by two rows at once
+            AllocatedLesson.objects.bulk_update(
+                [AllocatedLesson(id=lesson.id, occurrence=highest_occurrence + lesson.occurrence)
+                 for lesson in renumbered],
+                ['occurrence'],
+            )
+        if changed:
+            AllocatedLesson.objects.bulk_update(
+                changed, ['occurrence', 'time', 'language', 'student_id', 'tutor_id', 'updated_at']
+            )
+        if created:
+            AllocatedLesson.objects.bulk_create(created)
+
+    return {'created': len(created), 'updated': len(changed), 'deleted': len(stale)}
+
+
+def find_conflicts(proposals, exclude_lesson_requests=()):
+    """
+    Return the dates on which each proposed allocation would double-book its tutor.
+
+    Each proposal is a (tutor_id, dates, start_time, duration) tuple. Existing
+    lessons are loaded with one range query over the (tutor_id, date, time)
+    index, ignoring lessons belonging to exclude_lesson_requests (the requests
+    being reallocated). Proposals are checked in order and each conflict-free
+    proposal is treated as booked for the ones after it. Returns one sorted list
+    of conflicting dates per proposal.
+    """
+
+    proposals = list(proposals)
+    all_dates = [lesson_date for _, dates, _, _ in proposals for lesson_date in dates]
+    if not all_dates:
+        return [[] for _ in proposals]
+
+    latest_end = max(to_minutes(start_time) + duration for _, _, start_time, duration in proposals)
+    existing = (
+        AllocatedLesson.objects
+        .filter(tutor_id__in={tutor_id for tutor_id, _, _, _ in proposals},
+                date__range=(min(all_dates), max(all_dates)))
+        .exclude(lesson_request__in=exclude_lesson_requests)
+        .values_list('tutor_id', 'date', 'time', 'lesson_request__duration')
+    )
+    booked = defaultdict(list)
+    for tutor_id, lesson_date, lesson_time, duration in existing:
+        start = to_minutes(lesson_time)
+        if start < latest_end:
+            booked[(tutor_id, lesson_date)].append((start, start + duration))
+
+    conflicts = []
+    for tutor_id, dates, start_time, duration in proposals:
+        start = to_minutes(start_time)
+        end = start + duration
+        conflicting = sorted(
+            lesson_date for lesson_date in dates
+            if any(start < booked_end and booked_start < end
+                   for booked_start, booked_end in booked.get((tutor_id, lesson_date), ()))
+        )
+        if not conflicting:
+            for lesson_date in dates:
+                booked[(tutor_id, lesson_date)].append((start, end))
+        conflicts.append(conflicting)
+    return conflicts
+
+
+def within_availability(proposals):
+    """
+    Return whether each proposed lesson falls inside one of its tutor's Schedule windows.
+
+    Each proposal is a (tutor_id, day_of_the_week, start_time, duration) tuple.
+    The windows of every tutor involved are loaded with a single query.
+    """
+
+    proposals = list(proposals)
+    windows = defaultdict(list)
+    for user_id, day, start_time, end_time in Schedule.objects.filter(
+        user_id__in={tutor_id for tutor_id, _, _, _ in proposals}
+    ).values_list('user_id', 'day_of_week', 'start_time', 'end_time'):
+        windows[(user_id, day)].append((to_minutes(start_time), to_minutes(end_time)))
+
+    return [
+        any(window_start <= to_minutes(start_time) and to_minutes(start_time) + duration <= window_end
+            for window_start, window_end in windows.get((tutor_id, day), ()))
+        for tutor_id, day, start_time, duration in proposals
+    ]
+
+
+def preview_allocation(lesson_request, tutor, start_time):
+    """
+    Work out what allocating lesson_request to tutor at start_time would produce.
+
+    Nothing is written: the result is a dict with the occurrence dates, the
+    dates that clash with the tutor's existing lessons, whether the lessons fall
+    inside the tutor's availability, and the projected invoice amount. Raises
+    ValueError if the request's term, day or frequency is invalid.
+    """
+
+    # Another process may have changed the term calendars since this one loaded them
+    refresh_term_calendars()
+    dates = lesson_request_dates(lesson_request)
+    return {
+        'dates': dates,
+        'conflicts': find_conflicts(
+            [(tutor.id, dates, start_time, lesson_request.duration)],
+            exclude_lesson_requests=[lesson_request],
+        )[0],
+        'available': within_availability(
+            [(tutor.id, lesson_request.day_of_the_week, start_time, lesson_request.duration)]
+        )[0],
+        'amount': projected_invoice_amount(lesson_request, len(dates)),
+    }
+
+
+def allocate_lesson_requests(assignments, chunk_size=None, start=0, on_chunk=None):
+    """
+    Allocate many lesson requests at once.
+
+    Each assignment is a (lesson_request_id, tutor_id, start_time) tuple, where
+    start_time is an HH:MM string. By default everything happens in one
+    transaction with the rows involved locked: every assignment is validated
+    before anything is written, and the valid ones are then saved together
+    using bulk queries. Assignments that would double-book a tutor, against existing
+    lessons or earlier assignments in the same batch, fail. Returns one report
+    dict per assignment, in order, with the keys lesson_request_id, success,
+    message, lessons (the number created) and conflicts (the clashing dates).
+
+    A large batch can be split by chunk_size, each chunk then running in its
+    own transaction; a request assigned more than once anywhere in the batch
+    is still rejected. on_chunk(report) is called inside each chunk's
+    transaction with the reports so far, so a caller can record them in the
+    same commit, and start skips the assignments a previous run committed.
+    Only the reports of the assignments from start on are returned.
+    """
+
+    assignments = [
+        (_to_id(lesson_request_id), _to_id(tutor_id), start_time)
+        for lesson_request_id, tutor_id, start_time in assignments
+    ]
+    assignment_counts = Counter(lesson_request_id for lesson_request_id, _, _ in assignments)
+    chunk_size = chunk_size or max(len(assignments) - start, 1)
+    report = []
+    for chunk_start in range(start, len(assignments), chunk_size):
+        with transaction.atomic():
+            report += _allocate_locked(assignments[chunk_start:chunk_start + chunk_size], assignment_counts)
+            if on_chunk is not None:
+                on_chunk(report)
+    return report
+
+
+def _allocate_locked(assignments, assignment_counts):
+    """
+    Validate and apply assignments inside the caller's transaction.
+
+    assignment_counts counts how often each lesson request is assigned in
+    the whole batch, of which assignments may be only a part.
+
+    The lesson requests and tutors involved are locked, in primary key order
+    so that concurrent batches cannot deadlock, before anything is checked;
+    another batch touching the same rows waits until this one has committed
+    and then sees its allocations and lessons.
+    """
+
+    lesson_requests = LessonRequest.objects.select_for_update().order_by('pk').in_bulk(
+        [lesson_request_id for lesson_request_id, _, _ in assignments if lesson_request_id is not None]
+    )
+    tutors = User.objects.filter(role='tutor').select_for_update().order_by('pk').in_bulk(
+        [tutor_id for _, tutor_id, _ in assignments if tutor_id is not None]
+    )
+
+    # Read the term calendars afresh, as this may run in a worker that has not seen the latest changes
+    clear_term_calendar_cache()
+
+    report = []
+    valid = []
+    candidates = []
+    allocated = []
+    plans = []
+    for lesson_request_id, tutor_id, start_time in assignments:
+        result = {'lesson_request_id': lesson_request_id, 'success': False, 'message': '', 'lessons': 0, 'conflicts': []}
+        report.append(result)
+
+        lesson_request = lesson_requests.get(lesson_request_id)
+        if lesson_request is None:
+            result['message'] = "Lesson request does not exist."
+            continue
+        if assignment_counts[lesson_request_id] > 1:
+            result['message'] = "Lesson request is assigned more than once."
+            continue
+        if lesson_request.status == 'allocated':
+            result['message'] = "Lesson request is already allocated."
+            continue
+        tutor = tutors.get(tutor_id)
+        if tutor is None:
+            result['message'] = "Selected user is not a tutor."
+            continue
+        try:
+            parsed_start_time = parse_start_time(start_time)
+        except (TypeError, ValueError):
+            result['message'] = "Start time must be in HH:MM format."
+            continue
+
+        valid.append((result, lesson_request, tutor, parsed_start_time))
+
+    date_errors = {}
+    dates_by_request = bulk_lesson_request_dates([lesson_request for _, lesson_request, _, _ in valid], errors=date_errors)
+    for result, lesson_request, tutor, start_time in valid:
+        if lesson_request.pk in date_errors:
+            result['message'] = f"{date_errors[lesson_request.pk]}."
+            continue
+        candidates.append((result, lesson_request, tutor, start_time, dates_by_request[lesson_request.pk]))
+
+    conflicts = find_conflicts(
+        [(tutor.id, dates, start_time, lesson_request.duration)
+         for _, lesson_request, tutor, start_time, dates in candidates],
+        exclude_lesson_requests=[lesson_request for _, lesson_request, _, _, _ in candidates],
+    )
+    available = within_availability(
+        [(tutor.id, lesson_request.day_of_the_week, start_time, lesson_request.duration)
+         for _, lesson_request, tutor, start_time, _ in candidates]
+    )
+    for (result, lesson_request, tutor, start_time, dates), conflicting, is_available in zip(candidates, conflicts, available):
+        if conflicting:
+            result['message'] = f"{tutor.username} is already booked on {format_dates(conflicting)}."
+            result['conflicts'] = conflicting
+            continue
+
+        lesson_request.tutor_id = tutor
+        lesson_request.status = 'allocated'
+        allocated.append(lesson_request)
+        plans.append((lesson_request, start_time, dates))
+        result['success'] = True
+        result['message'] = f"Allocated to {tutor.username}."
+        if not is_available:
+            result['message'] += " This is outside the tutor's availability."
+        result['lessons'] = len(dates)
+
+    if allocated:
+        LessonRequest.objects.bulk_update(allocated, ['tutor_id', 'status'])
+        sync_allocated_lessons(plans)
+
+    return report
@@ -0,0 +1,122 @@
+"""Read-only JSON listings of a user's lessons, lesson requests and invoices."""
+from hashlib import sha256
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from .pagination import keyset_page
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+def _full_name(first_name, last_name):
+    return f"{first_name} {last_name}" if first_name is not None else None
+
+
+# Each resource maps its field names to the columns they are read from and,
+# for fields built from more than one column, a function that combines them.
+LESSON_FIELDS = {
+    'id': (('id',), None),
+    'lesson_request_id': (('lesson_request_id',), None),
+    'occurrence': (('occurrence',), None),
+    'date': (('date',), None),
+    'time': (('time',), None),
+    'language': (('language',), None),
+    'duration': (('lesson_request__duration',), None),
+    'student_id': (('student_id',), None),
+    'student_name': (('student_id__first_name', 'student_id__last_name'), _full_name),
+    'tutor_id': (('tutor_id',), None),
+    'tutor_name': (('tutor_id__first_name', 'tutor_id__last_name'), _full_name),
+    'updated_at': (('updated_at',), None),
+}
+
+LESSON_REQUEST_FIELDS = {
+    'id': (('id',), None),
+    'language': (('language',), None),
+    'term': (('term',), None),
+    'day_of_the_week': (('day_of_the_week',), None),
+    'frequency': (('frequency',), None),
+    'duration': (('duration',), None),
+    'description': (('description',), None),
+    'status': (('status',), None),
+    'date_created': (('date_created',), None),
+    'student_id': (('student_id',), None),
+    'student_name': (('student_id__first_name', 'student_id__last_name'), _full_name),
+    'tutor_id': (('tutor_id',), None),
+    'tutor_name': (('tutor_id__first_name', 'tutor_id__last_name'), _full_name),
+}
+
+INVOICE_FIELDS = {
+    'id': (('id',), None),
+    'lesson_request_id': (('lesson_request_id',), None),
+    'language': (('lesson_request__language',), None),
+    'student_id': (('lesson_request__student_id',), None),
+    'student_name': (('lesson_request__student_id__first_name', 'lesson_request__student_id__last_name'), _full_name),
+    'tutor_id': (('lesson_request__tutor_id',), None),
+    'tutor_name': (('lesson_request__tutor_id__first_name', 'lesson_request__tutor_id__last_name'), _full_name),
+    'amount': (('amount',), None),
+    'is_paid': (('is_paid',), None),
+    'created_at': (('created_at',), None),
+}
+
+
+def _error(message):
+    return JsonResponse({'error': message}, status=400)
+
+
+def spec_columns(spec, names):
+    """Return the set of columns to select for the named fields of a resource."""
+
+    return {column for name in names for column in spec[name][0]}
+
+
+def serialize(row, spec, names):
+    """Return the named fields of a values() row as a dict."""
+
+    item = {}
+    for name in names:
+        columns, combine = spec[name]
+        item[name] = combine(*(row[column] for column in columns)) if combine else row[columns[0]]
+    return item
+
+
+def api_listing(request, queryset, spec, ordering):
+    """
+    Return a JSON page of queryset for an API listing.
+
+    The query string may give fields, a comma-separated subset of the
+    resource's fields; limit, the page size (at most MAX_LIMIT); and after,
+    the cursor of the page to continue from. Only the columns behind the
+    requested fields are selected, joins included, in a single query, and
+    the page is fetched by keyset on ordering. The response carries an ETag,
+    so a client polling an unchanged page gets an empty 304.
+    """
+
+    requested = request.GET.get('fields')
+    names = [name for name in requested.split(',') if name] if requested else list(spec)
+    unknown = [name for name in names if name not in spec]
+    if unknown:
+        return _error(f"Unknown fields: {', '.join(unknown)}")
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        return _error("limit must be a number")
+    limit = max(1, min(limit, MAX_LIMIT))
+
+    columns = spec_columns(spec, names) | set(ordering)
+    try:
+        rows, next_cursor = keyset_page(queryset.values(*columns), ordering, request.GET.get('after'), size=limit)
+    except ValueError:
+        return _error("Invalid cursor")
+
+    next_url = None
+    if next_cursor:
+        params = request.GET.copy()
+        params['after'] = next_cursor
+        next_url = request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+    response = JsonResponse({'results': [serialize(row, spec, names) for row in rows], 'next': next_url})
+
+    etag = quote_etag(sha256(response.content).hexdigest()[:32])
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return get_conditional_response(request, etag=etag, response=response)
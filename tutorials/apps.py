@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TutorialsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tutorials'
+
+    def ready(self):
+        from . import signals  # Connect signal handlers
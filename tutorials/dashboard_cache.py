@@ -0,0 +1,100 @@
+"""Per-user cache of the parts of the dashboard that are expensive to build."""
+from functools import partial
+from hashlib import sha256
+from threading import local
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from .versions import current_version
+
+# Per thread, the bump due when the current transaction commits, and the users
+# bumped in it since their version was last read
+_pending = local()
+
+
+def _version_key(user_id):
+    return f'dashboard_version:{user_id}'
+
+
+def dashboard_cache_version(user_id):
+    """
+    Return the current version of a user's cached dashboard.
+
+    Cached fragments are stored under keys that include the version, so
+    bumping it makes every fragment of that user's dashboard stale at once.
+    """
+
+    getattr(_pending, 'unread', {}).pop(user_id, None)
+    return current_version(_version_key(user_id))
+
+
+def _bump_versions(user_ids):
+    # A deleted version is replaced by a new one on next use, and deleting them all is a single query
+    cache.delete_many([_version_key(user_id) for user_id in user_ids])
+
+
+def _bumped_since_read(user_id, savepoints):
+    """Return whether a user was bumped in the open savepoints and not read since."""
+
+    bumped_in = _pending.unread.get(user_id)
+    return bumped_in is not None and savepoints[:len(bumped_in)] == bumped_in
+
+
+def invalidate_dashboards(user_ids):
+    """
+    Discard the cached dashboards of the given users.
+
+    The versions are bumped straight away and again once the current
+    transaction commits, so that a dashboard rendered from data read before
+    the commit is not served afterwards. The cache is shared through the
+    database, so this reaches every process, the run_jobs worker included.
+    Within a transaction, a user who was bumped and whose dashboard has not
+    been read since is only bumped again on commit, so deleting many lessons
+    one signal at a time costs no more than deleting one.
+    """
+
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        _bump_versions(user_ids)
+        return
+    bump = getattr(_pending, 'bump', None)
+    # A commit or rollback drops the callback, so a new one is needed for this transaction
+    if bump is None or not any(func is bump for _, func, _ in connection.run_on_commit):
+        bump = _pending.bump = partial(_bump_versions, set())
+        _pending.unread = {}
+        transaction.on_commit(bump)
+    bump.args[0].update(user_ids)
+    # A bump made in a savepoint that was since rolled back no longer counts
+    savepoints = tuple(connection.savepoint_ids)
+    stale = {user_id for user_id in user_ids if not _bumped_since_read(user_id, savepoints)}
+    if stale:
+        _bump_versions(stale)
+        _pending.unread.update(dict.fromkeys(stale, savepoints))
+
+
+def csrf_cache_key(request):
+    """
+    Return a short digest of the request's CSRF secret.
+
+    Fragments with forms in them embed a CSRF token, which only stays valid
+    while the user keeps the same secret (it is rotated on log in), so the
+    digest is made part of the fragment's cache key.
+    """
+
+    return sha256(request.META.get('CSRF_COOKIE', '').encode()).hexdigest()[:16]
+
+
+def cached_dashboard_fragment(user_id, name, compute, *parts):
+    """
+    Return a cached part of a user's dashboard, calling compute() to build it when it is missing.
+
+    parts are any further values the fragment depends on, such as the page
+    being shown; they are hashed into the cache key.
+    """
+
+    digest = sha256(':'.join(str(part) for part in parts).encode()).hexdigest()[:16]
+    key = f'dashboard:{user_id}:{dashboard_cache_version(user_id)}:{name}:{digest}'
+    return cache.get_or_set(key, compute, settings.DASHBOARD_CACHE_SECONDS)
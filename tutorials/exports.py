@@ -0,0 +1,115 @@
+"""Streaming CSV and NDJSON exports of lesson requests, lessons and invoices."""
+import csv
+import json
+import os
+from django.core.serializers.json import DjangoJSONEncoder
+from .api import LESSON_FIELDS, LESSON_REQUEST_FIELDS, INVOICE_FIELDS, serialize, spec_columns
+from .models import LessonRequest, AllocatedLesson, Invoice
+
+CHUNK_SIZE = 2000
+
+# Each export's rows, fields and order. The fields are the same as the API's.
+EXPORTS = {
+    'lesson_requests': (LessonRequest.objects.all, LESSON_REQUEST_FIELDS, ('id',)),
+    'lessons': (AllocatedLesson.objects.all, LESSON_FIELDS, ('date', 'time', 'id')),
+    'invoices': (Invoice.objects.all, INVOICE_FIELDS, ('id',)),
+}
+
+
+def export_row_count(name):
+    """Return how many rows an export has."""
+
+    return EXPORTS[name][0]().count()
+
+
+def export_rows(name):
+    """
+    Yield the rows of an export as dicts, one at a time.
+
+    Only the exported columns are selected, with the student and tutor
+    names joined in, and the rows are read with a chunked iterator so the
+    export runs in constant memory however many rows there are.
+    """
+
+    queryset, spec, ordering = EXPORTS[name]
+    names = list(spec)
+    rows = queryset().order_by(*ordering).values(*spec_columns(spec, names))
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        yield serialize(row, spec, names)
+
+
+# Spreadsheets read a cell starting with one of these as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _neutralise(value):
+    """Return a CSV cell with a leading quote if a spreadsheet would otherwise read it as a formula."""
+
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+class _Echo:
+    """A file-like object that hands back what is written to it, for csv.writer to format single rows."""
+
+    def write(self, value):
+        return value
+
+
+def csv_export(name):
+    """
+    Yield an export as CSV lines, starting with a header.
+
+    Text that a spreadsheet would run as a formula, such as a description
+    starting with "=", is prefixed with a quote so that it is shown as typed.
+    """
+
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORTS[name][1])
+    for row in export_rows(name):
+        yield writer.writerow([_neutralise(value) for value in row.values()])
+
+
+def ndjson_export(name):
+    """Yield an export as newline-delimited JSON, one object per row."""
+
+    for row in export_rows(name):
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+# Each format's generator and content type
+FORMATS = {
+    'csv': (csv_export, 'text/csv; charset=utf-8'),
+    'ndjson': (ndjson_export, 'application/x-ndjson'),
+}
+
+
+def write_export(name, format, path, progress=None):
+    """
+    Write an export to a file at path, returning the number of rows written.
+
+    The export is written to a temporary file beside path and moved into
+    place once it is complete, so path never holds a partial export.
+    progress, if given, is called as progress(done, total) after every
+    CHUNK_SIZE rows.
+    """
+
+    export, _ = FORMATS[format]
+    total = export_row_count(name)
+    lines = export(name)
+    if format == 'csv':
+        # The header is not a row
+        header = next(lines)
+    partial = f'{path}.partial'
+    rows = 0
+    with open(partial, 'w', newline='', encoding='utf-8') as output:
+        if format == 'csv':
+            output.write(header)
+        for line in lines:
+            output.write(line)
+            rows += 1
+            if progress is not None and rows % CHUNK_SIZE == 0:
+                progress(rows, total)
+    os.replace(partial, path)
+    return rows
@@ -195,3 +195,34 @@ class InvoiceForm(forms.ModelForm):
             'lesson_request': forms.HiddenInput(),
             'is_paid': forms.CheckboxInput(),
         }
+
+
+class LessonRequestFilterForm(forms.Form):
+    """Filters and search for the admin lesson request list."""
+
+    q = forms.CharField(required=False, label='Search', widget=forms.TextInput(
+        attrs={'class': 'form-control', 'placeholder': 'Description or student name'}))
+    status = forms.MultipleChoiceField(required=False, widget=forms.CheckboxSelectMultiple, choices=[
+        ('allocated', 'Allocated'),
+        ('unallocated', 'Unallocated'),
+    ])
+    invoice = forms.MultipleChoiceField(required=False, widget=forms.CheckboxSelectMultiple, choices=[
+        ('paid', 'Paid'),
+        ('unpaid', 'Not Paid'),
+        ('invoice_generated', 'Invoice Generated'),
+        ('no_invoice_generated', 'No Invoice Generated'),
+    ])
+    language = forms.MultipleChoiceField(required=False, widget=forms.CheckboxSelectMultiple,
+                                         choices=LessonRequest.LANGUAGE_CHOICES)
+    term = forms.MultipleChoiceField(required=False, widget=forms.CheckboxSelectMultiple,
+                                     choices=LessonRequest.TERM_CHOICES)
+    tutor = forms.ModelMultipleChoiceField(required=False, queryset=User.objects.filter(role='tutor'),
+                                           widget=forms.SelectMultiple(attrs={'class': 'form-control'}))
+
+    def show_counts(self, counts):
+        """Add the number of requests each status and invoice option matches to its label."""
+
+        for name in ('status', 'invoice'):
+            self.fields[name].choices = [
+                (value, f'{label} ({counts[value]})') for value, label in self.fields[name].choices
+            ]
@@ -1,6 +1,7 @@
 from django.conf import settings
 from django.shortcuts import redirect
 from django.core.exceptions import PermissionDenied
+from django.http import JsonResponse
 
 def login_prohibited(view_function):
     """Decorator for view functions that redirect users away if they are logged in."""
@@ -35,3 +36,11 @@ def is_student(function):
             raise PermissionDenied  # Redirect to home or a custom error page
         return function(request, *args, **kwargs)
     return wrap
+
+def api_login_required(function):
+    """Decorator for API views that answers anonymous requests with a 401 JSON error instead of a redirect."""
+    def wrap(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': "Authentication required."}, status=401)
+        return function(request, *args, **kwargs)
+    return wrap
@@ -0,0 +1,84 @@
+"""iCalendar (RFC 5545) feeds of allocated lessons."""
+from datetime import datetime, timedelta, timezone
+
+PRODUCT_ID = '-//Code Tutors//Lessons//EN'
+CHUNK_SIZE = 500
+
+
+def escape_text(value):
+    """Escape a value for use in an iCalendar TEXT property."""
+
+    return (
+        str(value).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def fold_line(line):
+    """Fold a content line into lines of at most 75 octets, as RFC 5545 requires."""
+
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    limit = 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        # Never split a multi-byte UTF-8 character
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode())
+        encoded = encoded[cut:]
+        limit = 74  # Continuation lines start with a space
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _format_utc(value):
+    return value.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def lesson_event(lesson, domain):
+    """Return the VEVENT lines for an allocated lesson, with its request, student and tutor loaded."""
+
+    lesson_request = lesson.lesson_request
+    start = datetime.combine(lesson.date, lesson.time)
+    end = start + timedelta(minutes=lesson_request.duration)
+    student = lesson_request.student_id
+    tutor = lesson_request.tutor_id
+    summary = f"{lesson_request.language} lesson"
+    if tutor is not None:
+        description = f"{student.first_name} {student.last_name} with {tutor.first_name} {tutor.last_name}"
+    else:
+        description = f"{student.first_name} {student.last_name}"
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:lesson-{lesson.pk}@{domain}',
+        f'DTSTAMP:{_format_utc(lesson.updated_at)}',
+        # Lesson times are wall-clock times, so they are written as floating local times
+        f'DTSTART:{start.strftime("%Y%m%dT%H%M%S")}',
+        f'DTEND:{end.strftime("%Y%m%dT%H%M%S")}',
+        f'SUMMARY:{escape_text(summary)}',
+        f'DESCRIPTION:{escape_text(description)}',
+        'END:VEVENT',
+    ]
+    return ''.join(fold_line(line) for line in lines)
+
+
+def lesson_feed(lessons, name, domain):
+    """
+    Yield an iCalendar document of lessons, a piece at a time.
+
+    The lessons are read with a chunked iterator, so a feed with years of
+    history is never held in memory at once.
+    """
+
+    yield ''.join(fold_line(line) for line in (
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODUCT_ID}',
+        'CALSCALE:GREGORIAN',
+        f'X-WR-CALNAME:{escape_text(name)}',
+    ))
+    for lesson in lessons.iterator(chunk_size=CHUNK_SIZE):
+        yield lesson_event(lesson, domain)
+    yield fold_line('END:VCALENDAR')
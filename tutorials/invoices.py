@@ -0,0 +1,266 @@
+"""Per-student unpaid invoice counts, maintained alongside the invoices themselves."""
+from collections import Counter, defaultdict
+from datetime import timezone
+from django.db import connections, transaction
+from django.db.models import Count, F, Q
+from .dashboard_cache import invalidate_dashboards
+from .models import User, LessonRequest, Invoice, InvoiceSummary
+from .pricing import invoice_amount, load_pricing_rules
+from .recurrence import DEFAULT_TERMS, get_term_creation_range, refresh_term_calendars
+
+
+def count_unpaid_invoices(student_ids):
+    """Return a dict of the unpaid invoice count of each student, counted from the invoices."""
+
+    counts = dict(
+        Invoice.objects.filter(is_paid=False, lesson_request__student_id__in=student_ids)
+        .values_list('lesson_request__student_id')
+        .annotate(count=Count('id'))
+    )
+    return {student_id: counts.get(student_id, 0) for student_id in student_ids}
+
+
+def unpaid_invoice_count(student):
+    """
+    Return a student's unpaid invoice count from their summary row.
+
+    The row is created from the invoices the first time it is needed.
+    """
+
+    try:
+        return InvoiceSummary.objects.values_list('unpaid_count', flat=True).get(student=student)
+    except InvoiceSummary.DoesNotExist:
+        count = count_unpaid_invoices([student.pk])[student.pk]
+        summary, _ = InvoiceSummary.objects.get_or_create(student=student, defaults={'unpaid_count': count})
+        return summary.unpaid_count
+
+
+def adjust_unpaid_invoices(deltas):
+    """
+    Apply changes to students' unpaid invoice counts.
+
+    deltas maps student ids to the change in their count. Students whose
+    counts change by the same amount share a single relative UPDATE, so
+    concurrent adjustments do not overwrite each other. Students without a
+    summary row are skipped; their row is counted from scratch when it is
+    first read.
+    """
+
+    students_by_delta = defaultdict(list)
+    for student_id, delta in deltas.items():
+        if delta:
+            students_by_delta[delta].append(student_id)
+    for delta, student_ids in students_by_delta.items():
+        InvoiceSummary.objects.filter(student_id__in=student_ids).update(unpaid_count=F('unpaid_count') + delta)
+
+
+def invoice_deltas(before, after):
+    """
+    Return the change in unpaid invoice counts when invoices change state.
+
+    before and after are lists of (student_id, is_paid) pairs for the
+    invoices' previous and new states, with None for an invoice that did not
+    exist or was not linked to a lesson request.
+    """
+
+    deltas = Counter()
+    for state in before:
+        if state is not None and not state[1]:
+            deltas[state[0]] -= 1
+    for state in after:
+        if state is not None and not state[1]:
+            deltas[state[0]] += 1
+    return deltas
+
+
+def set_invoices_paid(invoice_ids, is_paid):
+    """
+    Mark invoices paid or unpaid with a single UPDATE, returning how many changed.
+
+    A set-based update sends no signals, so the students' unpaid invoice
+    counts and dashboards are brought up to date here, in the same
+    transaction.
+    """
+
+    with transaction.atomic():
+        changing = list(
+            Invoice.objects.select_for_update().filter(pk__in=invoice_ids).exclude(is_paid=is_paid)
+            .values_list('pk', 'lesson_request__student_id')
+        )
+        if not changing:
+            return 0
+        Invoice.objects.filter(pk__in=[pk for pk, _ in changing]).update(is_paid=is_paid)
+        students = Counter(student_id for _, student_id in changing if student_id is not None)
+        adjust_unpaid_invoices({
+            student_id: -count if is_paid else count for student_id, count in students.items()
+        })
+        invalidate_dashboards(students)
+    return len(changing)
+
+
+def delete_invoices(invoice_ids):
+    """
+    Delete invoices with a single DELETE, returning how many were deleted.
+
+    As with set_invoices_paid, counts and dashboards are updated here
+    rather than by the delete signals, which are not sent.
+    """
+
+    with transaction.atomic():
+        deleting = list(
+            Invoice.objects.select_for_update().filter(pk__in=invoice_ids)
+            .values_list('pk', 'lesson_request__student_id', 'is_paid')
+        )
+        if not deleting:
+            return 0
+        # Nothing refers to invoices, so a plain DELETE is enough; the ORM would load them to send signals
+        connection = connections[Invoice.objects.db]
+        table = connection.ops.quote_name(Invoice._meta.db_table)
+        column = connection.ops.quote_name(Invoice._meta.pk.column)
+        placeholders = ', '.join(['%s'] * len(deleting))
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table} WHERE {column} IN ({placeholders})', [pk for pk, _, _ in deleting])
+        adjust_unpaid_invoices(invoice_deltas(
+            [(student_id, is_paid) for _, student_id, is_paid in deleting if student_id is not None], [],
+        ))
+        invalidate_dashboards(student_id for _, student_id, _ in deleting)
+    return len(deleting)
+
+
+def generate_invoices(term=None, year=None, chunk_size=None, progress=None):
+    """
+    Create or refresh the invoices of every allocated lesson request, or of those in one term.
+
+    With year, only requests for terms in that year are invoiced, as
+    get_term_calendar() places them by when they were created; otherwise
+    requests for every year are.
+
+    Each request is charged by the pricing rules for its number of allocated
+    lessons. Requests without an invoice get one. Unpaid invoices are
+    brought up to the current price. Requests with a paid invoice are
+    skipped, as are requests with no lessons and requests whose price is not
+    one an invoice can hold (see invoice_amount).
+
+    Everything is read with a handful of bulk queries and written with bulk
+    inserts and updates in one transaction. Bulk writes send no signals, so
+    unpaid invoice counts and dashboards are updated here. Returns a dict
+    counting the invoices created, updated and unchanged, the requests
+    skipped because they were paid, and those skipped because of their price.
+
+    With chunk_size, the requests are instead invoiced chunk_size at a time,
+    each chunk in its own transaction, and progress(done, total) is called
+    after each one. Running again after a failure is safe, as invoices that
+    were already generated are left unchanged.
+    """
+
+    requests = LessonRequest.objects.filter(status='allocated')
+    if year is not None:
+        refresh_term_calendars()
+        in_year = Q()
+        for name in DEFAULT_TERMS if term is None else [term]:
+            after, until = get_term_creation_range(name, year)
+            # The term calendar works in naive UTC datetimes
+            in_year |= Q(term=name, date_created__gt=after.replace(tzinfo=timezone.utc),
+                         date_created__lte=until.replace(tzinfo=timezone.utc))
+        requests = requests.filter(in_year)
+    elif term is not None:
+        requests = requests.filter(term=term)
+    # Read the rules afresh, as this may run in a worker that has not seen the latest changes
+    rules = load_pricing_rules()
+    if chunk_size is None:
+        return _generate_invoices(requests, rules)
+
+    request_ids = list(requests.order_by('pk').values_list('pk', flat=True))
+    totals = {'created': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0, 'unpriced': 0}
+    for start in range(0, len(request_ids), chunk_size):
+        chunk = request_ids[start:start + chunk_size]
+        for key, count in _generate_invoices(requests.filter(pk__in=chunk), rules).items():
+            totals[key] += count
+        if progress is not None:
+            progress(start + len(chunk), len(request_ids))
+    return totals
+
+
+def _generate_invoices(requests, rules):
+    """Invoice the given allocated lesson requests by rules in one transaction, as generate_invoices describes."""
+
+    with transaction.atomic():
+        invoices = defaultdict(list)
+        for invoice in (
+            Invoice.objects.select_for_update().filter(lesson_request__in=requests)
+            .only('id', 'lesson_request_id', 'amount', 'is_paid')
+        ):
+            invoices[invoice.lesson_request_id].append(invoice)
+
+        created, changed = [], []
+        unchanged = skipped = unpriced = 0
+        students = {}
+        priced = (
+            requests.annotate(lesson_count=Count('allocated_lessons'))
+            .filter(lesson_count__gt=0)
+            .values_list('id', 'student_id', 'language', 'duration', 'lesson_count')
+        )
+        for lesson_request_id, student_id, language, duration, lesson_count in priced:
+            amount = invoice_amount(rules, language, duration, lesson_count)
+            existing = invoices[lesson_request_id]
+            if any(invoice.is_paid for invoice in existing):
+                skipped += 1
+            elif amount is None:
+                unpriced += 1
+            elif not existing:
+                created.append(Invoice(lesson_request_id=lesson_request_id, amount=amount))
+                students[lesson_request_id] = student_id
+            else:
+                for invoice in existing:
+                    if invoice.amount != amount:
+                        invoice.amount = amount
+                        changed.append(invoice)
+                        students[lesson_request_id] = student_id
+                    else:
+                        unchanged += 1
+
+        Invoice.objects.bulk_create(created, batch_size=500)
+        Invoice.objects.bulk_update(changed, ['amount'], batch_size=500)
+        adjust_unpaid_invoices(Counter(students[invoice.lesson_request_id] for invoice in created))
+        invalidate_dashboards(students.values())
+
+    return {
+        'created': len(created), 'updated': len(changed), 'unchanged': unchanged, 'skipped': skipped,
+        'unpriced': unpriced,
+    }
+
+
+def repair_invoice_summaries(student_ids=None):
+    """
+    Recompute unpaid invoice counts from the invoices with a few bulk queries.
+
+    Every student is repaired unless student_ids is given. Returns the number
+    of summary rows that were created or corrected.
+    """
+
+    # Requests are not always made by users with the student role, so include anyone who has made one
+    students = User.objects.filter(Q(role='student') | Q(lesson_requests_as_student__isnull=False)).distinct()
+    if student_ids is not None:
+        students = students.filter(pk__in=student_ids)
+    unpaid = dict(
+        Invoice.objects.filter(is_paid=False, lesson_request__student_id__in=students.values('pk'))
+        .values_list('lesson_request__student_id')
+        .annotate(count=Count('id'))
+    )
+    counts = {student_id: unpaid.get(student_id, 0) for student_id in students.values_list('pk', flat=True)}
+
+    existing = InvoiceSummary.objects.in_bulk(list(counts))
+    changed = []
+    for student_id, summary in existing.items():
+        if summary.unpaid_count != counts[student_id]:
+            summary.unpaid_count = counts[student_id]
+            changed.append(summary)
+    missing = [
+        InvoiceSummary(student_id=student_id, unpaid_count=count)
+        for student_id, count in counts.items()
+        if student_id not in existing
+    ]
+
+    InvoiceSummary.objects.bulk_update(changed, ['unpaid_count'], batch_size=500)
+    InvoiceSummary.objects.bulk_create(missing, batch_size=500)
+    return len(changed) + len(missing)
@@ -0,0 +1,174 @@
+"""A small database-backed job queue for work too slow for the request/response cycle."""
+import traceback
+from datetime import timedelta
+from pathlib import Path
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils.timezone import now
+from .allocation import allocate_lesson_requests
+from .exports import write_export
+from .invoices import generate_invoices
+from .models import Job
+
+RETRY_DELAY = timedelta(seconds=30)
+
+# How long a running job may go without a heartbeat before its worker is taken to have died
+LEASE_TIMEOUT = timedelta(minutes=10)
+
+# How many assignments or lesson requests the built-in handlers process between progress updates
+CHUNK_SIZE = 200
+
+HANDLERS = {}
+
+
+def register(name):
+    """
+    Register the decorated function as the handler for jobs called name.
+
+    A handler receives the Job being run and returns a JSON serialisable
+    result, which is stored on the job. Handlers should call
+    job.set_progress() as they go, which also renews the job's lease.
+    Raising an exception marks the attempt as failed; the job is retried
+    later until it has used up its max_attempts.
+    """
+
+    def decorator(handler):
+        HANDLERS[name] = handler
+        return handler
+    return decorator
+
+
+def enqueue(name, payload=None, user=None, max_attempts=3, idempotency_key=None):
+    """
+    Queue a job for the worker to pick up, returning the Job.
+
+    If idempotency_key is given and a job was already queued with the same
+    key, that job is returned instead of queueing the work a second time.
+    """
+
+    if name not in HANDLERS:
+        raise ValueError(f"Unknown job: {name}")
+    fields = {'name': name, 'payload': payload or {}, 'created_by': user, 'max_attempts': max_attempts}
+    if idempotency_key is None:
+        return Job.objects.create(**fields)
+    job, _ = Job.objects.get_or_create(idempotency_key=idempotency_key, defaults=fields)
+    return job
+
+
+def _claimable(cutoff):
+    """Return the condition matching jobs that are due, or whose worker has stopped sending heartbeats."""
+
+    return (Q(status=Job.QUEUED, run_after__lte=now())
+            | Q(status=Job.RUNNING, heartbeat_at__lt=cutoff, attempts__lt=F('max_attempts')))
+
+
+def claim_next_job():
+    """
+    Mark the next due job as running and return it, or None if there is none.
+
+    The claim is a conditional UPDATE on the job's status, so when several
+    workers poll the same queue only one of them can take each job. A job
+    left running without a heartbeat for LEASE_TIMEOUT, because its worker
+    died, is claimed again as its next attempt, or failed if it has none left.
+    """
+
+    cutoff = now() - LEASE_TIMEOUT
+    Job.objects.filter(status=Job.RUNNING, heartbeat_at__lt=cutoff, attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, error="The worker running this job stopped responding.", finished_at=now(),
+    )
+    while True:
+        job_id = (
+            Job.objects.filter(_claimable(cutoff))
+            .order_by('run_after', 'id')
+            .values_list('id', flat=True)
+            .first()
+        )
+        if job_id is None:
+            return None
+        claimed = Job.objects.filter(_claimable(cutoff), pk=job_id).update(
+            status=Job.RUNNING, started_at=now(), heartbeat_at=now(), attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Job.objects.get(pk=job_id)
+
+
+def run_job(job):
+    """
+    Run a claimed job and record its outcome.
+
+    A failed attempt is queued again after a delay that doubles with each
+    attempt, until the job has been tried max_attempts times.
+    """
+
+    try:
+        handler = HANDLERS[job.name]
+        result = handler(job)
+    except Exception:
+        job.error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Job.QUEUED
+            job.run_after = now() + RETRY_DELAY * 2 ** (job.attempts - 1)
+        else:
+            job.status = Job.FAILED
+            job.finished_at = now()
+        job.save(update_fields=['status', 'error', 'run_after', 'finished_at'])
+        return job
+
+    job.status = Job.SUCCEEDED
+    job.result = result
+    job.progress = 100
+    job.error = ''
+    job.finished_at = now()
+    job.save(update_fields=['status', 'result', 'progress', 'error', 'finished_at'])
+    return job
+
+
+def run_pending_jobs(limit=None):
+    """Run due jobs one after another until none are left, returning how many ran."""
+
+    count = 0
+    while limit is None or count < limit:
+        job = claim_next_job()
+        if job is None:
+            break
+        run_job(job)
+        count += 1
+    return count
+
+
+@register('allocate_lesson_requests')
+def allocate_lesson_requests_job(job):
+    """
+    Allocate a batch of (lesson_request_id, tutor_id, start_time) assignments.
+
+    The batch is allocated CHUNK_SIZE assignments at a time, and the report
+    so far is saved with the job's progress in each chunk's transaction, so
+    a retried job carries on after the last chunk that was committed.
+    """
+
+    assignments = job.payload['assignments']
+    done = list(job.result or [])
+    return done + allocate_lesson_requests(
+        assignments, chunk_size=CHUNK_SIZE, start=len(done),
+        on_chunk=lambda report: job.set_progress(len(done) + len(report), len(assignments), result=done + report),
+    )
+
+
+@register('generate_invoices')
+def generate_invoices_job(job):
+    """Create or refresh the invoices of the allocated requests in a term, or in every term, of a year."""
+
+    return generate_invoices(job.payload.get('term'), job.payload.get('year'), chunk_size=CHUNK_SIZE,
+                             progress=job.set_progress)
+
+
+@register('export_data')
+def export_data_job(job):
+    """Write an export too large to stream to a file in EXPORT_ROOT, for its page to link to."""
+
+    name, format = job.payload['name'], job.payload['format']
+    root = Path(settings.EXPORT_ROOT)
+    root.mkdir(parents=True, exist_ok=True)
+    filename = f'{name}-{job.pk}.{format}'
+    rows = write_export(name, format, root / filename, progress=job.set_progress)
+    return {'file': filename, 'rows': rows}
@@ -0,0 +1,63 @@
+"""Week and month windows of lessons, laid out for a calendar."""
+from calendar import monthrange
+from datetime import date, timedelta
+
+VIEWS = ('week', 'month')
+
+
+def calendar_window(view, anchor):
+    """
+    Return the (start, end, previous_anchor, next_anchor) of the calendar page containing anchor.
+
+    A week runs Monday to Sunday. A month is padded out to whole weeks so
+    that it can be drawn as a grid.
+    """
+
+    if view not in VIEWS:
+        raise ValueError(f"Unknown calendar view: {view}")
+
+    if view == 'week':
+        start = anchor - timedelta(days=anchor.weekday())
+        return start, start + timedelta(days=6), start - timedelta(days=7), start + timedelta(days=7)
+
+    first = anchor.replace(day=1)
+    last = anchor.replace(day=monthrange(anchor.year, anchor.month)[1])
+    start = first - timedelta(days=first.weekday())
+    end = last + timedelta(days=6 - last.weekday())
+    previous_month = (first - timedelta(days=1)).replace(day=1)
+    next_month = last + timedelta(days=1)
+    return start, end, previous_month, next_month
+
+
+def group_by_day(lessons, start, end):
+    """
+    Lay lessons out as a list of weeks, each a list of seven (day, lessons) pairs.
+
+    lessons must be ordered by date and fall between start and end, which
+    must be a Monday and a Sunday. The lessons are walked once alongside the
+    days, so the cost is linear in the number of lessons and days.
+    """
+
+    weeks = []
+    lessons = iter(lessons)
+    lesson = next(lessons, None)
+    day = start
+    while day <= end:
+        day_lessons = []
+        while lesson is not None and lesson.date == day:
+            day_lessons.append(lesson)
+            lesson = next(lessons, None)
+        if day.weekday() == 0:
+            weeks.append([])
+        weeks[-1].append((day, day_lessons))
+        day += timedelta(days=1)
+    return weeks
+
+
+def parse_anchor(value, default):
+    """Return the YYYY-MM-DD date in value, or default if it is missing or invalid."""
+
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return default
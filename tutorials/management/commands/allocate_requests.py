@@ -0,0 +1,39 @@
+import csv
+from django.core.management.base import BaseCommand, CommandError
+from tutorials.allocation import allocate_lesson_requests
+
+
+class Command(BaseCommand):
+    """Allocate many lesson requests in one batch."""
+
+    help = 'Allocates lesson requests given as REQUEST_ID:TUTOR_ID:HH:MM assignments or a CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('assignments', nargs='*', help='Assignments in the form REQUEST_ID:TUTOR_ID:HH:MM')
+        parser.add_argument('--file', help='CSV file with lesson_request_id, tutor_id and start_time columns')
+
+    def handle(self, *args, **options):
+        assignments = []
+        for assignment in options['assignments']:
+            parts = assignment.split(':', 2)
+            if len(parts) != 3:
+                raise CommandError(f"Invalid assignment '{assignment}', expected REQUEST_ID:TUTOR_ID:HH:MM")
+            assignments.append(tuple(parts))
+
+        if options['file']:
+            try:
+                with open(options['file'], newline='') as csv_file:
+                    for row in csv.DictReader(csv_file):
+                        assignments.append((row.get('lesson_request_id'), row.get('tutor_id'), row.get('start_time')))
+            except OSError as error:
+                raise CommandError(f"Cannot read {options['file']}: {error}")
+
+        if not assignments:
+            raise CommandError("No assignments given.")
+
+        report = allocate_lesson_requests(assignments)
+        for result in report:
+            status = 'OK' if result['success'] else 'FAILED'
+            self.stdout.write(f"{result['lesson_request_id']}: {status} - {result['message']} ({result['lessons']} lessons)")
+        succeeded = sum(1 for result in report if result['success'])
+        self.stdout.write(f"{succeeded} of {len(report)} lesson requests allocated.")
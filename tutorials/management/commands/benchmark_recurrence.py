@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+from random import choice, randint, seed
+from timeit import timeit
+from django.core.management.base import BaseCommand
+from tutorials.models import LessonRequest
+from tutorials.recurrence import get_term_date_range, occurrence_dates, bulk_lesson_request_dates
+
+
+def day_stepping_dates(term_start_date, term_end_date, day_of_the_week, frequency):
+    """The original day-stepping generator, kept as the benchmark baseline."""
+
+    days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+    frequency_mapping = {
+        'Weekly': timedelta(weeks=1),
+        'Bi-Weekly': timedelta(weeks=2),
+        'Monthly': timedelta(weeks=4),
+    }
+    delta = frequency_mapping.get(frequency)
+    dates = []
+    lesson_date = term_start_date
+    while lesson_date <= term_end_date:
+        while lesson_date.weekday() != days.index(day_of_the_week):
+            lesson_date += timedelta(days=1)
+        if lesson_date > term_end_date:
+            break
+        dates.append(lesson_date.date())
+        lesson_date += delta
+    return dates
+
+
+class Command(BaseCommand):
+    """Compare the closed-form recurrence engine against the day-stepping loop."""
+
+    help = 'Benchmarks lesson date generation for many unsaved lesson requests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=10000, help='Number of lesson requests to generate dates for')
+        parser.add_argument('--repeat', type=int, default=3, help='Number of timed runs; the best is reported')
+
+    def handle(self, *args, **options):
+        seed(0)
+        lesson_requests = [
+            LessonRequest(
+                pk=i,
+                term=choice(LessonRequest.TERM_CHOICES)[0],
+                day_of_the_week=choice(LessonRequest.DAY_CHOICES)[0],
+                frequency=choice(LessonRequest.FREQUENCY_CHOICES)[0],
+                date_created=datetime(2024, randint(1, 12), randint(1, 28)),
+            )
+            for i in range(options['requests'])
+        ]
+
+        def run_loop():
+            for lesson_request in lesson_requests:
+                start, end = get_term_date_range(lesson_request.term, lesson_request.date_created)
+                day_stepping_dates(start, end, lesson_request.day_of_the_week, lesson_request.frequency)
+
+        def run_closed_form():
+            occurrence_dates.cache_clear()
+            for lesson_request in lesson_requests:
+                start, end = get_term_date_range(lesson_request.term, lesson_request.date_created)
+                occurrence_dates.__wrapped__(start, end, lesson_request.day_of_the_week, lesson_request.frequency)
+
+        def run_bulk():
+            occurrence_dates.cache_clear()
+            bulk_lesson_request_dates(lesson_requests)
+
+        results = [
+            ('day-stepping loop', min(timeit(run_loop, number=1) for _ in range(options['repeat']))),
+            ('closed form', min(timeit(run_closed_form, number=1) for _ in range(options['repeat']))),
+            ('closed form, bulk', min(timeit(run_bulk, number=1) for _ in range(options['repeat']))),
+        ]
+        baseline = results[0][1]
+        self.stdout.write(f"{len(lesson_requests)} lesson requests, best of {options['repeat']}:")
+        for name, seconds in results:
+            self.stdout.write(f"  {name:<20} {seconds * 1000:9.2f} ms  ({baseline / seconds:.1f}x)")
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from tutorials.exports import EXPORTS, FORMATS
+
+
+class Command(BaseCommand):
+    """Write every lesson request, lesson or invoice out as CSV or NDJSON."""
+
+    help = 'Exports lesson requests, lessons or invoices with their student and tutor names'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(EXPORTS), help='What to export')
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv', help='Output format')
+        parser.add_argument('--output', help='File to write to instead of standard output')
+
+    def handle(self, *args, **options):
+        export, _ = FORMATS[options['format']]
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+                output.writelines(export(options['name']))
+        else:
+            for chunk in export(options['name']):
+                self.stdout.write(chunk, ending='')
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.utils.timezone import localdate
+from tutorials.invoices import generate_invoices
+from tutorials.models import LessonRequest
+
+
+class Command(BaseCommand):
+    """Invoice the allocated lesson requests for a year's terms using the pricing rules."""
+
+    help = 'Creates or refreshes the invoices of the allocated lesson requests for the terms of a year, or of one term'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--term', choices=[term for term, _ in LessonRequest.TERM_CHOICES],
+                            help='Only invoice requests in this term')
+        parser.add_argument('--year', type=int, default=localdate().year,
+                            help='Invoice requests for terms in this year (default: this year)')
+
+    def handle(self, *args, **options):
+        result = generate_invoices(options['term'], options['year'])
+        self.stdout.write(
+            f"{result['created']} invoices created, {result['updated']} updated, "
+            f"{result['unchanged']} unchanged; {result['skipped']} paid requests skipped."
+        )
+        if result['unpriced']:
+            self.stdout.write(f"{result['unpriced']} requests skipped because their price is not one an invoice can hold.")
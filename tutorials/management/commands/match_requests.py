@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from tutorials.allocation import allocate_lesson_requests
+from tutorials.matching import propose_allocations
+
+
+class Command(BaseCommand):
+    """Match unallocated lesson requests to available tutors."""
+
+    help = 'Proposes a tutor and start time for every unallocated lesson request'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--apply', action='store_true', help='Allocate the proposed assignments')
+
+    def handle(self, *args, **options):
+        proposals, unmatched = propose_allocations()
+        for proposal in proposals:
+            self.stdout.write(f"{proposal['lesson_request_id']}: tutor {proposal['tutor_id']} at {proposal['start_time']}")
+        self.stdout.write(f"{len(proposals)} lesson requests matched, {len(unmatched)} without a suitable tutor.")
+
+        if options['apply'] and proposals:
+            report = allocate_lesson_requests(
+                (proposal['lesson_request_id'], proposal['tutor_id'], proposal['start_time'])
+                for proposal in proposals
+            )
+            succeeded = sum(1 for result in report if result['success'])
+            self.stdout.write(f"{succeeded} of {len(report)} lesson requests allocated.")
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from tutorials.invoices import repair_invoice_summaries
+
+
+class Command(BaseCommand):
+    """Recompute students' unpaid invoice counts from their invoices."""
+
+    help = 'Recomputes the unpaid invoice count of every student, or of the given students'
+
+    def add_arguments(self, parser):
+        parser.add_argument('student_ids', nargs='*', type=int, help='Only repair these students')
+
+    def handle(self, *args, **options):
+        repaired = repair_invoice_summaries(options['student_ids'] or None)
+        self.stdout.write(f"{repaired} invoice summaries repaired.")
@@ -0,0 +1,30 @@
+from time import sleep
+from django.core.management.base import BaseCommand
+from tutorials.jobs import claim_next_job, run_job
+
+
+class Command(BaseCommand):
+    """Run queued background jobs."""
+
+    help = 'Runs queued background jobs, polling the queue until stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when there are no more jobs due')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Seconds to wait between polls of an empty queue')
+        parser.add_argument('--max-jobs', type=int, help='Exit after running this many jobs')
+
+    def handle(self, *args, **options):
+        count = 0
+        while options['max_jobs'] is None or count < options['max_jobs']:
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    break
+                sleep(options['sleep'])
+                continue
+
+            run_job(job)
+            count += 1
+            self.stdout.write(f"Job {job.pk} ({job.name}): {job.status}")
+
+        self.stdout.write(f"{count} jobs run.")
@@ -0,0 +1,194 @@
+"""Propose tutor allocations for unallocated lesson requests."""
+from collections import defaultdict
+from datetime import time
+from django.db.models import Max, Min
+from django.utils.timezone import localdate
+from .models import Schedule, LessonRequest, AllocatedLesson
+from .recurrence import get_term_calendar, refresh_term_calendars
+
+SLOT_MINUTES = 60
+
+
+def to_minutes(value):
+    """Return a time as minutes since midnight."""
+
+    return value.hour * 60 + value.minute
+
+
+def _format_minutes(minutes):
+    """Return minutes since midnight as an HH:MM string."""
+
+    return time(minutes // 60, minutes % 60).strftime('%H:%M')
+
+
+def free_segments(start, end, booked):
+    """Return the parts of the [start, end) interval not covered by any booked interval."""
+
+    segments = []
+    cursor = start
+    for booked_start, booked_end in sorted(booked):
+        if booked_end <= cursor or booked_start >= end:
+            continue
+        if booked_start > cursor:
+            segments.append((cursor, booked_start))
+        cursor = max(cursor, booked_end)
+    if cursor < end:
+        segments.append((cursor, end))
+    return segments
+
+
+def _fill_segments(requests, segments):
+    """
+    Assign requests of one (term, language, day) group to free segments.
+
+    Segment capacity is counted in whole slots. Shorter lessons are placed first,
+    preferring segments with an odd number of free slots so that pairs of slots
+    stay available for two-slot lessons. For one- and two-slot lessons this
+    places the largest possible number of requests. Returns a list of
+    (request_id, tutor_id, start_minutes) tuples.
+    """
+
+    free = [(end - start) // SLOT_MINUTES for _, start, end in segments]
+    placed = [[] for _ in segments]
+    odd = [i for i, units in enumerate(free) if units % 2]
+    even = [i for i, units in enumerate(free) if units and not units % 2]
+    pointers = {}
+
+    for request_id, slots in sorted(requests, key=lambda request: request[1]):
+        if slots == 1:
+            if odd:
+                chosen = odd.pop()
+            elif even:
+                chosen = even.pop()
+            else:
+                continue
+            free[chosen] -= 1
+            if free[chosen]:
+                (odd if free[chosen] % 2 else even).append(chosen)
+        else:
+            # Free capacity only shrinks, so segments skipped once never fit this size again
+            pointer = pointers.get(slots, 0)
+            while pointer < len(free) and free[pointer] < slots:
+                pointer += 1
+            pointers[slots] = pointer
+            if pointer == len(free):
+                continue
+            chosen = pointer
+            free[chosen] -= slots
+        placed[chosen].append((request_id, slots))
+
+    proposals = []
+    for (tutor_id, start, _), lessons in zip(segments, placed):
+        cursor = start
+        for request_id, slots in sorted(lessons, key=lambda lesson: -lesson[1]):
+            proposals.append((request_id, tutor_id, cursor))
+            cursor += slots * SLOT_MINUTES
+    return proposals
+
+
+def _overlapping(booked, term_start, term_end):
+    """Return the (start, end) minutes of the bookings whose dates overlap term_start to term_end."""
+
+    return [(start, end) for first, last, start, end in booked if first <= term_end and term_start <= last]
+
+
+def match_requests(requests, windows, bookings):
+    """
+    Propose a tutor and start time for as many requests as availability allows.
+
+    requests is an iterable of (request_id, term_start, term_end, language, day,
+    duration) tuples in priority order, where term_start and term_end are the
+    dates of the term the request falls in; windows of (tutor_id, subject, day,
+    start_time, end_time); and bookings of (tutor_id, day, start_time, duration,
+    first_date, last_date) for lessons that are already allocated. A booking
+    only takes up a window for requests whose term overlaps its dates. Each
+    tutor teaches a single subject and each window falls on a single day, so
+    requests compete within a (term, language, day) group and each group is
+    filled in linear time. Groups are filled in priority order and each one's
+    placements count as bookings for the groups after it, so terms that overlap,
+    such as Jan-Easter and March-June, never share a slot.
+
+    Returns a (proposals, unmatched) pair: proposals is a list of dicts with
+    lesson_request_id, tutor_id and start_time (HH:MM) keys, and unmatched is
+    the list of request ids that could not be placed.
+    """
+
+    booked = defaultdict(list)
+    for tutor_id, day, start_time, duration, first_date, last_date in bookings:
+        start = to_minutes(start_time)
+        booked[(tutor_id, day)].append((first_date, last_date, start, start + duration))
+
+    windows_by_group = defaultdict(list)
+    for tutor_id, subject, day, start_time, end_time in windows:
+        windows_by_group[(subject, day)].append((tutor_id, to_minutes(start_time), to_minutes(end_time)))
+
+    requests_by_group = defaultdict(list)
+    durations = {}
+    order = []
+    for request_id, term_start, term_end, language, day, duration in requests:
+        order.append(request_id)
+        durations[request_id] = duration
+        slots = -(-duration // SLOT_MINUTES)
+        requests_by_group[(term_start, term_end, language, day)].append((request_id, slots))
+
+    placed = {}
+    for (term_start, term_end, language, day), group in requests_by_group.items():
+        segments = [
+            (tutor_id, segment_start, segment_end)
+            for tutor_id, start, end in windows_by_group.get((language, day), [])
+            for segment_start, segment_end in free_segments(
+                start, end, _overlapping(booked[(tutor_id, day)], term_start, term_end)
+            )
+        ]
+        for request_id, tutor_id, start in _fill_segments(group, segments):
+            booked[(tutor_id, day)].append((term_start, term_end, start, start + durations[request_id]))
+            placed[request_id] = {
+                'lesson_request_id': request_id,
+                'tutor_id': tutor_id,
+                'start_time': _format_minutes(start),
+            }
+
+    proposals = [placed[request_id] for request_id in order if request_id in placed]
+    unmatched = [request_id for request_id in order if request_id not in placed]
+    return proposals, unmatched
+
+
+def propose_allocations():
+    """
+    Match every unallocated lesson request against current tutor availability.
+
+    Each request is matched within the dates of the term it falls in, from
+    get_term_calendar(), and each allocated request that still has lessons to
+    come books its tutor between its first and last remaining lesson.
+    Requests whose term is unknown cannot be matched.
+    """
+
+    refresh_term_calendars()
+    requests = []
+    invalid = []
+    for request_id, term, language, day, duration, date_created in (
+        LessonRequest.objects.exclude(status='allocated')
+        .order_by('date_created', 'id')
+        .values_list('id', 'term', 'language', 'day_of_the_week', 'duration', 'date_created')
+    ):
+        try:
+            term_start, term_end, _ = get_term_calendar(term, date_created)
+        except ValueError:
+            invalid.append(request_id)
+            continue
+        requests.append((request_id, term_start, term_end, language, day, duration))
+    windows = (
+        Schedule.objects.filter(user__role='tutor', user__tutor_profile__subjects__isnull=False)
+        .values_list('user_id', 'user__tutor_profile__subjects', 'day_of_week', 'start_time', 'end_time')
+    )
+    bookings = (
+        AllocatedLesson.objects.filter(tutor_id__isnull=False, lesson_request__status='allocated',
+                                       date__gte=localdate())
+        .values('lesson_request')
+        .annotate(first_date=Min('date'), last_date=Max('date'))
+        .values_list('tutor_id', 'lesson_request__day_of_the_week', 'time', 'lesson_request__duration',
+                     'first_date', 'last_date')
+        .order_by()
+    )
+    proposals, unmatched = match_requests(requests, windows, bookings)
+    return proposals, unmatched + invalid
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.2 on 2026-10-17 19:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tutorials', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='allocatedlesson',
+            index=models.Index(fields=['tutor_id', 'date', 'time'], name='allocated_lesson_tutor_date'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.1.2 on 2026-10-17 19:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tutorials', '0002_allocatedlesson_tutor_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TermCalendar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(choices=[('Sept-Christmas', 'Sept-Christmas'), ('Jan-Easter', 'Jan-Easter'), ('March-June', 'March-June')], max_length=20)),
+                ('year', models.PositiveIntegerField()),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+            ],
+            options={
+                'ordering': ['year', 'start_date'],
+                'unique_together': {('term', 'year')},
+            },
+        ),
+        migrations.CreateModel(
+            name='TermExclusion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('description', models.CharField(blank=True, max_length=100)),
+                ('calendar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exclusions', to='tutorials.termcalendar')),
+            ],
+            options={
+                'ordering': ['start_date'],
+            },
+        ),
+    ]
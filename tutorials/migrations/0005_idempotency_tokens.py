@@ -0,0 +1,23 @@
+# Generated by Django 5.1.2 on 2026-10-17 19:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tutorials', '0004_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='lessonrequest',
+            name='last_update_token',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+    ]
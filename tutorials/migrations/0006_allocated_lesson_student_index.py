@@ -0,0 +1,17 @@
+# Generated by Django 5.1.2 on 2026-10-17 19:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tutorials', '0005_idempotency_tokens'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='allocatedlesson',
+            index=models.Index(fields=['student_id', 'date', 'time'], name='allocated_lesson_student_date'),
+        ),
+    ]
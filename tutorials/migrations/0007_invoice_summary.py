@@ -0,0 +1,22 @@
+# Generated by Django 5.1.2 on 2026-10-17 19:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tutorials', '0006_allocated_lesson_student_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceSummary',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='invoice_summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unpaid_count', models.IntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.2 on 2026-10-17 20:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('tutorials', '0008_calendar_feeds'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lessonrequest',
+            index=models.Index(fields=['date_created', 'id'], name='lesson_request_created'),
+        ),
+        migrations.AddIndex(
+            model_name='lessonrequest',
+            index=models.Index(fields=['status', 'id'], name='lesson_request_status'),
+        ),
+        migrations.AddIndex(
+            model_name='lessonrequest',
+            index=models.Index(fields=['language', 'id'], name='lesson_request_language'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['last_name', 'first_name', 'id'], name='user_name'),
+        ),
+    ]
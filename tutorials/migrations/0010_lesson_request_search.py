@@ -0,0 +1,76 @@
+from django.db import migrations
+
+# The search index is an FTS5 table keyed by lesson request id. Triggers keep
+# it in step with inserts, updates and deletes of requests and with changes to
+# student names, so it never needs rebuilding by the application.
+CREATE_STATEMENTS = [
+    """
+    CREATE VIRTUAL TABLE tutorials_lessonrequest_search USING fts5(description, student_name)
+    """,
+    """
+    INSERT INTO tutorials_lessonrequest_search (rowid, description, student_name)
+    SELECT r.id, r.description, u.first_name || ' ' || u.last_name
+    FROM tutorials_lessonrequest r JOIN tutorials_user u ON u.id = r.student_id_id
+    """,
+    """
+    CREATE TRIGGER tutorials_lessonrequest_search_insert AFTER INSERT ON tutorials_lessonrequest BEGIN
+        INSERT INTO tutorials_lessonrequest_search (rowid, description, student_name)
+        SELECT NEW.id, NEW.description, u.first_name || ' ' || u.last_name
+        FROM tutorials_user u WHERE u.id = NEW.student_id_id;
+    END
+    """,
+    """
+    CREATE TRIGGER tutorials_lessonrequest_search_update
+    AFTER UPDATE OF description, student_id_id ON tutorials_lessonrequest BEGIN
+        DELETE FROM tutorials_lessonrequest_search WHERE rowid = OLD.id;
+        INSERT INTO tutorials_lessonrequest_search (rowid, description, student_name)
+        SELECT NEW.id, NEW.description, u.first_name || ' ' || u.last_name
+        FROM tutorials_user u WHERE u.id = NEW.student_id_id;
+    END
+    """,
+    """
+    CREATE TRIGGER tutorials_lessonrequest_search_delete AFTER DELETE ON tutorials_lessonrequest BEGIN
+        DELETE FROM tutorials_lessonrequest_search WHERE rowid = OLD.id;
+    END
+    """,
+    """
+    CREATE TRIGGER tutorials_user_search_update AFTER UPDATE OF first_name, last_name ON tutorials_user BEGIN
+        UPDATE tutorials_lessonrequest_search SET student_name = NEW.first_name || ' ' || NEW.last_name
+        WHERE rowid IN (SELECT id FROM tutorials_lessonrequest WHERE student_id_id = NEW.id);
+    END
+    """,
+]
+
+DROP_STATEMENTS = [
+    "DROP TRIGGER IF EXISTS tutorials_user_search_update",
+    "DROP TRIGGER IF EXISTS tutorials_lessonrequest_search_delete",
+    "DROP TRIGGER IF EXISTS tutorials_lessonrequest_search_update",
+    "DROP TRIGGER IF EXISTS tutorials_lessonrequest_search_insert",
+    "DROP TABLE IF EXISTS tutorials_lessonrequest_search",
+]
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 is SQLite only; elsewhere search falls back to scanning the columns
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in CREATE_STATEMENTS:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in DROP_STATEMENTS:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tutorials', '0009_lesson_request_sort_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
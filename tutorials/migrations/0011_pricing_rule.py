@@ -0,0 +1,26 @@
+# Generated by Django 5.1.2 on 2026-10-17 20:23
+
+import django.core.validators
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tutorials', '0010_lesson_request_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PricingRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('language', models.CharField(blank=True, choices=[('Python', 'Python'), ('Java', 'Java'), ('C++', 'C++'), ('Scala', 'Scala'), ('R', 'R'), ('Javascript', 'Javascript'), ('Swift', 'Swift'), ('Go', 'Go')], help_text='Leave blank to apply to every language.', max_length=50)),
+                ('duration', models.IntegerField(blank=True, choices=[(60, '60 minutes'), (120, '120 minutes')], help_text='Leave blank to apply to every lesson length.', null=True)),
+                ('min_lessons', models.PositiveIntegerField(default=0)),
+                ('hourly_rate', models.DecimalField(decimal_places=2, max_digits=6, validators=[django.core.validators.MinValueValidator(Decimal('0'))])),
+                ('discount_percent', models.DecimalField(decimal_places=2, default=0, max_digits=5, validators=[django.core.validators.MinValueValidator(Decimal('0')), django.core.validators.MaxValueValidator(Decimal('100'))])),
+            ],
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.2 on 2026-10-17 21:32
+
+from importlib import import_module
+from django.db import migrations, models
+
+# SQLite adds these columns by rebuilding the user and lesson request tables,
+# which would take the search index triggers with them, so the triggers are
+# dropped first and created again afterwards.
+search = import_module('tutorials.migrations.0010_lesson_request_search')
+TRIGGER_STATEMENTS = [statement for statement in search.CREATE_STATEMENTS if 'CREATE TRIGGER' in statement]
+DROP_TRIGGER_STATEMENTS = [statement for statement in search.DROP_STATEMENTS if 'DROP TRIGGER' in statement]
+
+
+def create_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in TRIGGER_STATEMENTS:
+        schema_editor.execute(statement)
+
+
+def drop_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in DROP_TRIGGER_STATEMENTS:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tutorials', '0012_job_heartbeat'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_search_triggers, create_search_triggers),
+        migrations.AddField(
+            model_name='lessonrequest',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(create_search_triggers, drop_search_triggers),
+    ]
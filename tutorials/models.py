@@ -6,7 +6,8 @@ from django.contrib.auth.models import AbstractUser
 from django.contrib.auth import get_user_model
 from django.db import models
 from django.utils.timezone import now
-from django.core.validators import MinValueValidator
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.core.serializers.json import DjangoJSONEncoder
 from decimal import Decimal
 from libgravatar import Gravatar
 from code_tutors import settings
@@ -39,11 +40,16 @@ class User(AbstractUser):
         default='student',
         verbose_name='Role'
     )
+    # Lesson calendar feeds show the names of the users in them, so they note when a user last changed
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         """Model options."""
 
         ordering = ['last_name', 'first_name']
+        indexes = [
+            models.Index(fields=['last_name', 'first_name', 'id'], name='user_name'),
+        ]
 
     def full_name(self):
         """Return a string containing the user's full name."""
@@ -201,6 +207,17 @@ class LessonRequest(models.Model):
     description = models.TextField(blank=True)
     status = models.CharField(max_length=20, default='Unallocated')
     date_created = models.DateTimeField(default=now)
+    last_update_token = models.CharField(max_length=32, blank=True)
+    # Likewise their lessons' length, from the request
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # The admin request list is paged by keyset on each of its sort columns
+        indexes = [
+            models.Index(fields=['date_created', 'id'], name='lesson_request_created'),
+            models.Index(fields=['status', 'id'], name='lesson_request_status'),
+            models.Index(fields=['language', 'id'], name='lesson_request_language'),
+        ]
 
     def __str__(self):
         return f"Request by {self.student_id} for {self.language}"
@@ -239,9 +256,14 @@ class AllocatedLesson(models.Model):
         on_delete=models.SET_NULL,
         related_name='allocated_lessons_as_tutor'  # Custom related_name to avoid conflict
     )
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ('lesson_request', 'occurrence')
+        indexes = [
+            models.Index(fields=['tutor_id', 'date', 'time'], name='allocated_lesson_tutor_date'),
+            models.Index(fields=['student_id', 'date', 'time'], name='allocated_lesson_student_date'),
+        ]
 
     def __str__(self):
         return f"Lesson Request {self.lesson_request.id} - Occurrence {self.occurrence} on {self.date}"
@@ -261,3 +283,155 @@ class Invoice(models.Model):
     amount = models.DecimalField(max_digits=6, decimal_places=2, default=0, validators=[MinValueValidator(Decimal('0.01'))])
     is_paid = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+
+
+class PricingRule(models.Model):
+    """
+    An hourly rate for invoicing lessons, with an optional discount.
+
+    A rule can be limited to one language and/or one lesson length, and to
+    requests with at least min_lessons lessons. Each request is priced by the
+    most specific rule that applies to it (see pricing.matching_rule).
+    """
+
+    language = models.CharField(max_length=50, choices=LessonRequest.LANGUAGE_CHOICES, blank=True,
+                                help_text="Leave blank to apply to every language.")
+    duration = models.IntegerField(choices=LessonRequest.DURATION_CHOICES, null=True, blank=True,
+                                   help_text="Leave blank to apply to every lesson length.")
+    min_lessons = models.PositiveIntegerField(default=0)
+    hourly_rate = models.DecimalField(max_digits=6, decimal_places=2, validators=[MinValueValidator(Decimal('0'))])
+    discount_percent = models.DecimalField(max_digits=5, decimal_places=2, default=0,
+                                           validators=[MinValueValidator(Decimal('0')), MaxValueValidator(Decimal('100'))])
+
+    def __str__(self):
+        scope = ' '.join(str(part) for part in (self.language, self.get_duration_display()) if part) or 'All lessons'
+        return f"{scope}: £{self.hourly_rate}/hour"
+
+
+class InvoiceSummary(models.Model):
+    """
+    A student's unpaid invoice count, kept in step with their invoices.
+
+    Signal handlers adjust the count whenever an invoice is created, deleted,
+    paid or moved to another request; the repair_invoice_summaries command
+    recomputes it from the invoices.
+    """
+
+    student = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True,
+                                   related_name='invoice_summary')
+    unpaid_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.student}: {self.unpaid_count} unpaid invoices"
+
+
+class CalendarFeed(models.Model):
+    """The secret token in the URL of a user's iCalendar subscription feed."""
+
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='calendar_feed')
+    token = models.CharField(max_length=64, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Calendar feed for {self.user}"
+
+
+class TermCalendar(models.Model):
+    """Start and end dates of a term in a given year."""
+
+    term = models.CharField(max_length=20, choices=LessonRequest.TERM_CHOICES)
+    year = models.PositiveIntegerField()
+    start_date = models.DateField()
+    end_date = models.DateField()
+
+    class Meta:
+        unique_together = ('term', 'year')
+        ordering = ['year', 'start_date']
+
+    def __str__(self):
+        return f"{self.term} {self.year}"
+
+    def clean(self):
+        if self.start_date and self.end_date and self.start_date > self.end_date:
+            raise ValidationError("Term start date cannot be after its end date.")
+
+
+class TermExclusion(models.Model):
+    """A run of dates within a term on which no lessons take place, such as half-term."""
+
+    calendar = models.ForeignKey(TermCalendar, on_delete=models.CASCADE, related_name='exclusions')
+    start_date = models.DateField()
+    end_date = models.DateField()
+    description = models.CharField(max_length=100, blank=True)
+
+    class Meta:
+        ordering = ['start_date']
+
+    def __str__(self):
+        return f"{self.calendar}: {self.description or 'No lessons'} {self.start_date}-{self.end_date}"
+
+    def clean(self):
+        if self.start_date and self.end_date and self.start_date > self.end_date:
+            raise ValidationError("Exclusion start date cannot be after its end date.")
+
+
+class Job(models.Model):
+    """A unit of background work, run by the run_jobs management command."""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    idempotency_key = models.CharField(max_length=64, unique=True, null=True, blank=True)
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    progress = models.PositiveIntegerField(default=0)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='jobs')
+    run_after = models.DateTimeField(default=now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Renewed while the job runs; a running job whose heartbeat stops is taken to have lost its worker
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.SUCCEEDED, self.FAILED)
+
+    def set_progress(self, done, total, result=None):
+        """
+        Record how far through its work the job is, as a percentage, and renew its heartbeat.
+
+        A partial result, if given, is saved with it so that a retried job can
+        carry on from where the last attempt got to.
+        """
+
+        self.progress = min(100, done * 100 // total) if total else 100
+        self.heartbeat_at = now()
+        fields = {'progress': self.progress, 'heartbeat_at': self.heartbeat_at}
+        if result is not None:
+            self.result = fields['result'] = result
+        Job.objects.filter(pk=self.pk).update(**fields)
@@ -0,0 +1,81 @@
+"""Summary figures for the admin dashboard."""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.utils.timezone import localdate
+from .matching import to_minutes
+from .models import User, Schedule, LessonRequest, AllocatedLesson, Invoice
+
+OVERVIEW_CACHE_KEY = 'admin_overview'
+
+
+def admin_overview():
+    """
+    Return the admin dashboard figures, computed with a handful of aggregate queries.
+
+    The result is a dict with request counts, this week's lessons (Monday to
+    Sunday), unpaid invoice totals and, per tutor, the minutes booked this
+    week against the minutes of weekly availability in their schedule.
+    """
+
+    today = localdate()
+    week_start = today - timedelta(days=today.weekday())
+    week_end = week_start + timedelta(days=6)
+
+    requests = LessonRequest.objects.aggregate(
+        total=Count('id'),
+        unallocated=Count('id', filter=~Q(status='allocated')),
+    )
+    lessons = AllocatedLesson.objects.filter(date__range=(week_start, week_end)).aggregate(
+        count=Count('id'),
+        minutes=Sum('lesson_request__duration'),
+    )
+    invoices = Invoice.objects.aggregate(
+        unpaid_count=Count('id', filter=Q(is_paid=False)),
+        unpaid_total=Sum('amount', filter=Q(is_paid=False)),
+    )
+
+    available = defaultdict(int)
+    for user_id, start_time, end_time in Schedule.objects.filter(user__role='tutor').values_list(
+        'user_id', 'start_time', 'end_time'
+    ):
+        available[user_id] += max(0, to_minutes(end_time) - to_minutes(start_time))
+    booked = dict(
+        AllocatedLesson.objects.filter(date__range=(week_start, week_end), tutor_id__isnull=False)
+        .values_list('tutor_id')
+        .annotate(minutes=Sum('lesson_request__duration'))
+    )
+    tutors = User.objects.filter(role='tutor').order_by('last_name', 'first_name').values_list(
+        'id', 'first_name', 'last_name'
+    )
+    utilization = [
+        {
+            'tutor_id': tutor_id,
+            'name': f"{first_name} {last_name}",
+            'booked_minutes': booked.get(tutor_id, 0),
+            'available_minutes': available[tutor_id],
+            'percent': round(100 * booked.get(tutor_id, 0) / available[tutor_id]) if available[tutor_id] else None,
+        }
+        for tutor_id, first_name, last_name in tutors
+    ]
+
+    return {
+        'week_start': week_start,
+        'week_end': week_end,
+        'total_requests': requests['total'],
+        'unallocated_requests': requests['unallocated'],
+        'lessons_this_week': lessons['count'],
+        'hours_this_week': Decimal(lessons['minutes'] or 0) / 60,
+        'unpaid_invoices': invoices['unpaid_count'],
+        'unpaid_total': (invoices['unpaid_total'] or Decimal('0')).quantize(Decimal('0.01')),
+        'tutor_utilization': utilization,
+    }
+
+
+def cached_admin_overview():
+    """Return admin_overview(), recomputed at most once every ADMIN_OVERVIEW_CACHE_SECONDS."""
+
+    return cache.get_or_set(OVERVIEW_CACHE_KEY, admin_overview, settings.ADMIN_OVERVIEW_CACHE_SECONDS)
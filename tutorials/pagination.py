@@ -0,0 +1,91 @@
+"""Keyset (cursor) pagination for querysets ordered by a unique tuple of fields."""
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as DecodeError
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+def encode_cursor(values):
+    """Return an opaque URL-safe cursor for a tuple of field values."""
+
+    # The values are kept as a JSON list, as any character, a separator included, can appear in them
+    text = json.dumps([str(value) for value in values], separators=(',', ':'))
+    return urlsafe_b64encode(text.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, length):
+    """Return the field values stored in a cursor, raising ValueError if it is malformed."""
+
+    try:
+        values = json.loads(urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode())
+    except (DecodeError, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid cursor") from None
+    if not isinstance(values, list) or len(values) != length or not all(isinstance(value, str) for value in values):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def _after(fields, values, descending):
+    """Return a Q matching rows that come after values in (fields) order."""
+
+    lookup = 'lt' if descending else 'gt'
+    condition = Q()
+    for i, field in enumerate(fields):
+        step = Q(**{f'{field}__{lookup}': values[i]})
+        for previous_field, previous_value in zip(fields[:i], values[:i]):
+            step &= Q(**{previous_field: previous_value})
+        condition |= step
+    return condition
+
+
+def _model_field(model, path):
+    """Return the model field a lookup path such as 'student_id__last_name' refers to."""
+
+    *relations, name = path.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.get_field(name)
+
+
+def _row_value(row, path):
+    if isinstance(row, dict):
+        # Rows of a values() queryset
+        return row[path]
+    for name in path.split('__'):
+        row = getattr(row, name)
+    return row
+
+
+def keyset_page(queryset, fields, cursor=None, size=20, descending=False):
+    """
+    Return one page of queryset and the cursor of the page after it.
+
+    The queryset is ordered by fields, which must identify a row uniquely
+    (end them with 'id'); they may follow relations, as in
+    'student_id__last_name', and the related rows should then be
+    select_related. Instead of an OFFSET, each page starts from the
+    values of the last row of the page before, so with an index on the fields
+    every page costs the same however deep into the results it is. Returns a
+    (rows, next_cursor) pair; next_cursor is None on the last page. Raises
+    ValueError if cursor is malformed.
+    """
+
+    fields = list(fields)
+    queryset = queryset.order_by(*(f'-{field}' if descending else field for field in fields))
+    if cursor:
+        try:
+            values = [
+                _model_field(queryset.model, field).to_python(value)
+                for field, value in zip(fields, decode_cursor(cursor, len(fields)))
+            ]
+        except ValidationError:
+            raise ValueError("Invalid cursor") from None
+        queryset = queryset.filter(_after(fields, values, descending))
+
+    # Fetch one extra row to find out whether there is another page
+    rows = list(queryset[:size + 1])
+    if len(rows) <= size:
+        return rows, None
+    rows = rows[:size]
+    return rows, encode_cursor(_row_value(rows[-1], field) for field in fields)
@@ -0,0 +1,99 @@
+"""Invoice pricing for allocated lessons."""
+from decimal import Decimal
+from django.conf import settings
+from .models import PricingRule
+from .versions import bump_version, current_version
+
+PRICING_RULE_VERSION = 'pricing_rule_version'
+
+# The amounts an invoice can hold. Bulk writes skip the model's validators, so invoice_amount() checks them.
+MIN_INVOICE_AMOUNT = Decimal('0.01')
+MAX_INVOICE_AMOUNT = Decimal('9999.99')
+
+_pricing_rules = None
+_pricing_rules_version = None
+
+
+def load_pricing_rules():
+    """Return every pricing rule from the database, most specific first, for passing to invoice_amount."""
+
+    rules = list(PricingRule.objects.all())
+    rules.sort(key=lambda rule: (rule.language != '', rule.duration is not None, rule.min_lessons), reverse=True)
+    return tuple(rules)
+
+
+def pricing_rules():
+    """
+    Return load_pricing_rules(), loaded on first use and kept in this process.
+
+    The rules are reloaded when a version kept in the shared cache has moved
+    on since they were loaded, which pricing_rules_changed() makes happen
+    whenever a rule is saved or deleted in any process, so each call costs
+    one cache read.
+    """
+
+    global _pricing_rules, _pricing_rules_version
+    version = current_version(PRICING_RULE_VERSION)
+    if _pricing_rules is None or version != _pricing_rules_version:
+        _pricing_rules = load_pricing_rules()
+        _pricing_rules_version = version
+    return _pricing_rules
+
+
+def clear_pricing_rule_cache():
+    """Forget the cached pricing rules so that they are reloaded on next use."""
+
+    global _pricing_rules
+    _pricing_rules = None
+
+
+def pricing_rules_changed():
+    """Forget the cached pricing rules in this process, and tell every other process to do the same."""
+
+    clear_pricing_rule_cache()
+    bump_version(PRICING_RULE_VERSION)
+
+
+def matching_rule(rules, language, duration, lesson_count):
+    """
+    Return the rule that prices lesson_count lessons of a language and duration, or None.
+
+    rules must be ordered as load_pricing_rules() orders them, so the first rule
+    that applies is the most specific: one for the language beats one for the
+    lesson length, which beats a general rule, and among otherwise equal
+    rules the one with the highest min_lessons wins.
+    """
+
+    for rule in rules:
+        if (rule.language in ('', language) and rule.duration in (None, duration)
+                and lesson_count >= rule.min_lessons):
+            return rule
+    return None
+
+
+def invoice_amount(rules, language, duration, lesson_count):
+    """
+    Return the invoice amount for lesson_count lessons of duration minutes.
+
+    Lessons are charged at the matching rule's hourly rate less its discount,
+    or at LESSON_HOURLY_RATE if no rule applies. Returns None if the amount
+    is not one an invoice can hold, such as nothing at all from a zero rate
+    or a 100% discount, or more than MAX_INVOICE_AMOUNT.
+    """
+
+    rule = matching_rule(rules, language, duration, lesson_count)
+    rate = rule.hourly_rate if rule else settings.LESSON_HOURLY_RATE
+    discount = rule.discount_percent if rule else Decimal('0')
+    hours = Decimal(duration) / 60
+    amount = (rate * hours * lesson_count * (100 - discount) / 100).quantize(Decimal('0.01'))
+    if not MIN_INVOICE_AMOUNT <= amount <= MAX_INVOICE_AMOUNT:
+        return None
+    return amount
+
+
+def projected_invoice_amount(lesson_request, lesson_count, rules=None):
+    """Return invoice_amount() for lesson_count lessons of the request's language and duration."""
+
+    if rules is None:
+        rules = pricing_rules()
+    return invoice_amount(rules, lesson_request.language, lesson_request.duration, lesson_count)
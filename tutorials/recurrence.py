@@ -0,0 +1,226 @@
+"""Closed-form recurrence rules used to generate allocated lesson dates."""
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from .models import TermCalendar
+from .versions import bump_version, current_version
+
+DAY_NUMBERS = {
+    'Monday': 0,
+    'Tuesday': 1,
+    'Wednesday': 2,
+    'Thursday': 3,
+    'Friday': 4,
+    'Saturday': 5,
+    'Sunday': 6,
+}
+
+FREQUENCY_DAYS = {
+    'Weekly': 7,
+    'Bi-Weekly': 14,
+    'Monthly': 28,
+}
+
+
+DEFAULT_TERMS = {
+    'Sept-Christmas': ((9, 1), (12, 25)),
+    'Jan-Easter': ((1, 1), (4, 15)),
+    'March-June': ((3, 1), (6, 30)),
+}
+
+TERM_CALENDAR_VERSION = 'term_calendar_version'
+
+_term_calendars = None
+_term_calendars_version = None
+
+
+def term_calendars():
+    """
+    Return the stored term calendars, keyed by (term, year).
+
+    Each value is a (start_date, end_date, excluded_dates) tuple where
+    excluded_dates is a frozenset. Calendars are loaded from the database on
+    first use and kept in this process until clear_term_calendar_cache() is
+    called, which happens whenever a calendar or exclusion is saved or deleted
+    in this process, or refresh_term_calendars() finds that another process
+    has changed them.
+    """
+
+    global _term_calendars
+    if _term_calendars is None:
+        calendars = {}
+        for calendar in TermCalendar.objects.prefetch_related('exclusions'):
+            excluded = frozenset(
+                exclusion.start_date + timedelta(days=offset)
+                for exclusion in calendar.exclusions.all()
+                for offset in range((exclusion.end_date - exclusion.start_date).days + 1)
+            )
+            calendars[(calendar.term, calendar.year)] = (calendar.start_date, calendar.end_date, excluded)
+        _term_calendars = calendars
+    return _term_calendars
+
+
+def clear_term_calendar_cache():
+    """Forget the cached term calendars so that they are reloaded on next use."""
+
+    global _term_calendars
+    _term_calendars = None
+
+
+def term_calendars_changed():
+    """Forget the cached term calendars in this process, and tell every other process to do the same."""
+
+    clear_term_calendar_cache()
+    bump_version(TERM_CALENDAR_VERSION)
+
+
+def refresh_term_calendars():
+    """
+    Forget the cached term calendars if they have changed since they were loaded.
+
+    Changes are tracked by a version kept in the shared cache, so this costs
+    one cache read. Call it where a piece of work starts, such as a request
+    that allocates lessons, rather than for every date worked out.
+    """
+
+    global _term_calendars, _term_calendars_version
+    version = current_version(TERM_CALENDAR_VERSION)
+    if version != _term_calendars_version:
+        _term_calendars = None
+        _term_calendars_version = version
+
+
+def _term_dates(term, year):
+    """Return the (start, end, excluded_dates) of a term in a year, falling back to the defaults."""
+
+    calendar = term_calendars().get((term, year))
+    if calendar is not None:
+        return calendar
+    (start_month, start_day), (end_month, end_day) = DEFAULT_TERMS[term]
+    return date(year, start_month, start_day), date(year, end_month, end_day), frozenset()
+
+
+def get_term_calendar(term, date_created):
+    """
+    Return the (start, end, excluded_dates) of the next occurrence of a term.
+
+    This is the term in the year the request was created, or the following
+    year if that term has already ended.
+    """
+
+    if not isinstance(date_created, datetime):
+        raise TypeError("date_created must be a datetime object")
+    if term not in DEFAULT_TERMS:
+        raise ValueError(f"Unknown term: {term}")
+
+    # Ensure date_created is offset-naive
+    if date_created.tzinfo is not None:
+        date_created = date_created.replace(tzinfo=None)  # Remove timezone info
+
+    current_year = date_created.year
+    calendar = _term_dates(term, current_year)
+
+    # If the term has already passed this year, set it for next year
+    if date_created > datetime.combine(calendar[1], time()):
+        calendar = _term_dates(term, current_year + 1)
+    return calendar
+
+
+def get_term_date_range(term, date_created):
+    """Return the (start, end) datetimes of the next occurrence of a term."""
+
+    start, end, _ = get_term_calendar(term, date_created)
+    return datetime.combine(start, time()), datetime.combine(end, time())
+
+
+def get_term_creation_range(term, year):
+    """
+    Return the (after, until) datetimes between which requests for a term in a year were created.
+
+    get_term_calendar() gives a request the term in the year it was created,
+    or the next year once that term has ended, so the requests for a term in
+    a year are those created after it ended the year before, up to the end
+    of the term.
+    """
+
+    if term not in DEFAULT_TERMS:
+        raise ValueError(f"Unknown term: {term}")
+    _, previous_end, _ = _term_dates(term, year - 1)
+    _, end, _ = _term_dates(term, year)
+    return datetime.combine(previous_end, time()), datetime.combine(end, time())
+
+
+def _as_date(value):
+    """Return the date part of a date or datetime."""
+
+    return value.date() if isinstance(value, datetime) else value
+
+
+@lru_cache(maxsize=4096)
+def occurrence_dates(start, end, day_of_the_week, frequency):
+    """
+    Return every date on day_of_the_week between start and end (inclusive),
+    repeating at the given frequency.
+
+    The first matching day and the number of occurrences are computed
+    arithmetically, so the cost is proportional to the number of dates
+    returned rather than the number of days in the range. Results are
+    cached, so requests that share a term, day and frequency reuse the
+    same series.
+    """
+
+    try:
+        weekday = DAY_NUMBERS[day_of_the_week]
+    except KeyError:
+        raise ValueError(f"Unknown day: {day_of_the_week}") from None
+    try:
+        step = FREQUENCY_DAYS[frequency]
+    except KeyError:
+        raise ValueError(f"Unknown frequency: {frequency}") from None
+
+    start, end = _as_date(start), _as_date(end)
+    first = start + timedelta(days=(weekday - start.weekday()) % 7)
+    if first > end:
+        return ()
+    count = (end - first).days // step + 1
+    return tuple(first + timedelta(days=step * i) for i in range(count))
+
+
+def lesson_request_dates(lesson_request):
+    """Return the occurrence dates for a lesson request's term, day and frequency."""
+
+    term_start, term_end, excluded = get_term_calendar(lesson_request.term, lesson_request.date_created)
+    dates = occurrence_dates(term_start, term_end, lesson_request.day_of_the_week, lesson_request.frequency)
+    if excluded:
+        dates = tuple(lesson_date for lesson_date in dates if lesson_date not in excluded)
+    return dates
+
+
+def bulk_lesson_request_dates(lesson_requests, errors=None):
+    """
+    Return a dict mapping each lesson request's pk to its occurrence dates.
+
+    Requests are grouped by (term range, day, frequency) so that each distinct
+    series is generated once, however many requests share it. A request whose
+    term, day or frequency is invalid raises ValueError, unless errors is a
+    dict, in which case the error is stored there under the request's pk and
+    the request is left out of the result.
+    """
+
+    series = {}
+    dates_by_request = {}
+    for lesson_request in lesson_requests:
+        try:
+            term_start, term_end, excluded = get_term_calendar(lesson_request.term, lesson_request.date_created)
+            key = (term_start, term_end, lesson_request.day_of_the_week, lesson_request.frequency, excluded)
+            if key not in series:
+                dates = occurrence_dates(*key[:4])
+                if excluded:
+                    dates = tuple(lesson_date for lesson_date in dates if lesson_date not in excluded)
+                series[key] = dates
+        except ValueError as error:
+            if errors is None:
+                raise
+            errors[lesson_request.pk] = error
+            continue
+        dates_by_request[lesson_request.pk] = series[key]
+    return dates_by_request
@@ -0,0 +1,118 @@
+"""Composable filters and full-text search over lesson requests."""
+import re
+from functools import reduce
+from operator import or_
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Exists, OuterRef, Q
+from django.db.models.expressions import RawSQL
+from .models import LessonRequest, Invoice
+
+# FTS5 table of each request's description and student name, kept up to date by triggers (see migration 0010)
+SEARCH_TABLE = 'tutorials_lessonrequest_search'
+FACETS_CACHE_KEY = 'lesson_request_facets'
+
+
+def _has_invoice(**filters):
+    return Q(Exists(Invoice.objects.filter(lesson_request=OuterRef('pk'), **filters)))
+
+
+STATUS_FILTERS = {
+    'allocated': Q(status='allocated'),
+    'unallocated': ~Q(status='allocated'),
+}
+
+# Invoice conditions are EXISTS subqueries, so requests with several invoices are not repeated
+INVOICE_FILTERS = {
+    'paid': _has_invoice(is_paid=True),
+    'unpaid': _has_invoice(is_paid=False),
+    'invoice_generated': _has_invoice(),
+    'no_invoice_generated': ~_has_invoice(),
+}
+
+
+def legacy_filter_params(params):
+    """Return a copy of the query parameters with an old-style ?filter= value turned into a status or invoice filter."""
+
+    params = params.copy()
+    legacy = params.pop('filter', [''])[-1]
+    if legacy in STATUS_FILTERS:
+        params.appendlist('status', legacy)
+    elif legacy in INVOICE_FILTERS:
+        params.appendlist('invoice', legacy)
+    return params
+
+
+def search_lesson_requests(queryset, text):
+    """
+    Narrow queryset to the requests whose description or student name contains every word of text.
+
+    Each word matches as a prefix. On SQLite the words are looked up in the
+    FTS5 index; other databases fall back to a case-insensitive scan.
+    """
+
+    words = re.findall(r'\w+', text)
+    if not words:
+        return queryset
+    if connection.vendor == 'sqlite':
+        # Quoting each word keeps FTS5 operators in the text from being interpreted
+        match = ' '.join(f'"{word}"*' for word in words)
+        return queryset.filter(pk__in=RawSQL(f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s', [match]))
+    for word in words:
+        queryset = queryset.filter(
+            Q(description__icontains=word)
+            | Q(student_id__first_name__icontains=word)
+            | Q(student_id__last_name__icontains=word)
+        )
+    return queryset
+
+
+def filter_lesson_requests(queryset, filters):
+    """
+    Narrow queryset by the cleaned data of a LessonRequestFilterForm.
+
+    The values chosen for one filter are alternatives, while different
+    filters must all match. Everything is combined into the WHERE clause of
+    a single query.
+    """
+
+    condition = Q()
+    for name, options in (('status', STATUS_FILTERS), ('invoice', INVOICE_FILTERS)):
+        if filters.get(name):
+            condition &= reduce(or_, (options[value] for value in filters[name]))
+    if filters.get('language'):
+        condition &= Q(language__in=filters['language'])
+    if filters.get('term'):
+        condition &= Q(term__in=filters['term'])
+    if filters.get('tutor'):
+        condition &= Q(tutor_id__in=filters['tutor'])
+    queryset = queryset.filter(condition)
+    if filters.get('q'):
+        queryset = search_lesson_requests(queryset, filters['q'])
+    return queryset
+
+
+def request_facets():
+    """
+    Return the number of lesson requests each status and invoice filter matches.
+
+    Every count comes from one conditional aggregate over the requests
+    left-joined to their invoices. Requests are counted distinctly, as the
+    join repeats a request once per invoice.
+    """
+
+    return LessonRequest.objects.aggregate(
+        allocated=Count('id', distinct=True, filter=Q(status='allocated')),
+        unallocated=Count('id', distinct=True, filter=~Q(status='allocated')),
+        paid=Count('id', distinct=True, filter=Q(invoice__is_paid=True)),
+        unpaid=Count('id', distinct=True, filter=Q(invoice__is_paid=False)),
+        invoice_generated=Count('id', distinct=True, filter=Q(invoice__isnull=False)),
+        no_invoice_generated=Count('id', distinct=True, filter=Q(invoice__isnull=True)),
+    )
+
+
+def cached_request_facets():
+    """Return request_facets(), recomputed at most once every REQUEST_FACETS_CACHE_SECONDS."""
+
+    return cache.get_or_set(FACETS_CACHE_KEY, request_facets, settings.REQUEST_FACETS_CACHE_SECONDS)
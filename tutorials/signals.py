@@ -0,0 +1,87 @@
+"""Signal handlers that keep caches and denormalised counts in step with the database."""
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from .dashboard_cache import invalidate_dashboards
+from .invoices import adjust_unpaid_invoices, invoice_deltas
+from .models import TermCalendar, TermExclusion, LessonRequest, AllocatedLesson, Invoice, PricingRule
+from .pricing import pricing_rules_changed
+from .recurrence import term_calendars_changed
+
+
+@receiver([post_save, post_delete], sender=TermCalendar)
+@receiver([post_save, post_delete], sender=TermExclusion)
+def term_calendar_changed(sender, **kwargs):
+    """Reload term calendars, in every process, after a change and again once it is committed."""
+
+    term_calendars_changed()
+    transaction.on_commit(term_calendars_changed)
+
+
+@receiver([post_save, post_delete], sender=PricingRule)
+def pricing_rule_changed(sender, **kwargs):
+    """Reload pricing rules, in every process, after a change and again once it is committed."""
+
+    pricing_rules_changed()
+    transaction.on_commit(pricing_rules_changed)
+
+
+@receiver([post_save, post_delete], sender=AllocatedLesson)
+@receiver([post_save, post_delete], sender=LessonRequest)
+def lessons_changed(sender, instance, **kwargs):
+    """Discard the cached dashboards of the student and tutor of a lesson or request."""
+
+    invalidate_dashboards([instance.student_id_id, instance.tutor_id_id])
+
+
+@receiver(post_init, sender=Invoice)
+def remember_invoice_state(sender, instance, **kwargs):
+    """Note the request and paid flag an invoice was loaded with, to tell what a save changes."""
+
+    instance._saved_state = (instance.lesson_request_id, instance.is_paid)
+
+
+@receiver(post_save, sender=Invoice)
+def invoice_saved(sender, instance, created, raw=False, **kwargs):
+    """Keep unpaid invoice counts and dashboards in step with a saved invoice."""
+
+    if raw:
+        return
+    before = None if created else instance._saved_state
+    instance._saved_state = (instance.lesson_request_id, instance.is_paid)
+    invoice_changed(before, instance._saved_state)
+
+
+@receiver(pre_delete, sender=Invoice)
+def invoice_deleted(sender, instance, **kwargs):
+    """
+    Keep unpaid invoice counts and dashboards in step with a deleted invoice.
+
+    This runs before the delete, inside its transaction, because when the
+    invoice is deleted along with its lesson request the request has gone by
+    the time post_delete is sent.
+    """
+
+    invoice_changed(instance._saved_state, None)
+
+
+def invoice_changed(before, after):
+    """
+    Adjust the unpaid invoice counts of the students affected by an invoice changing state.
+
+    before and after are the invoice's (lesson_request_id, is_paid) before
+    and after the change, or None if it did not exist.
+    """
+
+    if before == after:
+        return
+    lesson_request_ids = {state[0] for state in (before, after) if state is not None and state[0] is not None}
+    students = dict(LessonRequest.objects.filter(pk__in=lesson_request_ids).values_list('pk', 'student_id'))
+
+    def student_state(state):
+        if state is None or state[0] not in students:
+            return None
+        return students[state[0]], state[1]
+
+    adjust_unpaid_invoices(invoice_deltas([student_state(before)], [student_state(after)]))
+    invalidate_dashboards(students.values())
@@ -0,0 +1,54 @@
+from datetime import date
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError
+from django.test import TestCase
+from tutorials.models import TermCalendar, TermExclusion
+from tutorials.recurrence import clear_term_calendar_cache, term_calendars
+
+
+class TermCalendarModelTestCase(TestCase):
+    """Unit tests for the TermCalendar and TermExclusion models."""
+
+    def setUp(self):
+        clear_term_calendar_cache()
+        self.addCleanup(clear_term_calendar_cache)
+        self.calendar = TermCalendar.objects.create(
+            term='Sept-Christmas', year=2025, start_date=date(2025, 9, 3), end_date=date(2025, 12, 19)
+        )
+
+    def test_valid_calendar(self):
+        self.calendar.full_clean()
+
+    def test_start_date_cannot_be_after_end_date(self):
+        self.calendar.start_date = date(2025, 12, 20)
+        with self.assertRaises(ValidationError):
+            self.calendar.full_clean()
+
+    def test_term_must_be_a_valid_choice(self):
+        self.calendar.term = 'Summer'
+        with self.assertRaises(ValidationError):
+            self.calendar.full_clean()
+
+    def test_one_calendar_per_term_and_year(self):
+        with self.assertRaises(IntegrityError):
+            TermCalendar.objects.create(
+                term='Sept-Christmas', year=2025, start_date=date(2025, 9, 1), end_date=date(2025, 12, 25)
+            )
+
+    def test_exclusion_start_date_cannot_be_after_end_date(self):
+        exclusion = TermExclusion(calendar=self.calendar, start_date=date(2025, 10, 31), end_date=date(2025, 10, 27))
+        with self.assertRaises(ValidationError):
+            exclusion.full_clean()
+
+    def test_cache_is_loaded_once_and_refreshed_on_change(self):
+        self.assertEqual(term_calendars()[('Sept-Christmas', 2025)][:2], (date(2025, 9, 3), date(2025, 12, 19)))
+        with self.assertNumQueries(0):
+            term_calendars()
+
+        TermExclusion.objects.create(calendar=self.calendar, start_date=date(2025, 10, 27),
+                                     end_date=date(2025, 10, 31), description='Half term')
+        excluded = term_calendars()[('Sept-Christmas', 2025)][2]
+        self.assertEqual(excluded, frozenset(date(2025, 10, day) for day in range(27, 32)))
+
+        self.calendar.delete()
+        self.assertNotIn(('Sept-Christmas', 2025), term_calendars())
@@ -0,0 +1,227 @@
+"""Unit tests for batch allocation of lesson requests."""
+from datetime import date, time
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from tutorials.allocation import allocate_lesson_requests, find_conflicts, sync_allocated_lessons, within_availability
+from tutorials.models import Schedule, LessonRequest, AllocatedLesson, TermCalendar, TermExclusion
+from tutorials.recurrence import clear_term_calendar_cache, term_calendars
+
+
+class AllocateLessonRequestsTestCase(TestCase):
+
+    fixtures = ['tutorials/tests/fixtures/default_user.json',
+                'tutorials/tests/fixtures/lesson_requests.json']
+
+    def test_allocates_valid_assignment(self):
+        report = allocate_lesson_requests([(2, 2, '09:30')])
+
+        self.assertTrue(report[0]['success'])
+        lesson_request = LessonRequest.objects.get(pk=2)
+        self.assertEqual(lesson_request.status, 'allocated')
+        self.assertEqual(lesson_request.tutor_id_id, 2)
+        lessons = AllocatedLesson.objects.filter(lesson_request=lesson_request)
+        self.assertEqual(lessons.count(), report[0]['lessons'])
+        self.assertTrue(all(lesson.tutor_id_id == 2 and lesson.date.weekday() == 2 for lesson in lessons))
+
+    def test_reports_each_failure_without_blocking_valid_assignments(self):
+        LessonRequest.objects.filter(pk=1).update(status='unallocated')
+        lesson_request = LessonRequest.objects.get(pk=2)
+        lesson_request.pk = None
+        lesson_request.save()
+        report = allocate_lesson_requests([
+            (99, 2, '09:00'),
+            (1, 3, '09:00'),
+            (2, 2, '9am'),
+            (lesson_request.pk, 2, '11:00'),
+            (lesson_request.pk, 2, '12:00'),
+        ])
+
+        self.assertEqual([result['success'] for result in report], [False, False, False, False, False])
+        self.assertEqual(report[0]['message'], "Lesson request does not exist.")
+        self.assertEqual(report[1]['message'], "Selected user is not a tutor.")
+        self.assertEqual(report[2]['message'], "Start time must be in HH:MM format.")
+        self.assertEqual(report[3]['message'], "Lesson request is assigned more than once.")
+        self.assertFalse(AllocatedLesson.objects.exists())
+
+        report = allocate_lesson_requests([(1, 3, '09:00'), (2, 2, '11:00')])
+        self.assertEqual([result['success'] for result in report], [False, True])
+        self.assertEqual(LessonRequest.objects.get(pk=1).status, 'unallocated')
+        self.assertEqual(LessonRequest.objects.get(pk=2).status, 'allocated')
+
+    def test_rejects_already_allocated_request(self):
+        report = allocate_lesson_requests([(1, 2, '10:00')])
+        self.assertFalse(report[0]['success'])
+        self.assertEqual(report[0]['message'], "Lesson request is already allocated.")
+
+    def test_rejects_invalid_term(self):
+        LessonRequest.objects.filter(pk=2).update(term='Sept-Dec')
+        report = allocate_lesson_requests([(2, 2, '10:00')])
+        self.assertFalse(report[0]['success'])
+        self.assertEqual(report[0]['message'], "Unknown term: Sept-Dec.")
+
+    def test_writes_in_a_constant_number_of_queries(self):
+        LessonRequest.objects.filter(pk=1).update(status='unallocated')
+        # The term calendars are read afresh by every batch, with one query
+        with self.assertNumQueries(11):
+            allocate_lesson_requests([(1, 2, '10:00'), (2, 2, '11:00')])
+        self.assertEqual(LessonRequest.objects.filter(status='allocated').count(), 2)
+
+    def test_chunks_are_committed_and_reported_one_at_a_time(self):
+        LessonRequest.objects.filter(pk=1).update(status='unallocated')
+        assignments = [(1, 2, '10:00'), (2, 2, '11:00'), (2, 2, '12:00')]
+        seen = []
+        report = allocate_lesson_requests(assignments, chunk_size=1, on_chunk=lambda report: seen.append(len(report)))
+        self.assertEqual(seen, [1, 2, 3])
+        self.assertTrue(report[0]['success'])
+        # Repeated assignments are rejected even when they fall in different chunks
+        self.assertEqual([result['message'] for result in report[1:]], ["Lesson request is assigned more than once."] * 2)
+
+        LessonRequest.objects.filter(pk=1).update(status='unallocated')
+        report = allocate_lesson_requests([(1, 2, '10:00'), (2, 2, '11:00')], chunk_size=1, start=1)
+        self.assertEqual([result['lesson_request_id'] for result in report], [2])
+        self.assertEqual(LessonRequest.objects.get(pk=1).status, 'unallocated')
+
+    def test_uses_term_calendars_changed_by_another_process(self):
+        term_calendars()
+        self.addCleanup(clear_term_calendar_cache)
+        # bulk_create sends no signals, like a change saved in another process
+        calendar = TermCalendar.objects.bulk_create([TermCalendar(
+            term='Jan-Easter', year=2025, start_date=date(2025, 1, 6), end_date=date(2025, 3, 28)
+        )])[0]
+        TermExclusion.objects.bulk_create([TermExclusion(
+            calendar=calendar, start_date=date(2025, 2, 17), end_date=date(2025, 2, 21), description='Half term'
+        )])
+        allocate_lesson_requests([(2, 2, '10:00')])
+        dates = list(AllocatedLesson.objects.order_by('occurrence').values_list('date', flat=True))
+        self.assertEqual(dates[0], date(2025, 1, 8))
+        self.assertEqual(dates[-1], date(2025, 3, 19))
+        self.assertNotIn(date(2025, 2, 19), dates)
+
+
+class AllocateRequestsCommandTestCase(TestCase):
+
+    fixtures = ['tutorials/tests/fixtures/default_user.json',
+                'tutorials/tests/fixtures/lesson_requests.json']
+
+    def test_command_allocates_assignments(self):
+        out = StringIO()
+        call_command('allocate_requests', '2:2:10:00', stdout=out)
+        self.assertIn("1 of 1 lesson requests allocated.", out.getvalue())
+        self.assertEqual(LessonRequest.objects.get(pk=2).status, 'allocated')
+
+    def test_command_rejects_malformed_assignment(self):
+        with self.assertRaises(CommandError):
+            call_command('allocate_requests', '2-2', stdout=StringIO())
+
+    def test_command_requires_assignments(self):
+        with self.assertRaises(CommandError):
+            call_command('allocate_requests', stdout=StringIO())
+
+
+class FindConflictsTestCase(TestCase):
+
+    fixtures = ['tutorials/tests/fixtures/default_user.json',
+                'tutorials/tests/fixtures/lesson_requests.json',
+                'tutorials/tests/fixtures/allocated_lessons.json']
+
+    def test_reports_overlapping_existing_lessons_in_one_query(self):
+        with self.assertNumQueries(1):
+            conflicts = find_conflicts([
+                (2, [date(2024, 12, 2), date(2024, 12, 9), date(2024, 12, 30)], time(10, 30), 60),
+                (2, [date(2024, 12, 2)], time(11, 0), 60),
+                (3, [date(2024, 12, 2)], time(10, 0), 60),
+            ])
+        self.assertEqual(conflicts, [[date(2024, 12, 2), date(2024, 12, 9)], [], []])
+
+    def test_ignores_lessons_of_excluded_requests(self):
+        conflicts = find_conflicts([(2, [date(2024, 12, 2)], time(10, 0), 60)],
+                                   exclude_lesson_requests=[1])
+        self.assertEqual(conflicts, [[]])
+
+    def test_earlier_proposals_block_later_ones(self):
+        conflicts = find_conflicts([
+            (2, [date(2025, 1, 6)], time(9, 0), 120),
+            (2, [date(2025, 1, 6)], time(10, 0), 60),
+        ])
+        self.assertEqual(conflicts, [[], [date(2025, 1, 6)]])
+
+    def test_no_dates_needs_no_query(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(find_conflicts([(2, (), time(9, 0), 60)]), [[]])
+
+    def test_batch_allocation_rejects_double_booking(self):
+        LessonRequest.objects.filter(pk=2).update(term='Sept-Christmas', day_of_the_week='Monday',
+                                                  date_created='2024-06-01T00:00:00Z')
+        report = allocate_lesson_requests([(2, 2, '10:00')])
+        self.assertFalse(report[0]['success'])
+        self.assertIn("@janedoe is already booked on 2024-12-09.", report[0]['message'])
+
+
+class WithinAvailabilityTestCase(TestCase):
+
+    fixtures = ['tutorials/tests/fixtures/default_user.json']
+
+    def test_checks_schedule_windows(self):
+        Schedule.objects.create(user_id=2, day_of_week='Monday', start_time=time(9), end_time=time(12))
+        self.assertEqual(
+            within_availability([
+                (2, 'Monday', time(10), 120),
+                (2, 'Monday', time(11), 120),
+                (2, 'Tuesday', time(10), 60),
+            ]),
+            [True, False, False]
+        )
+
+
+class SyncAllocatedLessonsTestCase(TestCase):
+
+    fixtures = ['tutorials/tests/fixtures/default_user.json',
+                'tutorials/tests/fixtures/lesson_requests.json',
+                'tutorials/tests/fixtures/allocated_lessons.json']
+
+    def setUp(self):
+        self.lesson_request = LessonRequest.objects.get(pk=1)
+        AllocatedLesson.objects.update(student_id=self.lesson_request.student_id)
+        self.dates = [date(2024, 12, 2), date(2024, 12, 9), date(2024, 12, 16)]
+
+    def test_unchanged_plan_writes_nothing(self):
+        with self.assertNumQueries(1):
+            counts = sync_allocated_lessons([(self.lesson_request, time(10, 0), self.dates)])
+        self.assertEqual(counts, {'created': 0, 'updated': 0, 'deleted': 0})
+
+    def test_field_changes_are_one_update_and_keep_ids(self):
+        # One query reads the lessons, one invalidates the dashboards and one updates the lessons
+        with self.assertNumQueries(3):
+            counts = sync_allocated_lessons([(self.lesson_request, time(14, 0), self.dates)])
+        self.assertEqual(counts, {'created': 0, 'updated': 3, 'deleted': 0})
+        self.assertEqual(
+            list(AllocatedLesson.objects.order_by('id').values_list('id', 'time')),
+            [(1, time(14, 0)), (2, time(14, 0)), (3, time(14, 0))]
+        )
+
+    def test_only_changed_occurrences_are_inserted_or_deleted(self):
+        dates = [date(2024, 12, 2), date(2024, 12, 9), date(2024, 12, 23), date(2024, 12, 30)]
+        counts = sync_allocated_lessons([(self.lesson_request, time(10, 0), dates)])
+        self.assertEqual(counts, {'created': 2, 'updated': 0, 'deleted': 1})
+        lessons = AllocatedLesson.objects.order_by('occurrence')
+        self.assertEqual([lesson.date for lesson in lessons], dates)
+        self.assertEqual([lesson.id for lesson in lessons][:2], [1, 2])
+        self.assertFalse(AllocatedLesson.objects.filter(id=3).exists())
+
+    def test_removing_an_early_date_renumbers_later_lessons_in_place(self):
+        dates = [date(2024, 12, 9), date(2024, 12, 16)]
+        counts = sync_allocated_lessons([(self.lesson_request, time(10, 0), dates)])
+        self.assertEqual(counts, {'created': 0, 'updated': 2, 'deleted': 1})
+        self.assertEqual(list(AllocatedLesson.objects.order_by('occurrence').values_list('id', 'occurrence', 'date')),
+                         [(2, 1, dates[0]), (3, 2, dates[1])])
+
+    def test_adding_an_early_date_renumbers_later_lessons_in_place(self):
+        dates = [date(2024, 11, 25)] + self.dates
+        with self.assertNumQueries(5):
+            counts = sync_allocated_lessons([(self.lesson_request, time(10, 0), dates)])
+        self.assertEqual(counts, {'created': 1, 'updated': 3, 'deleted': 0})
+        lessons = AllocatedLesson.objects.order_by('occurrence')
+        self.assertEqual([lesson.date for lesson in lessons], dates)
+        self.assertEqual([lesson.id for lesson in lessons][1:], [1, 2, 3])
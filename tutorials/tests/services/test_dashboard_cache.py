@@ -0,0 +1,78 @@
+"""Tests for the per-user dashboard cache."""
+from datetime import time
+from django.core.cache import cache, caches
+from django.core.cache.backends.db import DatabaseCache
+from django.test import TestCase
+from tutorials import jobs
+from tutorials.allocation import sync_allocated_lessons
+from tutorials.dashboard_cache import cached_dashboard_fragment, dashboard_cache_version, invalidate_dashboards
+from tutorials.models import LessonRequest, Invoice
+
+
+class DashboardCacheTestCase(TestCase):
+
+    fixtures = ['tutorials/tests/fixtures/default_user.json',
+                'tutorials/tests/fixtures/lesson_requests.json',
+                'tutorials/tests/fixtures/allocated_lessons.json',
+                'tutorials/tests/fixtures/invoices.json']
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_fragment_is_computed_once_per_version(self):
+        calls = []
+        compute = lambda: calls.append(1) or len(calls)
+        self.assertEqual(cached_dashboard_fragment(3, 'test', compute, 'page'), 1)
+        self.assertEqual(cached_dashboard_fragment(3, 'test', compute, 'page'), 1)
+        self.assertEqual(cached_dashboard_fragment(3, 'test', compute, 'other page'), 2)
+        invalidate_dashboards([3])
+        self.assertEqual(cached_dashboard_fragment(3, 'test', compute, 'page'), 3)
+
+    def test_invalidation_only_affects_given_users(self):
+        versions = {user_id: dashboard_cache_version(user_id) for user_id in (1, 2, 3)}
+        invalidate_dashboards([2, 3, None])
+        self.assertEqual(dashboard_cache_version(1), versions[1])
+        self.assertNotEqual(dashboard_cache_version(2), versions[2])
+        self.assertNotEqual(dashboard_cache_version(3), versions[3])
+
+    def test_evicted_version_does_not_reuse_old_fragments(self):
+        version = dashboard_cache_version(3)
+        cache.delete('dashboard_version:3')
+        self.assertNotEqual(dashboard_cache_version(3), version)
+
+    def test_invoice_changes_invalidate_the_student(self):
+        student_id = LessonRequest.objects.get(pk=2).student_id_id
+        version = dashboard_cache_version(student_id)
+        Invoice.objects.get(pk=2).delete()
+        self.assertNotEqual(dashboard_cache_version(student_id), version)
+
+    def test_bulk_lesson_changes_invalidate_old_and_new_users(self):
+        lesson_request = LessonRequest.objects.get(pk=1)
+        versions = {user_id: dashboard_cache_version(user_id) for user_id in (1, 2, 3)}
+        sync_allocated_lessons([(lesson_request, time(11, 0), [])])
+        # The request belongs to user 1 and is taught by user 2; its lessons were for user 3
+        for user_id in (1, 2, 3):
+            self.assertNotEqual(dashboard_cache_version(user_id), versions[user_id])
+
+    def test_repeated_invalidation_in_a_transaction_is_bumped_once(self):
+        dashboard_cache_version(3)
+        with self.assertNumQueries(1):
+            invalidate_dashboards([3])
+        with self.assertNumQueries(0):
+            invalidate_dashboards([3])
+        # Once the new version has been read, the next change must bump it again
+        version = dashboard_cache_version(3)
+        invalidate_dashboards([3])
+        self.assertNotEqual(dashboard_cache_version(3), version)
+
+    def test_job_run_by_the_worker_invalidates_dashboards(self):
+        # The worker runs in another process, which only sees the same cache if it is shared
+        self.assertIsInstance(caches['default'], DatabaseCache)
+        calls = []
+        compute = lambda: calls.append(1) or len(calls)
+        self.assertEqual(cached_dashboard_fragment(3, 'lessons', compute), 1)
+        jobs.enqueue('allocate_lesson_requests', {'assignments': [[2, 2, '10:00']]})
+        self.assertEqual(jobs.run_pending_jobs(), 1)
+        self.assertEqual(LessonRequest.objects.get(pk=2).status, 'allocated')
+        self.assertEqual(cached_dashboard_fragment(3, 'lessons', compute), 2)
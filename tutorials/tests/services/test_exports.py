@@ -0,0 +1,60 @@
+"""Tests for the data exports and the export_data command."""
+import csv
+import json
+import os
+from io import StringIO
+from tempfile import TemporaryDirectory
+from django.core.management import call_command
+from django.test import TestCase
+from tutorials.exports import csv_export, export_rows, ndjson_export, write_export
+from tutorials.models import LessonRequest
+
+
+class ExportsTestCase(TestCase):
+
+    fixtures = ['tutorials/tests/fixtures/default_user.json',
+                'tutorials/tests/fixtures/lesson_requests.json',
+                'tutorials/tests/fixtures/invoices.json']
+
+    def test_invoice_rows_have_student_and_tutor_names(self):
+        rows = list(export_rows('invoices'))
+        self.assertEqual([row['id'] for row in rows], [1, 2])
+        self.assertEqual(rows[0]['student_name'], 'John Doe')
+        self.assertEqual(rows[0]['tutor_name'], 'Jane Doe')
+        self.assertIsNone(rows[1]['tutor_name'])
+
+    def test_command_writes_to_stdout(self):
+        out = StringIO()
+        call_command('export_data', 'invoices', '--format', 'ndjson', stdout=out)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([row['amount'] for row in rows], ['150.00', '200.00'])
+
+    def test_command_writes_to_file(self):
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'requests.csv')
+            call_command('export_data', 'lesson_requests', '--output', path)
+            with open(path, newline='', encoding='utf-8') as file:
+                rows = list(csv.DictReader(file))
+        self.assertEqual([row['language'] for row in rows], ['Python', 'Java'])
+
+    def test_csv_cells_are_not_read_as_formulas(self):
+        LessonRequest.objects.filter(pk=1).update(description='=HYPERLINK("http://example.com")')
+        LessonRequest.objects.filter(pk=2).update(description='@SUM(A1)')
+        rows = list(csv.DictReader(csv_export('lesson_requests')))
+        self.assertEqual([row['description'] for row in rows], ['\'=HYPERLINK("http://example.com")', "'@SUM(A1)"])
+        self.assertEqual([row['language'] for row in rows], ['Python', 'Java'])
+        # Only the CSV is changed; the NDJSON keeps the text as it was entered
+        row = json.loads(next(ndjson_export('lesson_requests')))
+        self.assertEqual(row['description'], '=HYPERLINK("http://example.com")')
+
+    def test_write_export_counts_rows_and_reports_progress(self):
+        progress = []
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'invoices.csv')
+            rows = write_export('invoices', 'csv', path, progress=lambda done, total: progress.append((done, total)))
+            with open(path, newline='', encoding='utf-8') as file:
+                self.assertEqual([row['id'] for row in csv.DictReader(file)], ['1', '2'])
+            self.assertEqual(os.listdir(directory), ['invoices.csv'])
+        # The header is not counted, and two rows are less than a chunk
+        self.assertEqual(rows, 2)
+        self.assertEqual(progress, [])
@@ -0,0 +1,24 @@
+"""Tests for the iCalendar feed builder."""
+from django.test import SimpleTestCase
+from tutorials.ical import escape_text, fold_line
+
+
+class ICalendarTextTestCase(SimpleTestCase):
+
+    def test_escape_text(self):
+        self.assertEqual(escape_text('a,b;c\\d\ne'), r'a\,b\;c\\d\ne')
+
+    def test_short_lines_are_not_folded(self):
+        self.assertEqual(fold_line('SUMMARY:Python lesson'), 'SUMMARY:Python lesson\r\n')
+
+    def test_long_lines_are_folded_at_75_octets(self):
+        folded = fold_line('DESCRIPTION:' + 'x' * 200)
+        lines = folded.split('\r\n')[:-1]
+        self.assertTrue(all(len(line.encode()) <= 75 for line in lines))
+        self.assertTrue(all(line.startswith(' ') for line in lines[1:]))
+        self.assertEqual(''.join(line[1:] if i else line for i, line in enumerate(lines)), 'DESCRIPTION:' + 'x' * 200)
+
+    def test_folding_does_not_split_characters(self):
+        folded = fold_line('SUMMARY:' + 'é' * 100)
+        for line in folded.split('\r\n')[:-1]:
+            self.assertLessEqual(len(line.encode()), 75)
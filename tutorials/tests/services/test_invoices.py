@@ -0,0 +1,124 @@
+"""Tests for the per-student unpaid invoice counts."""
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from tutorials.invoices import delete_invoices, repair_invoice_summaries, set_invoices_paid, unpaid_invoice_count
+from tutorials.models import User, LessonRequest, Invoice, InvoiceSummary
+
+
+class UnpaidInvoiceCountTestCase(TestCase):
+
+    fixtures = ['tutorials/tests/fixtures/default_user.json',
+                'tutorials/tests/fixtures/lesson_requests.json',
+                'tutorials/tests/fixtures/invoices.json']
+
+    def setUp(self):
+        # Request 1 belongs to @johndoe and request 2 to @charlie
+        self.john = User.objects.get(pk=1)
+        self.charlie = User.objects.get(pk=3)
+
+    def _summary(self, student):
+        return InvoiceSummary.objects.get(student=student).unpaid_count
+
+    def test_summary_is_created_on_first_read(self):
+        self.assertFalse(InvoiceSummary.objects.exists())
+        self.assertEqual(unpaid_invoice_count(self.charlie), 1)
+        self.assertEqual(self._summary(self.charlie), 1)
+        with self.assertNumQueries(1):
+            self.assertEqual(unpaid_invoice_count(self.charlie), 1)
+
+    def test_creating_and_deleting_invoices(self):
+        unpaid_invoice_count(self.charlie)
+        invoice = Invoice.objects.create(lesson_request_id=2, amount='10.00')
+        Invoice.objects.create(lesson_request_id=2, amount='10.00', is_paid=True)
+        self.assertEqual(self._summary(self.charlie), 2)
+        invoice.delete()
+        self.assertEqual(self._summary(self.charlie), 1)
+
+    def test_toggling_paid(self):
+        unpaid_invoice_count(self.charlie)
+        invoice = Invoice.objects.get(pk=2)
+        invoice.is_paid = True
+        invoice.save()
+        self.assertEqual(self._summary(self.charlie), 0)
+        # Saving again without a change does not count twice
+        invoice.save()
+        self.assertEqual(self._summary(self.charlie), 0)
+        invoice.is_paid = False
+        invoice.save()
+        self.assertEqual(self._summary(self.charlie), 1)
+
+    def test_moving_an_invoice_to_another_students_request(self):
+        unpaid_invoice_count(self.charlie)
+        unpaid_invoice_count(self.john)
+        invoice = Invoice.objects.get(pk=2)
+        invoice.lesson_request_id = 1
+        invoice.save()
+        self.assertEqual(self._summary(self.charlie), 0)
+        self.assertEqual(self._summary(self.john), 1)
+
+    def test_deleting_a_lesson_request_removes_its_invoices_from_the_count(self):
+        unpaid_invoice_count(self.charlie)
+        LessonRequest.objects.get(pk=2).delete()
+        self.assertEqual(self._summary(self.charlie), 0)
+
+    def test_repair(self):
+        InvoiceSummary.objects.create(student=self.charlie, unpaid_count=7)
+        self.assertEqual(repair_invoice_summaries(), 2)
+        self.assertEqual(self._summary(self.charlie), 1)
+        self.assertEqual(self._summary(self.john), 0)
+        self.assertEqual(repair_invoice_summaries(), 0)
+
+    def test_repair_selected_students(self):
+        InvoiceSummary.objects.create(student=self.charlie, unpaid_count=7)
+        InvoiceSummary.objects.create(student=self.john, unpaid_count=7)
+        self.assertEqual(repair_invoice_summaries([self.charlie.pk]), 1)
+        self.assertEqual(self._summary(self.john), 7)
+
+    def test_repair_command(self):
+        InvoiceSummary.objects.create(student=self.charlie, unpaid_count=7)
+        out = StringIO()
+        call_command('repair_invoice_summaries', stdout=out)
+        self.assertIn("2 invoice summaries repaired.", out.getvalue())
+        self.assertEqual(self._summary(self.charlie), 1)
+
+    def test_set_invoices_paid_in_bulk(self):
+        unpaid_invoice_count(self.charlie)
+        unpaid_invoice_count(self.john)
+        Invoice.objects.create(lesson_request_id=2, amount='10.00')
+        self.assertEqual(self._summary(self.charlie), 2)
+
+        self.assertEqual(set_invoices_paid(Invoice.objects.values_list('pk', flat=True), True), 2)
+        self.assertFalse(Invoice.objects.filter(is_paid=False).exists())
+        self.assertEqual(self._summary(self.charlie), 0)
+        # Invoices already in the requested state are left alone
+        self.assertEqual(set_invoices_paid([1], True), 0)
+
+        self.assertEqual(set_invoices_paid([1, 2], False), 2)
+        self.assertEqual(self._summary(self.charlie), 1)
+        self.assertEqual(self._summary(self.john), 1)
+        self.assertEqual(repair_invoice_summaries(), 0)
+
+    def test_set_invoices_paid_is_one_update_of_invoices(self):
+        invoices = [Invoice.objects.create(lesson_request_id=2, amount='10.00').pk for _ in range(20)]
+        with self.assertNumQueries(5) as queries:
+            set_invoices_paid(invoices, True)
+        self.assertEqual(sum('UPDATE "tutorials_invoice"' in query['sql'] for query in queries.captured_queries), 1)
+
+    def test_delete_invoices_in_bulk(self):
+        unpaid_invoice_count(self.charlie)
+        unpaid_invoice_count(self.john)
+        extra = Invoice.objects.create(lesson_request_id=2, amount='10.00')
+        self.assertEqual(delete_invoices([1, 2, extra.pk, 999]), 3)
+        self.assertFalse(Invoice.objects.exists())
+        self.assertEqual(self._summary(self.charlie), 0)
+        self.assertEqual(self._summary(self.john), 0)
+        self.assertEqual(repair_invoice_summaries(), 0)
+        self.assertEqual(delete_invoices([1]), 0)
+
+    def test_delete_invoices_is_one_delete_of_invoices(self):
+        invoices = [Invoice.objects.create(lesson_request_id=2, amount='10.00').pk for _ in range(20)]
+        with self.assertNumQueries(5) as queries:
+            self.assertEqual(delete_invoices(invoices), 20)
+        self.assertEqual(sum('DELETE FROM "tutorials_invoice"' in query['sql'] for query in queries.captured_queries), 1)
+        self.assertEqual(Invoice.objects.count(), 2)
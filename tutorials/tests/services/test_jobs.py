@@ -0,0 +1,155 @@
+"""Tests for the background job queue."""
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils.timezone import now
+from tutorials import jobs
+from tutorials.models import Job, LessonRequest
+
+
+class JobQueueTestCase(TestCase):
+
+    fixtures = ['tutorials/tests/fixtures/default_user.json',
+                'tutorials/tests/fixtures/lesson_requests.json',
+                'tutorials/tests/fixtures/allocated_lessons.json']
+
+    def setUp(self):
+        self.calls = []
+
+        def record(job):
+            self.calls.append(job.payload)
+            job.set_progress(1, 2)
+            return {'seen': job.payload['value']}
+
+        def explode(job):
+            raise RuntimeError("Something went wrong")
+
+        jobs.register('test_record')(record)
+        jobs.register('test_explode')(explode)
+        self.addCleanup(jobs.HANDLERS.pop, 'test_record')
+        self.addCleanup(jobs.HANDLERS.pop, 'test_explode')
+
+    def test_enqueue_unknown_job(self):
+        with self.assertRaises(ValueError):
+            jobs.enqueue('no_such_job')
+
+    def test_enqueue_with_idempotency_key_returns_existing_job(self):
+        job = jobs.enqueue('test_record', {'value': 1}, idempotency_key='key')
+        again = jobs.enqueue('test_record', {'value': 2}, idempotency_key='key')
+        self.assertEqual(again.pk, job.pk)
+        self.assertEqual(again.payload, {'value': 1})
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_claim_takes_each_job_once(self):
+        job = jobs.enqueue('test_record', {'value': 1})
+        claimed = jobs.claim_next_job()
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertEqual(claimed.status, Job.RUNNING)
+        self.assertEqual(claimed.attempts, 1)
+        self.assertIsNone(jobs.claim_next_job())
+
+    def test_stalled_job_is_claimed_again(self):
+        job = jobs.enqueue('test_record', {'value': 1})
+        jobs.claim_next_job()
+        self.assertIsNone(jobs.claim_next_job())
+        Job.objects.update(heartbeat_at=now() - jobs.LEASE_TIMEOUT - timedelta(seconds=1))
+        claimed = jobs.claim_next_job()
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertEqual(claimed.attempts, 2)
+        self.assertIsNone(jobs.claim_next_job())
+
+    def test_stalled_job_without_attempts_left_fails(self):
+        job = jobs.enqueue('test_record', {'value': 1}, max_attempts=1)
+        jobs.claim_next_job()
+        Job.objects.update(heartbeat_at=now() - jobs.LEASE_TIMEOUT - timedelta(seconds=1))
+        self.assertIsNone(jobs.claim_next_job())
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn("stopped responding", job.error)
+
+    def test_progress_renews_the_heartbeat(self):
+        jobs.enqueue('test_record', {'value': 1})
+        job = jobs.claim_next_job()
+        Job.objects.update(heartbeat_at=now() - jobs.LEASE_TIMEOUT - timedelta(seconds=1))
+        job.set_progress(1, 4)
+        self.assertIsNone(jobs.claim_next_job())
+        job.refresh_from_db()
+        self.assertEqual(job.progress, 25)
+
+    def test_claim_skips_jobs_not_yet_due(self):
+        jobs.enqueue('test_record', {'value': 1})
+        Job.objects.update(run_after=now() + timedelta(minutes=5))
+        self.assertIsNone(jobs.claim_next_job())
+
+    def test_successful_job_stores_result(self):
+        job = jobs.enqueue('test_record', {'value': 7})
+        self.assertEqual(jobs.run_pending_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(job.result, {'seen': 7})
+        self.assertEqual(job.progress, 100)
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(self.calls, [{'value': 7}])
+
+    def test_failed_job_is_retried_later(self):
+        job = jobs.enqueue('test_explode')
+        jobs.run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.run_after, now())
+        self.assertIn("Something went wrong", job.error)
+
+    def test_job_fails_after_max_attempts(self):
+        job = jobs.enqueue('test_explode', max_attempts=2)
+        for _ in range(2):
+            Job.objects.filter(pk=job.pk).update(run_after=now())
+            jobs.run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertTrue(job.is_finished)
+
+    def test_allocation_job_result_is_json(self):
+        job = jobs.enqueue('allocate_lesson_requests', {'assignments': [[2, 2, '10:00'], [99, 2, '10:00']]})
+        jobs.run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual([result['success'] for result in job.result], [True, False])
+        self.assertEqual(LessonRequest.objects.get(pk=2).status, 'allocated')
+
+    def test_allocation_job_conflicts_are_stored_as_dates(self):
+        job = jobs.enqueue('allocate_lesson_requests', {'assignments': [[2, 2, '10:00']]})
+        LessonRequest.objects.filter(pk=2).update(term='Sept-Christmas', day_of_the_week='Monday', frequency='Weekly',
+                                                  date_created=now().replace(year=2024, month=12, day=1))
+        jobs.run_pending_jobs()
+        job.refresh_from_db()
+        self.assertFalse(job.result[0]['success'])
+        self.assertEqual(job.result[0]['conflicts'], ['2024-12-02', '2024-12-09', '2024-12-16'])
+
+    def test_allocation_job_carries_on_after_the_last_committed_chunk(self):
+        jobs.CHUNK_SIZE, chunk_size = 1, jobs.CHUNK_SIZE
+        self.addCleanup(setattr, jobs, 'CHUNK_SIZE', chunk_size)
+        LessonRequest.objects.filter(pk=1).update(status='unallocated')
+        job = jobs.enqueue('allocate_lesson_requests', {'assignments': [[1, 2, '10:00'], [2, 2, '11:00']]})
+        # An earlier attempt committed the first chunk before its worker died
+        committed = {'lesson_request_id': 1, 'success': True, 'message': "Allocated to @janedoe.",
+                     'lessons': 3, 'conflicts': []}
+        Job.objects.filter(pk=job.pk).update(result=[committed], progress=50)
+        jobs.run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(job.progress, 100)
+        self.assertEqual(job.result[0], committed)
+        self.assertTrue(job.result[1]['success'])
+        self.assertEqual(LessonRequest.objects.get(pk=1).status, 'unallocated')
+        self.assertEqual(LessonRequest.objects.get(pk=2).status, 'allocated')
+
+    def test_run_jobs_command(self):
+        jobs.enqueue('test_record', {'value': 1})
+        jobs.enqueue('test_record', {'value': 2})
+        out = StringIO()
+        call_command('run_jobs', '--once', stdout=out)
+        self.assertIn("2 jobs run.", out.getvalue())
+        self.assertEqual(Job.objects.filter(status=Job.SUCCEEDED).count(), 2)
@@ -0,0 +1,41 @@
+"""Tests for laying out lessons in week and month calendars."""
+from datetime import date
+from types import SimpleNamespace
+from django.test import SimpleTestCase
+from tutorials.lesson_calendar import calendar_window, group_by_day, parse_anchor
+
+
+class CalendarWindowTestCase(SimpleTestCase):
+
+    def test_week(self):
+        self.assertEqual(calendar_window('week', date(2024, 12, 12)),
+                         (date(2024, 12, 9), date(2024, 12, 15), date(2024, 12, 2), date(2024, 12, 16)))
+
+    def test_month_is_padded_to_whole_weeks(self):
+        self.assertEqual(calendar_window('month', date(2024, 12, 12)),
+                         (date(2024, 11, 25), date(2025, 1, 5), date(2024, 11, 1), date(2025, 1, 1)))
+
+    def test_unknown_view(self):
+        with self.assertRaises(ValueError):
+            calendar_window('year', date(2024, 12, 12))
+
+    def test_parse_anchor(self):
+        default = date(2024, 1, 1)
+        self.assertEqual(parse_anchor('2024-12-12', default), date(2024, 12, 12))
+        self.assertEqual(parse_anchor('12/12/2024', default), default)
+        self.assertEqual(parse_anchor(None, default), default)
+
+
+class GroupByDayTestCase(SimpleTestCase):
+
+    def test_lessons_are_placed_on_their_days(self):
+        lessons = [SimpleNamespace(date=date(2024, 12, day)) for day in (9, 11, 11, 15)]
+        weeks = group_by_day(lessons, date(2024, 12, 9), date(2024, 12, 15))
+        self.assertEqual(len(weeks), 1)
+        self.assertEqual([day for day, _ in weeks[0]], [date(2024, 12, day) for day in range(9, 16)])
+        self.assertEqual([len(day_lessons) for _, day_lessons in weeks[0]], [1, 0, 2, 0, 0, 0, 1])
+
+    def test_month_grid(self):
+        weeks = group_by_day([], date(2024, 11, 25), date(2025, 1, 5))
+        self.assertEqual(len(weeks), 6)
+        self.assertTrue(all(len(week) == 7 for week in weeks))
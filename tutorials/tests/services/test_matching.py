@@ -0,0 +1,186 @@
+"""Unit tests for the tutor matching engine."""
+from datetime import date, time, timedelta
+from io import StringIO
+from random import Random
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils.timezone import localdate, now
+from tutorials.matching import free_segments, match_requests, propose_allocations
+from tutorials.models import User, Tutor, Schedule, LessonRequest, AllocatedLesson
+from tutorials.recurrence import clear_term_calendar_cache, get_term_calendar, refresh_term_calendars
+
+JAN_EASTER = (date(2026, 1, 1), date(2026, 4, 15))
+MARCH_JUNE = (date(2026, 3, 1), date(2026, 6, 30))
+SEPT_CHRISTMAS = (date(2025, 9, 1), date(2025, 12, 25))
+
+
+class FreeSegmentsTestCase(TestCase):
+
+    def test_no_bookings_returns_whole_window(self):
+        self.assertEqual(free_segments(540, 720, []), [(540, 720)])
+
+    def test_bookings_split_window(self):
+        self.assertEqual(free_segments(540, 720, [(600, 660), (500, 560)]), [(560, 600), (660, 720)])
+
+    def test_fully_booked_window(self):
+        self.assertEqual(free_segments(540, 600, [(480, 660)]), [])
+
+
+class MatchRequestsTestCase(TestCase):
+
+    def test_matches_language_and_day(self):
+        requests = [
+            (1, *JAN_EASTER, 'Python', 'Monday', 60),
+            (2, *JAN_EASTER, 'Java', 'Monday', 60),
+            (3, *JAN_EASTER, 'Python', 'Tuesday', 60),
+        ]
+        windows = [
+            (10, 'Python', 'Monday', time(9), time(10)),
+            (11, 'Java', 'Tuesday', time(9), time(10)),
+        ]
+        proposals, unmatched = match_requests(requests, windows, [])
+        self.assertEqual(proposals, [{'lesson_request_id': 1, 'tutor_id': 10, 'start_time': '09:00'}])
+        self.assertEqual(unmatched, [2, 3])
+
+    def test_respects_window_capacity_and_lays_lessons_out_in_sequence(self):
+        requests = [(i, *JAN_EASTER, 'Python', 'Monday', 60) for i in range(1, 5)]
+        windows = [(10, 'Python', 'Monday', time(9), time(12))]
+        proposals, unmatched = match_requests(requests, windows, [])
+        self.assertEqual(unmatched, [4])
+        self.assertEqual(sorted(p['start_time'] for p in proposals), ['09:00', '10:00', '11:00'])
+
+    def test_existing_bookings_reduce_capacity_when_their_dates_overlap(self):
+        requests = [
+            (1, *JAN_EASTER, 'Python', 'Monday', 60),
+            (2, *SEPT_CHRISTMAS, 'Python', 'Monday', 60),
+        ]
+        windows = [(10, 'Python', 'Monday', time(9), time(10))]
+        bookings = [(10, 'Monday', time(9), 60, date(2026, 3, 2), date(2026, 6, 29))]
+        proposals, unmatched = match_requests(requests, windows, bookings)
+        self.assertEqual([p['lesson_request_id'] for p in proposals], [2])
+        self.assertEqual(unmatched, [1])
+
+    def test_requests_in_overlapping_terms_do_not_share_a_slot(self):
+        requests = [
+            (1, *JAN_EASTER, 'Python', 'Monday', 60),
+            (2, *MARCH_JUNE, 'Python', 'Monday', 60),
+            (3, *SEPT_CHRISTMAS, 'Python', 'Monday', 60),
+        ]
+        windows = [(10, 'Python', 'Monday', time(9), time(10))]
+        proposals, unmatched = match_requests(requests, windows, [])
+        self.assertEqual([p['lesson_request_id'] for p in proposals], [1, 3])
+        self.assertEqual(unmatched, [2])
+
+    def test_one_hour_lessons_keep_pairs_free_for_two_hour_lessons(self):
+        requests = [
+            (1, *JAN_EASTER, 'Python', 'Monday', 120),
+            (2, *JAN_EASTER, 'Python', 'Monday', 60),
+        ]
+        windows = [
+            (10, 'Python', 'Monday', time(9), time(11)),
+            (11, 'Python', 'Monday', time(9), time(10)),
+        ]
+        proposals, unmatched = match_requests(requests, windows, [])
+        self.assertEqual(unmatched, [])
+        assignment = {p['lesson_request_id']: p['tutor_id'] for p in proposals}
+        self.assertEqual(assignment, {1: 10, 2: 11})
+
+    def test_earlier_requests_win_when_capacity_is_short(self):
+        requests = [(7, *JAN_EASTER, 'Go', 'Friday', 60), (3, *JAN_EASTER, 'Go', 'Friday', 60)]
+        windows = [(10, 'Go', 'Friday', time(9), time(10))]
+        proposals, unmatched = match_requests(requests, windows, [])
+        self.assertEqual([p['lesson_request_id'] for p in proposals], [7])
+        self.assertEqual(unmatched, [3])
+
+    def test_large_term_is_matched_without_overbooking(self):
+        rng = Random(0)
+        languages = [choice for choice, _ in LessonRequest.LANGUAGE_CHOICES]
+        days = [choice for choice, _ in LessonRequest.DAY_CHOICES]
+        requests = [
+            (i, *SEPT_CHRISTMAS, rng.choice(languages), rng.choice(days), rng.choice([60, 120]))
+            for i in range(10000)
+        ]
+        windows = []
+        for tutor_id in range(1000):
+            subject = rng.choice(languages)
+            for day in rng.sample(days, 3):
+                start = rng.randint(8, 16)
+                windows.append((tutor_id, subject, day, time(start), time(start + rng.randint(1, 4))))
+
+        proposals, unmatched = match_requests(requests, windows, [])
+
+        self.assertEqual(len(proposals) + len(unmatched), len(requests))
+        requests_by_id = {request[0]: request for request in requests}
+        window_ranges = {}
+        for tutor_id, subject, day, start_time, end_time in windows:
+            window_ranges.setdefault((tutor_id, day), []).append((start_time.hour * 60, end_time.hour * 60))
+        booked = {}
+        for proposal in proposals:
+            _, _, _, _, day, duration = requests_by_id[proposal['lesson_request_id']]
+            start = int(proposal['start_time'][:2]) * 60 + int(proposal['start_time'][3:])
+            key = (proposal['tutor_id'], day)
+            self.assertTrue(any(low <= start and start + duration <= high for low, high in window_ranges[key]))
+            booked.setdefault(key, []).append((start, start + duration))
+        for intervals in booked.values():
+            intervals.sort()
+            for (_, previous_end), (next_start, _) in zip(intervals, intervals[1:]):
+                self.assertLessEqual(previous_end, next_start)
+        self.assertGreater(len(proposals), 0)
+
+
+class ProposeAllocationsTestCase(TestCase):
+
+    fixtures = ['tutorials/tests/fixtures/default_user.json',
+                'tutorials/tests/fixtures/lesson_requests.json']
+
+    def setUp(self):
+        self.tutor_user = User.objects.get(username='@janedoe')
+        Tutor.objects.create(user=self.tutor_user, subjects='Java')
+        Schedule.objects.create(user=self.tutor_user, day_of_week='Wednesday', start_time=time(13), end_time=time(16))
+        clear_term_calendar_cache()
+        self.addCleanup(clear_term_calendar_cache)
+
+    def test_proposes_from_database_in_constant_queries(self):
+        refresh_term_calendars()
+        clear_term_calendar_cache()
+        # The term calendar version is checked, then the requests, calendars, lessons and tutors are read
+        with self.assertNumQueries(5):
+            proposals, unmatched = propose_allocations()
+        self.assertEqual(proposals, [{'lesson_request_id': 2, 'tutor_id': self.tutor_user.id, 'start_time': '13:00'}])
+        self.assertEqual(unmatched, [])
+
+    def _book_wednesday_lesson(self, lesson_date):
+        lesson_request = LessonRequest.objects.get(pk=1)
+        lesson_request.day_of_the_week = 'Wednesday'
+        lesson_request.save()
+        AllocatedLesson.objects.create(
+            lesson_request=lesson_request, occurrence=1, date=lesson_date, time=time(13),
+            language='Python', student_id=lesson_request.student_id, tutor_id=self.tutor_user,
+        )
+
+    def test_allocated_lessons_block_availability(self):
+        LessonRequest.objects.filter(pk=2).update(date_created=now())
+        term_start, _, _ = get_term_calendar('Jan-Easter', now())
+        self._book_wednesday_lesson(term_start + timedelta(days=1))
+        proposals, _ = propose_allocations()
+        self.assertEqual(proposals[0]['start_time'], '14:00')
+
+    def test_lessons_outside_the_term_do_not_block_availability(self):
+        LessonRequest.objects.filter(pk=2).update(date_created=now())
+        term_start, _, _ = get_term_calendar('Jan-Easter', now())
+        self._book_wednesday_lesson(term_start - timedelta(days=30))
+        proposals, _ = propose_allocations()
+        self.assertEqual(proposals[0]['start_time'], '13:00')
+
+    def test_past_lessons_do_not_block_availability(self):
+        # Request 2 falls in the Jan-Easter term of 2025, which has passed
+        self._book_wednesday_lesson(date(2025, 1, 1))
+        self.assertLess(date(2025, 1, 1), localdate())
+        proposals, _ = propose_allocations()
+        self.assertEqual(proposals[0]['start_time'], '13:00')
+
+    def test_command_applies_proposals(self):
+        out = StringIO()
+        call_command('match_requests', '--apply', stdout=out)
+        self.assertIn("1 lesson requests matched, 0 without a suitable tutor.", out.getvalue())
+        self.assertEqual(LessonRequest.objects.get(pk=2).status, 'allocated')
@@ -0,0 +1,68 @@
+"""Tests for the admin dashboard figures."""
+from datetime import time, timedelta
+from decimal import Decimal
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils.timezone import localdate
+from tutorials.models import Schedule, LessonRequest, AllocatedLesson, Invoice
+from tutorials.overview import admin_overview, cached_admin_overview
+
+
+class AdminOverviewTestCase(TestCase):
+
+    fixtures = ['tutorials/tests/fixtures/default_user.json',
+                'tutorials/tests/fixtures/lesson_requests.json',
+                'tutorials/tests/fixtures/invoices.json']
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        today = localdate()
+        week_start = today - timedelta(days=today.weekday())
+        lesson_request = LessonRequest.objects.get(pk=1)
+        # Two lessons this week and one the week before
+        for occurrence, lesson_date in enumerate((week_start, week_start + timedelta(days=6),
+                                                  week_start - timedelta(days=1)), start=1):
+            AllocatedLesson.objects.create(lesson_request=lesson_request, occurrence=occurrence, date=lesson_date,
+                                           time=time(10, 0), language='Python', student_id_id=3, tutor_id_id=2)
+        Schedule.objects.create(user_id=2, day_of_week='Monday', start_time=time(9, 0), end_time=time(13, 0))
+        Schedule.objects.create(user_id=2, day_of_week='Friday', start_time=time(9, 0), end_time=time(10, 0))
+
+    def test_figures(self):
+        overview = admin_overview()
+        self.assertEqual(overview['total_requests'], 2)
+        self.assertEqual(overview['unallocated_requests'], 1)
+        self.assertEqual(overview['lessons_this_week'], 2)
+        self.assertEqual(overview['hours_this_week'], 2)
+        self.assertEqual(overview['unpaid_invoices'], 1)
+        self.assertEqual(overview['unpaid_total'], Invoice.objects.get(pk=2).amount)
+        self.assertEqual(overview['tutor_utilization'], [{
+            'tutor_id': 2,
+            'name': 'Jane Doe',
+            'booked_minutes': 120,
+            'available_minutes': 300,
+            'percent': 40,
+        }])
+
+    def test_empty_database(self):
+        AllocatedLesson.objects.all().delete()
+        Invoice.objects.all().delete()
+        Schedule.objects.all().delete()
+        overview = admin_overview()
+        self.assertEqual(overview['lessons_this_week'], 0)
+        self.assertEqual(overview['hours_this_week'], 0)
+        self.assertEqual(overview['unpaid_total'], Decimal('0.00'))
+        self.assertIsNone(overview['tutor_utilization'][0]['percent'])
+
+    def test_uses_a_few_aggregate_queries(self):
+        with self.assertNumQueries(6):
+            admin_overview()
+
+    def test_cached_overview_is_reused(self):
+        first = cached_admin_overview()
+        Invoice.objects.all().delete()
+        # The cache is kept in the database, so reading it back is one query
+        with self.assertNumQueries(1):
+            self.assertEqual(cached_admin_overview(), first)
+        cache.clear()
+        self.assertEqual(cached_admin_overview()['unpaid_invoices'], 0)
@@ -0,0 +1,100 @@
+"""Tests for keyset pagination."""
+from datetime import date, time
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from tutorials.models import AllocatedLesson, LessonRequest
+from tutorials.pagination import decode_cursor, encode_cursor, keyset_page
+
+
+class KeysetPageTestCase(TestCase):
+
+    fixtures = ['tutorials/tests/fixtures/default_user.json',
+                'tutorials/tests/fixtures/lesson_requests.json']
+
+    def setUp(self):
+        lesson_request = LessonRequest.objects.get(pk=1)
+        # Two lessons share each date so that ties are broken by time and then id
+        AllocatedLesson.objects.bulk_create(
+            AllocatedLesson(
+                lesson_request=lesson_request,
+                occurrence=i + 1,
+                date=date(2025, 1, 1 + i // 2),
+                time=time(10 if i % 3 else 9, 0),
+                language='Python',
+                student_id_id=3,
+                tutor_id_id=2,
+            )
+            for i in range(7)
+        )
+        self.lessons = AllocatedLesson.objects.all()
+        self.fields = ('date', 'time', 'id')
+
+    def _all_pages(self, size, descending=False):
+        pages = []
+        cursor = None
+        while True:
+            rows, cursor = keyset_page(self.lessons, self.fields, cursor, size=size, descending=descending)
+            pages.append(rows)
+            if cursor is None:
+                return pages
+
+    def test_pages_cover_every_row_once_in_order(self):
+        pages = self._all_pages(size=3)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        expected = list(self.lessons.order_by('date', 'time', 'id'))
+        self.assertEqual([lesson for page in pages for lesson in page], expected)
+
+    def test_descending_pages(self):
+        pages = self._all_pages(size=2, descending=True)
+        expected = list(self.lessons.order_by('-date', '-time', '-id'))
+        self.assertEqual([lesson for page in pages for lesson in page], expected)
+
+    def test_exact_last_page_has_no_cursor(self):
+        rows, cursor = keyset_page(self.lessons, self.fields, size=7)
+        self.assertEqual(len(rows), 7)
+        self.assertIsNone(cursor)
+
+    def test_each_page_is_one_query(self):
+        _, cursor = keyset_page(self.lessons, self.fields, size=2)
+        with self.assertNumQueries(1):
+            keyset_page(self.lessons, self.fields, cursor, size=2)
+
+    def test_cursor_round_trip(self):
+        cursor = encode_cursor((date(2025, 1, 2), time(9, 0), 12))
+        self.assertEqual(decode_cursor(cursor, 3), ['2025-01-02', '09:00:00', '12'])
+
+    def test_values_containing_separators_round_trip(self):
+        values = ['O|Brien, "Jr"', '\\|', '7']
+        self.assertEqual(decode_cursor(encode_cursor(values), 3), values)
+
+    def test_malformed_cursor(self):
+        for cursor in ('%%%', encode_cursor(('a', 'b')), encode_cursor(('not a date', '09:00', '1')),
+                       'bm90IGpzb24', 'eyJhIjoxfQ'):
+            with self.assertRaises(ValueError):
+                keyset_page(self.lessons, self.fields, cursor)
+
+    def test_fields_across_relations(self):
+        requests = LessonRequest.objects.select_related('student_id')
+        fields = ('student_id__last_name', 'id')
+        rows, cursor = keyset_page(requests, fields, size=1)
+        self.assertEqual(rows, [LessonRequest.objects.get(pk=1)])
+        rows, cursor = keyset_page(requests, fields, cursor, size=1)
+        self.assertEqual(rows, [LessonRequest.objects.get(pk=2)])
+        self.assertIsNone(cursor)
+
+    def test_sort_values_containing_the_old_separator(self):
+        LessonRequest.objects.filter(pk=1).update(student_id=3)
+        get_user_model().objects.filter(pk=3).update(last_name='Smith|Jones')
+        requests = LessonRequest.objects.select_related('student_id')
+        fields = ('student_id__last_name', 'id')
+        rows, cursor = keyset_page(requests, fields, size=1)
+        self.assertEqual([row.pk for row in rows], [1])
+        rows, cursor = keyset_page(requests, fields, cursor, size=1)
+        self.assertEqual([row.pk for row in rows], [2])
+        self.assertIsNone(cursor)
+
+    def test_values_rows(self):
+        rows, cursor = keyset_page(self.lessons.values('date', 'time', 'id'), self.fields, size=4)
+        rows, cursor = keyset_page(self.lessons.values('date', 'time', 'id'), self.fields, cursor, size=4)
+        self.assertEqual(len(rows), 3)
+        self.assertIsNone(cursor)
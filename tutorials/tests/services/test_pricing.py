@@ -0,0 +1,210 @@
+"""Tests for pricing rules and rule-based invoice generation."""
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils.timezone import now
+from tutorials import jobs
+from tutorials.invoices import generate_invoices, repair_invoice_summaries, unpaid_invoice_count
+from tutorials.models import User, LessonRequest, AllocatedLesson, Invoice, InvoiceSummary, PricingRule, TermCalendar
+from tutorials.pricing import (
+    PRICING_RULE_VERSION, clear_pricing_rule_cache, invoice_amount, load_pricing_rules, pricing_rules,
+    projected_invoice_amount,
+)
+from tutorials.recurrence import clear_term_calendar_cache
+from tutorials.versions import bump_version
+
+
+@override_settings(LESSON_HOURLY_RATE=Decimal('25.00'))
+class PricingRuleTestCase(TestCase):
+
+    def setUp(self):
+        clear_pricing_rule_cache()
+        self.addCleanup(clear_pricing_rule_cache)
+
+    def test_default_rate_without_rules(self):
+        self.assertEqual(invoice_amount((), 'Python', 120, 3), Decimal('150.00'))
+
+    def test_most_specific_rule_wins(self):
+        PricingRule.objects.create(hourly_rate=Decimal('30.00'))
+        PricingRule.objects.create(duration=120, hourly_rate=Decimal('28.00'))
+        PricingRule.objects.create(language='Python', hourly_rate=Decimal('40.00'))
+        rules = load_pricing_rules()
+        self.assertEqual(invoice_amount(rules, 'Python', 60, 1), Decimal('40.00'))
+        self.assertEqual(invoice_amount(rules, 'Java', 120, 1), Decimal('56.00'))
+        self.assertEqual(invoice_amount(rules, 'Java', 60, 1), Decimal('30.00'))
+
+    def test_volume_discount(self):
+        PricingRule.objects.create(hourly_rate=Decimal('30.00'))
+        PricingRule.objects.create(hourly_rate=Decimal('30.00'), min_lessons=10, discount_percent=Decimal('10'))
+        rules = load_pricing_rules()
+        self.assertEqual(invoice_amount(rules, 'Go', 60, 9), Decimal('270.00'))
+        self.assertEqual(invoice_amount(rules, 'Go', 60, 10), Decimal('270.00'))
+        self.assertEqual(invoice_amount(rules, 'Go', 90, 12), Decimal('486.00'))
+
+    def test_cached_rules_are_reloaded_after_a_change(self):
+        self.assertEqual(pricing_rules(), ())
+        # Only the shared version is read
+        with self.assertNumQueries(1):
+            pricing_rules()
+        rule = PricingRule.objects.create(hourly_rate=Decimal('30.00'))
+        self.assertEqual(pricing_rules(), (rule,))
+        rule.delete()
+        self.assertEqual(pricing_rules(), ())
+
+    def test_rules_changed_by_another_process_are_reloaded(self):
+        self.assertEqual(pricing_rules(), ())
+        # bulk_create sends no signals, so the change is only known through the shared version,
+        # as it is when a rule is saved in another process
+        rule = PricingRule.objects.bulk_create([PricingRule(hourly_rate=Decimal('30.00'))])[0]
+        self.assertEqual(pricing_rules(), ())
+        bump_version(PRICING_RULE_VERSION)
+        self.assertEqual(pricing_rules(), (rule,))
+
+    def test_projected_invoice_amount_uses_rules(self):
+        PricingRule.objects.create(language='Java', hourly_rate=Decimal('20.00'))
+        lesson_request = LessonRequest(language='Java', duration=60)
+        self.assertEqual(projected_invoice_amount(lesson_request, 4), Decimal('80.00'))
+
+
+@override_settings(LESSON_HOURLY_RATE=Decimal('25.00'))
+class GenerateInvoicesTestCase(TestCase):
+
+    fixtures = ['tutorials/tests/fixtures/default_user.json',
+                'tutorials/tests/fixtures/lesson_requests.json',
+                'tutorials/tests/fixtures/allocated_lessons.json',
+                'tutorials/tests/fixtures/invoices.json']
+
+    def setUp(self):
+        clear_pricing_rule_cache()
+        self.addCleanup(clear_pricing_rule_cache)
+        self.student = User.objects.get(username='@charlie')
+        # Request 1 is allocated with three 60 minute lessons and a paid invoice
+        Invoice.objects.filter(lesson_request_id=1).delete()
+
+    def _allocated_request(self, lessons, term='Sept-Christmas', language='Java', duration=120,
+                           date_created=datetime(2024, 12, 1, 10, tzinfo=timezone.utc)):
+        lesson_request = LessonRequest.objects.create(
+            student_id=self.student, tutor_id_id=2, language=language, term=term, day_of_the_week='Monday',
+            frequency='Weekly', duration=duration, status='allocated', date_created=date_created,
+        )
+        AllocatedLesson.objects.bulk_create(
+            AllocatedLesson(lesson_request=lesson_request, occurrence=i + 1, date=date(2025, 1, 6) + timedelta(weeks=i),
+                            time=time(9, 0), language=language, student_id=self.student, tutor_id_id=2)
+            for i in range(lessons)
+        )
+        return lesson_request
+
+    def test_creates_invoices_for_allocated_requests(self):
+        java = self._allocated_request(4)
+        self.assertEqual(generate_invoices(), {'created': 2, 'updated': 0, 'unchanged': 0, 'skipped': 0, 'unpriced': 0})
+        self.assertEqual(Invoice.objects.get(lesson_request_id=1).amount, Decimal('75.00'))
+        self.assertEqual(Invoice.objects.get(lesson_request=java).amount, Decimal('200.00'))
+        # Unallocated requests and requests without lessons are not invoiced
+        self._allocated_request(0)
+        self.assertEqual(Invoice.objects.filter(lesson_request_id=2).count(), 1)
+        self.assertEqual(generate_invoices()['created'], 0)
+
+    def test_refreshes_unpaid_invoices_and_skips_paid_ones(self):
+        java = self._allocated_request(4)
+        generate_invoices()
+        Invoice.objects.filter(lesson_request_id=1).update(is_paid=True)
+        PricingRule.objects.create(hourly_rate=Decimal('30.00'))
+        self.assertEqual(generate_invoices(), {'created': 0, 'updated': 1, 'unchanged': 0, 'skipped': 1, 'unpriced': 0})
+        self.assertEqual(Invoice.objects.get(lesson_request=java).amount, Decimal('240.00'))
+        self.assertEqual(Invoice.objects.get(lesson_request_id=1).amount, Decimal('75.00'))
+        self.assertEqual(generate_invoices(), {'created': 0, 'updated': 0, 'unchanged': 1, 'skipped': 1, 'unpriced': 0})
+
+    def test_only_the_given_term(self):
+        self._allocated_request(2, term='Jan-Easter')
+        self.assertEqual(generate_invoices('Jan-Easter')['created'], 1)
+        self.assertFalse(Invoice.objects.filter(lesson_request_id=1).exists())
+
+    def test_only_the_terms_of_the_given_year(self):
+        # Sept-Christmas 2024 ended on Christmas Day, so a request made after it is for 2025
+        later = self._allocated_request(2, date_created=datetime(2024, 12, 26, 10, tzinfo=timezone.utc))
+        self.assertEqual(generate_invoices('Sept-Christmas', 2025)['created'], 1)
+        self.assertTrue(Invoice.objects.filter(lesson_request=later).exists())
+        self.assertFalse(Invoice.objects.filter(lesson_request_id=1).exists())
+        # Jan-Easter 2025 takes requests made since Easter 2024
+        self._allocated_request(2, term='Jan-Easter')
+        self.assertEqual(generate_invoices(year=2024)['created'], 1)
+        self.assertEqual(generate_invoices(year=2025)['created'], 1)
+        self.assertEqual(generate_invoices(year=2026)['created'], 0)
+
+    def test_year_follows_stored_term_calendars(self):
+        self.addCleanup(clear_term_calendar_cache)
+        TermCalendar.objects.create(term='Sept-Christmas', year=2024, start_date=date(2024, 9, 2),
+                                    end_date=date(2024, 11, 29))
+        self.assertEqual(generate_invoices('Sept-Christmas', 2024)['created'], 0)
+        self.assertEqual(generate_invoices('Sept-Christmas', 2025)['created'], 1)
+
+    def test_skips_prices_an_invoice_cannot_hold(self):
+        java = self._allocated_request(2)
+        generate_invoices()
+        free = PricingRule.objects.create(language='Python', hourly_rate=Decimal('40.00'), discount_percent=100)
+        PricingRule.objects.create(language='Java', hourly_rate=Decimal('5000.00'))
+        self.assertEqual(invoice_amount(load_pricing_rules(), 'Python', 60, 3), None)
+        self.assertEqual(invoice_amount(load_pricing_rules(), 'Java', 120, 2), None)
+        self.assertEqual(generate_invoices(), {'created': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0, 'unpriced': 2})
+        # The invoices keep the last amounts they could hold
+        self.assertEqual(Invoice.objects.get(lesson_request_id=1).amount, Decimal('75.00'))
+        self.assertEqual(Invoice.objects.get(lesson_request=java).amount, Decimal('100.00'))
+        free.hourly_rate = Decimal('0.00')
+        free.discount_percent = 0
+        free.save()
+        Invoice.objects.filter(lesson_request_id=1).delete()
+        self.assertEqual(generate_invoices()['created'], 0)
+
+    def test_keeps_unpaid_invoice_counts(self):
+        self.assertEqual(unpaid_invoice_count(self.student), 1)
+        unpaid_invoice_count(User.objects.get(pk=1))
+        self._allocated_request(2)
+        self._allocated_request(3)
+        generate_invoices()
+        self.assertEqual(InvoiceSummary.objects.get(student=self.student).unpaid_count, 3)
+        self.assertEqual(repair_invoice_summaries(), 0)
+
+    def test_query_count_does_not_grow_with_requests(self):
+        self._allocated_request(2)
+        with self.assertNumQueries(8):
+            generate_invoices()
+        for _ in range(20):
+            self._allocated_request(2)
+        PricingRule.objects.create(hourly_rate=Decimal('30.00'))
+        with self.assertNumQueries(9):
+            self.assertEqual(generate_invoices(), {'created': 20, 'updated': 2, 'unchanged': 0, 'skipped': 0, 'unpriced': 0})
+
+    def test_chunks_report_progress_and_add_up(self):
+        self._allocated_request(2)
+        progress = []
+        counts = generate_invoices(chunk_size=1, progress=lambda done, total: progress.append((done, total)))
+        self.assertEqual(progress, [(1, 2), (2, 2)])
+        self.assertEqual(counts, {'created': 2, 'updated': 0, 'unchanged': 0, 'skipped': 0, 'unpriced': 0})
+        self.assertEqual(generate_invoices(chunk_size=1)['unchanged'], 2)
+
+    def test_command(self):
+        self._allocated_request(2)
+        out = StringIO()
+        call_command('generate_invoices', '--term', 'Sept-Christmas', '--year', '2024', stdout=out)
+        self.assertIn("2 invoices created, 0 updated, 0 unchanged; 0 paid requests skipped.", out.getvalue())
+        # Without --year, only this year's terms are invoiced
+        LessonRequest.objects.filter(pk=1).update(date_created=now())
+        Invoice.objects.all().delete()
+        call_command('generate_invoices', stdout=out)
+        self.assertIn("1 invoices created", out.getvalue())
+
+    def test_command_reports_unpriced_requests(self):
+        PricingRule.objects.create(hourly_rate=Decimal('0.00'))
+        out = StringIO()
+        call_command('generate_invoices', '--year', '2024', stdout=out)
+        self.assertIn("1 requests skipped because their price is not one an invoice can hold.", out.getvalue())
+
+    def test_job(self):
+        job = jobs.enqueue('generate_invoices', {'term': None, 'year': 2024})
+        jobs.run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, job.SUCCEEDED)
+        self.assertEqual(job.result['created'], 1)
+        self.assertEqual(job.progress, 100)
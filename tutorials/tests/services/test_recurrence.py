@@ -0,0 +1,136 @@
+"""Unit tests for the closed-form recurrence engine."""
+from datetime import date, datetime
+from django.test import TestCase
+from tutorials.management.commands.benchmark_recurrence import day_stepping_dates
+from tutorials.models import LessonRequest, TermCalendar, TermExclusion
+from tutorials.recurrence import (
+    TERM_CALENDAR_VERSION, clear_term_calendar_cache, get_term_date_range, occurrence_dates, lesson_request_dates,
+    bulk_lesson_request_dates, refresh_term_calendars,
+)
+from tutorials.versions import bump_version
+
+
+class OccurrenceDatesTestCase(TestCase):
+
+    def test_weekly_dates_start_on_first_matching_day(self):
+        dates = occurrence_dates(date(2024, 9, 1), date(2024, 9, 30), 'Monday', 'Weekly')
+        self.assertEqual(dates, (date(2024, 9, 2), date(2024, 9, 9), date(2024, 9, 16), date(2024, 9, 23), date(2024, 9, 30)))
+
+    def test_end_date_is_inclusive(self):
+        dates = occurrence_dates(date(2024, 12, 2), date(2024, 12, 16), 'Monday', 'Bi-Weekly')
+        self.assertEqual(dates, (date(2024, 12, 2), date(2024, 12, 16)))
+
+    def test_no_matching_day_in_range(self):
+        self.assertEqual(occurrence_dates(date(2024, 9, 3), date(2024, 9, 5), 'Monday', 'Weekly'), ())
+
+    def test_accepts_datetimes(self):
+        dates = occurrence_dates(datetime(2024, 9, 1), datetime(2024, 9, 10), 'Tuesday', 'Weekly')
+        self.assertEqual(dates, (date(2024, 9, 3), date(2024, 9, 10)))
+
+    def test_invalid_frequency(self):
+        with self.assertRaises(ValueError) as context:
+            occurrence_dates(date(2024, 9, 1), date(2024, 12, 25), 'Monday', 'Daily')
+        self.assertEqual(str(context.exception), "Unknown frequency: Daily")
+
+    def test_invalid_day(self):
+        with self.assertRaises(ValueError) as context:
+            occurrence_dates(date(2024, 9, 1), date(2024, 12, 25), 'Someday', 'Weekly')
+        self.assertEqual(str(context.exception), "Unknown day: Someday")
+
+    def test_matches_day_stepping_loop(self):
+        for term in ['Sept-Christmas', 'Jan-Easter', 'March-June']:
+            for day, _ in LessonRequest.DAY_CHOICES:
+                for frequency, _ in LessonRequest.FREQUENCY_CHOICES:
+                    lesson_request = LessonRequest(term=term, day_of_the_week=day, frequency=frequency,
+                                                   date_created=datetime(2024, 1, 1))
+                    start, end = get_term_date_range(term, lesson_request.date_created)
+                    self.assertEqual(
+                        list(lesson_request_dates(lesson_request)),
+                        day_stepping_dates(start, end, day, frequency)
+                    )
+
+
+class BulkLessonRequestDatesTestCase(TestCase):
+
+    def test_maps_each_request_to_its_dates(self):
+        lesson_requests = [
+            LessonRequest(pk=1, term='Sept-Christmas', day_of_the_week='Monday', frequency='Weekly',
+                          date_created=datetime(2024, 6, 1)),
+            LessonRequest(pk=2, term='Sept-Christmas', day_of_the_week='Monday', frequency='Weekly',
+                          date_created=datetime(2024, 7, 1)),
+            LessonRequest(pk=3, term='Jan-Easter', day_of_the_week='Friday', frequency='Monthly',
+                          date_created=datetime(2024, 6, 1)),
+        ]
+        dates = bulk_lesson_request_dates(lesson_requests)
+        self.assertEqual(set(dates), {1, 2, 3})
+        self.assertIs(dates[1], dates[2])
+        self.assertEqual(dates[3][0], date(2025, 1, 3))
+        self.assertTrue(all(d.weekday() == 4 for d in dates[3]))
+
+    def test_invalid_requests_are_collected_in_errors(self):
+        lesson_requests = [
+            LessonRequest(pk=1, term='Sept-Christmas', day_of_the_week='Monday', frequency='Weekly',
+                          date_created=datetime(2024, 6, 1)),
+            LessonRequest(pk=2, term='Summer', day_of_the_week='Monday', frequency='Weekly',
+                          date_created=datetime(2024, 6, 1)),
+        ]
+        with self.assertRaises(ValueError):
+            bulk_lesson_request_dates(lesson_requests)
+        errors = {}
+        dates = bulk_lesson_request_dates(lesson_requests, errors=errors)
+        self.assertEqual(set(dates), {1})
+        self.assertEqual(str(errors[2]), "Unknown term: Summer")
+
+
+class TermCalendarRecurrenceTestCase(TestCase):
+
+    def setUp(self):
+        clear_term_calendar_cache()
+        self.addCleanup(clear_term_calendar_cache)
+        self.calendar = TermCalendar.objects.create(
+            term='Sept-Christmas', year=2025, start_date=date(2025, 9, 3), end_date=date(2025, 12, 19)
+        )
+        TermExclusion.objects.create(calendar=self.calendar, start_date=date(2025, 10, 27),
+                                     end_date=date(2025, 10, 31), description='Half term')
+        self.lesson_request = LessonRequest(pk=1, term='Sept-Christmas', day_of_the_week='Monday',
+                                            frequency='Weekly', date_created=datetime(2025, 6, 1))
+
+    def test_stored_calendar_overrides_default_range(self):
+        self.assertEqual(get_term_date_range('Sept-Christmas', datetime(2025, 6, 1)),
+                         (datetime(2025, 9, 3), datetime(2025, 12, 19)))
+
+    def test_other_years_use_default_range(self):
+        self.assertEqual(get_term_date_range('Sept-Christmas', datetime(2024, 6, 1)),
+                         (datetime(2024, 9, 1), datetime(2024, 12, 25)))
+
+    def test_rolls_over_to_next_years_calendar(self):
+        self.assertEqual(get_term_date_range('Sept-Christmas', datetime(2024, 12, 26)),
+                         (datetime(2025, 9, 3), datetime(2025, 12, 19)))
+
+    def test_excluded_dates_are_skipped(self):
+        dates = lesson_request_dates(self.lesson_request)
+        self.assertEqual(dates[0], date(2025, 9, 8))
+        self.assertEqual(dates[-1], date(2025, 12, 15))
+        self.assertNotIn(date(2025, 10, 27), dates)
+        self.assertEqual(len(dates), 14)
+        self.assertEqual(bulk_lesson_request_dates([self.lesson_request])[1], dates)
+
+    def test_generation_does_not_query_once_loaded(self):
+        lesson_request_dates(self.lesson_request)
+        with self.assertNumQueries(0):
+            lesson_request_dates(self.lesson_request)
+
+    def test_calendars_changed_by_another_process_are_reloaded_on_refresh(self):
+        refresh_term_calendars()
+        self.assertEqual(len(lesson_request_dates(self.lesson_request)), 14)
+        # bulk_create sends no signals, so the change is only known through the shared version,
+        # as it is when an exclusion is saved in another process
+        TermExclusion.objects.bulk_create([TermExclusion(
+            calendar=self.calendar, start_date=date(2025, 11, 10), end_date=date(2025, 11, 14), description='Closure'
+        )])
+        with self.assertNumQueries(1):
+            refresh_term_calendars()
+        self.assertEqual(len(lesson_request_dates(self.lesson_request)), 14)
+        bump_version(TERM_CALENDAR_VERSION)
+        refresh_term_calendars()
+        self.assertNotIn(date(2025, 11, 10), lesson_request_dates(self.lesson_request))
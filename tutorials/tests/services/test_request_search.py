@@ -0,0 +1,98 @@
+"""Tests for lesson request filters and search."""
+from django.http import QueryDict
+from django.test import TestCase
+from tutorials.forms import LessonRequestFilterForm
+from tutorials.models import User, LessonRequest, Invoice
+from tutorials.request_search import (
+    filter_lesson_requests, legacy_filter_params, request_facets, search_lesson_requests,
+)
+
+
+class RequestSearchTestCase(TestCase):
+
+    fixtures = ['tutorials/tests/fixtures/default_user.json',
+                'tutorials/tests/fixtures/lesson_requests.json',
+                'tutorials/tests/fixtures/invoices.json']
+
+    def setUp(self):
+        self.student = User.objects.get(username='@charlie')
+        self.request = LessonRequest.objects.create(
+            student_id=self.student, language='Python', term='March-June', day_of_the_week='Friday',
+            frequency='Weekly', duration=60, description='Preparing for a data science interview',
+        )
+
+    def _search(self, text):
+        return set(search_lesson_requests(LessonRequest.objects.all(), text).values_list('pk', flat=True))
+
+    def _filter(self, query):
+        form = LessonRequestFilterForm(legacy_filter_params(QueryDict(query)))
+        self.assertTrue(form.is_valid(), form.errors)
+        return set(filter_lesson_requests(LessonRequest.objects.all(), form.cleaned_data).values_list('pk', flat=True))
+
+    def test_search_matches_description_words_as_prefixes(self):
+        self.assertEqual(self._search('interv'), {self.request.pk})
+        self.assertEqual(self._search('DATA science'), {self.request.pk})
+        self.assertEqual(self._search('data cooking'), set())
+
+    def test_search_matches_student_names(self):
+        self.assertEqual(self._search('charlie'), {2, self.request.pk})
+        self.assertEqual(self._search('john doe'), {1})
+
+    def test_search_ignores_query_syntax(self):
+        self.assertEqual(self._search('"interview" -(:^'), {self.request.pk})
+        self.assertEqual(self._search('***'), {1, 2, self.request.pk})
+
+    def test_index_follows_changes_to_requests(self):
+        self.request.description = 'Getting ready for exams'
+        self.request.save()
+        self.assertEqual(self._search('interview'), set())
+        self.assertEqual(self._search('exams'), {self.request.pk})
+
+        LessonRequest.objects.filter(pk=self.request.pk).update(student_id=User.objects.get(username='@janedoe'))
+        self.assertEqual(self._search('jane exams'), {self.request.pk})
+
+        self.request.delete()
+        self.assertEqual(self._search('exams'), set())
+
+    def test_index_follows_changes_to_student_names(self):
+        self.student.last_name = 'Brown'
+        self.student.save()
+        self.assertEqual(self._search('johnson'), set())
+        self.assertEqual(self._search('charlie brown'), {2, self.request.pk})
+
+    def test_values_of_one_filter_are_alternatives(self):
+        self.assertEqual(self._filter('language=Java&language=Python'), {1, 2, self.request.pk})
+        self.assertEqual(self._filter('invoice=paid&invoice=unpaid'), {1, 2})
+
+    def test_different_filters_must_all_match(self):
+        self.assertEqual(self._filter('status=unallocated&language=Python'), {self.request.pk})
+        self.assertEqual(self._filter('status=unallocated&invoice=no_invoice_generated&q=science'), {self.request.pk})
+        self.assertEqual(self._filter('term=Sept-Christmas&tutor=2'), {1})
+        self.assertEqual(self._filter('status=allocated&invoice=unpaid'), set())
+
+    def test_requests_with_several_invoices_are_listed_once(self):
+        Invoice.objects.create(lesson_request_id=1, amount=50)
+        requests = filter_lesson_requests(LessonRequest.objects.all(), {'invoice': ['invoice_generated']})
+        self.assertEqual(sorted(requests.values_list('pk', flat=True)), [1, 2])
+
+    def test_legacy_filter_values(self):
+        self.assertEqual(self._filter('filter=allocated'), {1})
+        self.assertEqual(self._filter('filter=no_invoice_generated'), {self.request.pk})
+        self.assertEqual(self._filter('filter=unknown'), {1, 2, self.request.pk})
+
+    def test_filters_are_one_query(self):
+        with self.assertNumQueries(1):
+            list(filter_lesson_requests(LessonRequest.objects.all(), {
+                'status': ['unallocated'], 'invoice': ['unpaid', 'no_invoice_generated'],
+                'language': ['Python'], 'q': 'data',
+            }))
+
+    def test_facet_counts_match_filters_in_one_query(self):
+        Invoice.objects.create(lesson_request_id=1, amount=50)
+        with self.assertNumQueries(1):
+            counts = request_facets()
+        for name in ('allocated', 'unallocated'):
+            self.assertEqual(counts[name], len(self._filter(f'status={name}')), name)
+        for name in ('paid', 'unpaid', 'invoice_generated', 'no_invoice_generated'):
+            self.assertEqual(counts[name], len(self._filter(f'invoice={name}')), name)
+        self.assertEqual(counts['unpaid'], 2)
@@ -1,8 +1,10 @@
 """Unit tests for the admin_view_requests function."""
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from tutorials.models import LessonRequest, Invoice
+from tutorials.request_search import cached_request_facets
 
 class AdminViewRequestsTestCase(TestCase):
 
@@ -14,6 +16,8 @@ class AdminViewRequestsTestCase(TestCase):
     ]
 
     def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
         self.admin_user = get_user_model().objects.get(username='@johndoe')
         self.client.force_login(self.admin_user)
         self.url = reverse('admin_view_requests')
@@ -74,8 +78,8 @@ class AdminViewRequestsTestCase(TestCase):
         response = self.client.get(self.url, {'filter': 'invoice_generated'})
         self.assertEqual(response.status_code, 200)
         self.assertQuerySetEqual(
-            response.context['requests'].order_by('id'),
-            LessonRequest.objects.filter(invoice__isnull=False).order_by('id'),
+            response.context['requests'],
+            LessonRequest.objects.filter(invoice__isnull=False).order_by('-date_created', '-id'),
             transform=lambda x: x
         )
 
@@ -93,7 +97,108 @@ class AdminViewRequestsTestCase(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response.context['requests']), LessonRequest.objects.count())
 
-    def test_view_contains_invoices_context(self):
+    def test_view_lists_each_requests_invoices(self):
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(len(response.context['invoices']), Invoice.objects.count())
+        invoices = [invoice for lesson_request in response.context['requests']
+                    for invoice in lesson_request.invoice.all()]
+        self.assertEqual(len(invoices), Invoice.objects.count())
+
+    def test_each_request_shows_only_its_own_invoice(self):
+        response = self.client.get(self.url)
+        self.assertContains(response, reverse('toggle_invoice_paid', args=[1]), count=1)
+        self.assertContains(response, reverse('toggle_invoice_paid', args=[2]), count=1)
+        self.assertContains(response, 'Unmark as paid', count=1)
+
+    def test_query_count_does_not_grow_with_requests(self):
+        cached_request_facets()  # Load the facet counts cache so it is only read back, with one query
+        with self.assertNumQueries(6):
+            self.client.get(self.url)
+
+        student = get_user_model().objects.get(username='@charlie')
+        for _ in range(10):
+            lesson_request = LessonRequest.objects.create(
+                student_id=student, language='Python', term='Sept-Christmas', day_of_the_week='Monday',
+                frequency='Weekly', duration=60,
+            )
+            Invoice.objects.create(lesson_request=lesson_request, amount=100)
+        with self.assertNumQueries(6):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'name="invoice_ids"', count=12)
+
+    def test_requests_are_newest_first_by_default(self):
+        response = self.client.get(self.url)
+        self.assertEqual([lesson_request.pk for lesson_request in response.context['requests']], [2, 1])
+        self.assertEqual(response.context['sort'], '-date_created')
+
+    def test_sort_by_each_column(self):
+        for sort, expected in (('student', [1, 2]), ('-student', [2, 1]), ('language', [2, 1]),
+                               ('status', [1, 2]), ('date_created', [1, 2])):
+            response = self.client.get(self.url, {'sort': sort})
+            self.assertEqual([lesson_request.pk for lesson_request in response.context['requests']], expected, sort)
+
+    def test_unknown_sort_falls_back_to_default(self):
+        response = self.client.get(self.url, {'sort': 'description'})
+        self.assertEqual(response.context['sort'], '-date_created')
+
+    def test_column_headers_toggle_sort_direction(self):
+        response = self.client.get(self.url, {'sort': 'language'})
+        self.assertEqual(response.context['sort_links']['language'], '-language')
+        self.assertEqual(response.context['sort_links']['status'], 'status')
+        self.assertContains(response, '?sort=-language')
+
+    @override_settings(ADMIN_REQUEST_PAGE_SIZE=1)
+    def test_requests_are_paged_keeping_filter_and_sort(self):
+        response = self.client.get(self.url, {'filter': 'invoice_generated', 'sort': 'language'})
+        self.assertEqual([lesson_request.pk for lesson_request in response.context['requests']], [2])
+        next_cursor = response.context['next_cursor']
+        self.assertContains(response, f'?invoice=invoice_generated&sort=language&after={next_cursor}')
+
+        response = self.client.get(self.url, {'filter': 'invoice_generated', 'sort': 'language', 'after': next_cursor})
+        self.assertEqual([lesson_request.pk for lesson_request in response.context['requests']], [1])
+        self.assertIsNone(response.context['next_cursor'])
+        self.assertNotContains(response, 'Next page')
+
+    @override_settings(ADMIN_REQUEST_PAGE_SIZE=1)
+    def test_sorting_by_a_name_containing_a_bar_pages_on(self):
+        get_user_model().objects.filter(username='@charlie').update(last_name='Smith|Jones')
+        response = self.client.get(self.url, {'sort': 'student'})
+        self.assertEqual([lesson_request.pk for lesson_request in response.context['requests']], [1])
+        response = self.client.get(self.url, {'sort': 'student', 'after': response.context['next_cursor']})
+        self.assertEqual([lesson_request.pk for lesson_request in response.context['requests']], [2])
+        self.assertIsNone(response.context['next_cursor'])
+
+    def test_malformed_cursor_shows_first_page(self):
+        response = self.client.get(self.url, {'after': 'nonsense'})
+        self.assertEqual(len(response.context['requests']), 2)
+
+    def test_filters_combine_and_carry_into_sort_links(self):
+        response = self.client.get(self.url, {'status': 'unallocated', 'invoice': 'unpaid', 'q': 'charl'})
+        self.assertEqual([lesson_request.pk for lesson_request in response.context['requests']], [2])
+        self.assertContains(response, '?status=unallocated&amp;invoice=unpaid&amp;q=charl&sort=language')
+
+    def test_invalid_filter_value_is_reported(self):
+        response = self.client.get(self.url, {'language': 'Cobol', 'status': 'allocated'})
+        self.assertTrue(response.context['filter_form'].errors)
+        self.assertEqual([lesson_request.pk for lesson_request in response.context['requests']], [1])
+
+    def test_no_results_keeps_the_filter_form(self):
+        response = self.client.get(self.url, {'q': 'nothing matches this'})
+        self.assertContains(response, 'No lesson requests found for the selected criteria.')
+        self.assertContains(response, 'name="q"')
+
+    def test_filter_options_show_counts(self):
+        response = self.client.get(self.url)
+        for label in ('Allocated (1)', 'Unallocated (1)', 'Paid (1)', 'Not Paid (1)',
+                      'Invoice Generated (2)', 'No Invoice Generated (0)'):
+            self.assertContains(response, label)
+
+    def test_filter_counts_are_cached(self):
+        self.client.get(self.url)
+        Invoice.objects.filter(pk=2).update(is_paid=True)
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Not Paid (1)')
+
+        cache.clear()
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Not Paid (0)')
@@ -0,0 +1,128 @@
+"""Tests for the read-only JSON API."""
+from datetime import date, time, timedelta
+from django.test import TestCase
+from django.urls import reverse
+from tutorials.models import User, LessonRequest, AllocatedLesson
+
+
+class ApiTest(TestCase):
+
+    fixtures = ['tutorials/tests/fixtures/default_user.json',
+                'tutorials/tests/fixtures/lesson_requests.json',
+                'tutorials/tests/fixtures/allocated_lessons.json',
+                'tutorials/tests/fixtures/invoices.json']
+
+    def setUp(self):
+        self.lessons_url = reverse('api_lessons')
+        self.requests_url = reverse('api_lesson_requests')
+        self.invoices_url = reverse('api_invoices')
+
+    def test_anonymous_users_get_401(self):
+        for url in (self.lessons_url, self.requests_url, self.invoices_url):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 401)
+            self.assertEqual(response.json(), {'error': "Authentication required."})
+
+    def test_only_safe_methods_are_allowed(self):
+        self.client.login(username='@charlie', password='Password123')
+        response = self.client.post(self.lessons_url)
+        self.assertEqual(response.status_code, 405)
+
+    def test_lessons_list_every_field_by_default(self):
+        self.client.login(username='@charlie', password='Password123')
+        response = self.client.get(self.lessons_url)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertIsNone(data['next'])
+        self.assertEqual([lesson['date'] for lesson in data['results']], ['2024-12-02', '2024-12-09', '2024-12-16'])
+        lesson = data['results'][0]
+        self.assertEqual(lesson['time'], '10:00:00')
+        self.assertEqual(lesson['duration'], 60)
+        self.assertEqual(lesson['student_name'], 'Charlie Johnson')
+        self.assertEqual(lesson['tutor_name'], 'Jane Doe')
+
+    def test_sparse_fields(self):
+        self.client.login(username='@charlie', password='Password123')
+        response = self.client.get(self.lessons_url, {'fields': 'id,date'})
+        for lesson in response.json()['results']:
+            self.assertEqual(set(lesson), {'id', 'date'})
+
+    def test_sparse_fields_only_select_their_columns(self):
+        self.client.login(username='@charlie', password='Password123')
+        with self.assertNumQueries(3) as queries:
+            self.client.get(self.lessons_url, {'fields': 'id,date'})
+        self.assertNotIn('JOIN', queries.captured_queries[-1]['sql'])
+
+    def test_unknown_field_is_rejected(self):
+        self.client.login(username='@charlie', password='Password123')
+        response = self.client.get(self.lessons_url, {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': "Unknown fields: password"})
+
+    def test_invalid_cursor_and_limit_are_rejected(self):
+        self.client.login(username='@charlie', password='Password123')
+        self.assertEqual(self.client.get(self.lessons_url, {'after': 'nonsense'}).status_code, 400)
+        self.assertEqual(self.client.get(self.lessons_url, {'limit': 'ten'}).status_code, 400)
+
+    def test_lessons_are_paged_by_cursor(self):
+        self.client.login(username='@charlie', password='Password123')
+        response = self.client.get(self.lessons_url, {'limit': 2, 'fields': 'date'})
+        data = response.json()
+        self.assertEqual([lesson['date'] for lesson in data['results']], ['2024-12-02', '2024-12-09'])
+        self.assertIn('fields=date', data['next'])
+
+        data = self.client.get(data['next']).json()
+        self.assertEqual(data['results'], [{'date': '2024-12-16'}])
+        self.assertIsNone(data['next'])
+
+    def test_page_cost_does_not_grow_with_history(self):
+        lesson_request = LessonRequest.objects.get(pk=1)
+        AllocatedLesson.objects.bulk_create(
+            AllocatedLesson(lesson_request=lesson_request, occurrence=100 + week,
+                            date=date(2025, 1, 6) + timedelta(weeks=week), time=time(10, 0),
+                            language='Python', student_id_id=3, tutor_id_id=2)
+            for week in range(100)
+        )
+        self.client.login(username='@janedoe', password='Password123')
+        next_url = self.lessons_url + '?limit=10'
+        for _ in range(3):
+            with self.assertNumQueries(3):
+                next_url = self.client.get(next_url).json()['next']
+
+    def test_lesson_requests_are_scoped_to_the_user(self):
+        self.client.login(username='@charlie', password='Password123')
+        response = self.client.get(self.requests_url, {'fields': 'id'})
+        self.assertEqual(response.json()['results'], [{'id': 2}])
+
+        self.client.login(username='@janedoe', password='Password123')
+        response = self.client.get(self.requests_url, {'fields': 'id,tutor_name'})
+        self.assertEqual(response.json()['results'], [{'id': 1, 'tutor_name': 'Jane Doe'}])
+
+        self.client.login(username='@johndoe', password='Password123')
+        response = self.client.get(self.requests_url, {'fields': 'id,tutor_name'})
+        self.assertEqual(response.json()['results'], [{'id': 1, 'tutor_name': 'Jane Doe'},
+                                                      {'id': 2, 'tutor_name': None}])
+
+    def test_invoices_are_scoped_to_the_user(self):
+        self.client.login(username='@charlie', password='Password123')
+        response = self.client.get(self.invoices_url)
+        self.assertEqual(response.json()['results'], [{
+            'id': 2, 'lesson_request_id': 2, 'language': 'Java', 'student_id': 3, 'student_name': 'Charlie Johnson',
+            'tutor_id': None, 'tutor_name': None, 'amount': '200.00', 'is_paid': False,
+            'created_at': response.json()['results'][0]['created_at'],
+        }])
+
+        self.client.login(username='@janedoe', password='Password123')
+        self.assertEqual(self.client.get(self.invoices_url).json()['results'], [])
+
+        self.client.login(username='@johndoe', password='Password123')
+        self.assertEqual(len(self.client.get(self.invoices_url).json()['results']), 2)
+
+    def test_unchanged_page_is_not_modified(self):
+        self.client.login(username='@charlie', password='Password123')
+        response = self.client.get(self.lessons_url)
+        self.assertIn('private', response['Cache-Control'])
+
+        response = self.client.get(self.lessons_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
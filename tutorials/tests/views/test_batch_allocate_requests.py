@@ -0,0 +1,98 @@
+"""Tests for the batch_allocate_requests view."""
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.contrib.messages import get_messages
+from tutorials.jobs import run_pending_jobs
+from tutorials.models import LessonRequest, AllocatedLesson, Job
+
+
+class BatchAllocateRequestsTest(TestCase):
+
+    fixtures = ['tutorials/tests/fixtures/default_user.json',
+                'tutorials/tests/fixtures/lesson_requests.json']
+
+    def setUp(self):
+        self.admin_user = get_user_model().objects.get(username='@johndoe')
+        self.url = reverse('batch_allocate_requests')
+
+    def test_login_required(self):
+        response = self.client.get(self.url)
+        self.assertRedirects(response, f'/log_in/?next={self.url}')
+
+    def test_non_admin_forbidden(self):
+        self.client.force_login(get_user_model().objects.get(username='@janedoe'))
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+
+    def test_get_lists_only_unallocated_requests(self):
+        self.client.force_login(self.admin_user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'lesson_requests/batch_allocate.html')
+        self.assertEqual([r.pk for r in response.context['requests']], [2])
+
+    def test_post_queues_allocation_job(self):
+        self.client.force_login(self.admin_user)
+        response = self.client.post(self.url, {
+            'lesson_request_ids': ['2', '99'],
+            'tutor_2': '2',
+            'start_time_2': '14:00',
+        })
+        job = Job.objects.get()
+        self.assertRedirects(response, f'{self.url}?job={job.pk}')
+        self.assertEqual(job.name, 'allocate_lesson_requests')
+        self.assertEqual(job.created_by, self.admin_user)
+        self.assertEqual(LessonRequest.objects.get(pk=2).status, 'unallocated')
+        messages = list(get_messages(response.wsgi_request))
+        self.assertTrue(any("Allocation of 2 lesson requests queued." in str(m) for m in messages))
+
+    def test_repeated_post_with_the_same_key_queues_one_job(self):
+        self.client.force_login(self.admin_user)
+        data = {'lesson_request_ids': ['2'], 'tutor_2': '2', 'start_time_2': '14:00', 'idempotency_key': 'abc'}
+        first = self.client.post(self.url, data)
+        second = self.client.post(self.url, data)
+        job = Job.objects.get()
+        self.assertEqual(job.idempotency_key, 'abc')
+        self.assertRedirects(first, f'{self.url}?job={job.pk}')
+        self.assertRedirects(second, f'{self.url}?job={job.pk}')
+
+    def test_get_shows_progress_of_queued_job(self):
+        self.client.force_login(self.admin_user)
+        self.client.post(self.url, {'lesson_request_ids': ['2'], 'tutor_2': '2', 'start_time_2': '14:00'})
+        job = Job.objects.get()
+        response = self.client.get(self.url, {'job': job.pk})
+        self.assertIsNone(response.context['report'])
+        self.assertContains(response, reverse('job_status', kwargs={'pk': job.pk}))
+        self.assertContains(response, 'Allocating lesson requests… This page will refresh when it has finished.')
+
+    def test_get_shows_report_of_finished_job(self):
+        self.client.force_login(self.admin_user)
+        self.client.post(self.url, {
+            'lesson_request_ids': ['2', '99'],
+            'tutor_2': '2',
+            'start_time_2': '14:00',
+        })
+        run_pending_jobs()
+        job = Job.objects.get()
+        response = self.client.get(self.url, {'job': job.pk})
+        self.assertEqual(response.status_code, 200)
+        report = response.context['report']
+        self.assertEqual([result['success'] for result in report], [True, False])
+        self.assertContains(response, "Allocation Report")
+        self.assertContains(response, "1 of 2 lesson requests allocated.")
+        self.assertEqual(LessonRequest.objects.get(pk=2).status, 'allocated')
+        self.assertTrue(AllocatedLesson.objects.filter(lesson_request_id=2).exists())
+
+    def test_get_with_unknown_job(self):
+        self.client.force_login(self.admin_user)
+        response = self.client.get(self.url, {'job': 999})
+        self.assertEqual(response.status_code, 404)
+
+    def test_post_without_selection(self):
+        self.client.force_login(self.admin_user)
+        response = self.client.post(self.url, {})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['report'])
+        messages = list(get_messages(response.wsgi_request))
+        self.assertTrue(any("Select at least one lesson request to allocate." in str(m) for m in messages))
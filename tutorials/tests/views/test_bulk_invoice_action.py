@@ -0,0 +1,65 @@
+from django.contrib.auth import get_user_model
+from django.contrib.messages import get_messages
+from django.test import TestCase
+from django.urls import reverse
+from tutorials.invoices import unpaid_invoice_count
+from tutorials.models import Invoice, InvoiceSummary
+
+
+class BulkInvoiceActionTest(TestCase):
+
+    fixtures = [
+        'tutorials/tests/fixtures/default_user.json',
+        'tutorials/tests/fixtures/lesson_requests.json',
+        'tutorials/tests/fixtures/invoices.json'
+    ]
+
+    def setUp(self):
+        self.client.force_login(get_user_model().objects.get(username='@johndoe'))
+        self.url = reverse('bulk_invoice_action')
+
+    def _messages(self, response):
+        return [str(message) for message in get_messages(response.wsgi_request)]
+
+    def test_mark_paid(self):
+        student = get_user_model().objects.get(username='@charlie')
+        self.assertEqual(unpaid_invoice_count(student), 1)
+        response = self.client.post(self.url, {'action': 'mark_paid', 'invoice_ids': ['1', '2']})
+        self.assertRedirects(response, reverse('admin_view_requests'))
+        self.assertEqual(self._messages(response), ["1 invoices marked as paid."])
+        self.assertEqual(Invoice.objects.filter(is_paid=True).count(), 2)
+        self.assertEqual(InvoiceSummary.objects.get(student=student).unpaid_count, 0)
+
+    def test_mark_unpaid(self):
+        response = self.client.post(self.url, {'action': 'mark_unpaid', 'invoice_ids': ['1', '2']})
+        self.assertEqual(self._messages(response), ["1 invoices marked as unpaid."])
+        self.assertFalse(Invoice.objects.filter(is_paid=True).exists())
+
+    def test_delete(self):
+        response = self.client.post(self.url, {'action': 'delete', 'invoice_ids': ['2']})
+        self.assertEqual(self._messages(response), ["1 invoices deleted."])
+        self.assertEqual(list(Invoice.objects.values_list('pk', flat=True)), [1])
+
+    def test_nothing_selected(self):
+        response = self.client.post(self.url, {'action': 'delete', 'invoice_ids': ['abc']})
+        self.assertEqual(self._messages(response), ["Select at least one invoice."])
+        self.assertEqual(Invoice.objects.count(), 2)
+
+    def test_unknown_action(self):
+        response = self.client.post(self.url, {'action': 'refund', 'invoice_ids': ['1']})
+        self.assertEqual(self._messages(response), ["Choose what to do with the selected invoices."])
+        self.assertTrue(Invoice.objects.get(pk=1).is_paid)
+
+    def test_get_not_allowed(self):
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+
+    def test_admins_only(self):
+        self.client.force_login(get_user_model().objects.get(username='@janedoe'))
+        response = self.client.post(self.url, {'action': 'delete', 'invoice_ids': ['1']})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Invoice.objects.count(), 2)
+
+    def test_request_list_has_invoice_checkboxes(self):
+        response = self.client.get(reverse('admin_view_requests'))
+        self.assertContains(response, 'name="invoice_ids" value="1"')
+        self.assertContains(response, f'action="{self.url}"')
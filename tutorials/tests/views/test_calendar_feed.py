@@ -0,0 +1,124 @@
+"""Tests for the calendar_feed and calendar_subscription views."""
+from datetime import time
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.contrib.messages import get_messages
+from tutorials.allocation import sync_allocated_lessons
+from tutorials.models import CalendarFeed, LessonRequest, AllocatedLesson
+
+
+class CalendarFeedTest(TestCase):
+
+    fixtures = ['tutorials/tests/fixtures/default_user.json',
+                'tutorials/tests/fixtures/lesson_requests.json',
+                'tutorials/tests/fixtures/allocated_lessons.json']
+
+    def setUp(self):
+        self.tutor = get_user_model().objects.get(username='@janedoe')
+        self.feed = CalendarFeed.objects.create(user=self.tutor, token='tutor-token')
+        self.url = reverse('calendar_feed', kwargs={'token': 'tutor-token'})
+
+    def _body(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_feed_lists_the_users_lessons(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        body = self._body(response)
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertTrue(body.endswith('END:VCALENDAR\r\n'))
+        self.assertEqual(body.count('BEGIN:VEVENT'), 3)
+        self.assertIn('DTSTART:20241202T100000\r\n', body)
+        self.assertIn('DTEND:20241202T110000\r\n', body)
+        self.assertIn('SUMMARY:Python lesson\r\n', body)
+
+    def test_unknown_token(self):
+        response = self.client.get(reverse('calendar_feed', kwargs={'token': 'wrong'}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_only_safe_methods(self):
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 405)
+
+    def test_unchanged_feed_is_not_modified(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_changes_give_a_new_etag(self):
+        etag = self.client.get(self.url)['ETag']
+
+        sync_allocated_lessons([(LessonRequest.objects.get(pk=1), time(11, 0),
+                                 list(AllocatedLesson.objects.order_by('occurrence').values_list('date', flat=True)))])
+        moved = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(moved.status_code, 200)
+        self.assertIn('DTSTART:20241202T110000', self._body(moved))
+
+        AllocatedLesson.objects.get(occurrence=3).delete()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=moved['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_changes_to_requests_and_users_give_a_new_etag(self):
+        etag = self.client.get(self.url)['ETag']
+
+        student = get_user_model().objects.get(username='@johndoe')
+        student.last_name = 'Smith'
+        student.save()
+        renamed = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(renamed.status_code, 200)
+        self.assertIn('DESCRIPTION:John Smith with Jane Doe', self._body(renamed))
+
+        lesson_request = LessonRequest.objects.get(pk=1)
+        lesson_request.duration = 120
+        lesson_request.save()
+        longer = self.client.get(self.url, HTTP_IF_NONE_MATCH=renamed['ETag'])
+        self.assertEqual(longer.status_code, 200)
+        self.assertIn('DTEND:20241202T120000', self._body(longer))
+
+        # The feed is named after its owner
+        self.tutor.first_name = 'Janet'
+        self.tutor.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=longer['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("X-WR-CALNAME:Janet Doe's lessons", self._body(response))
+
+    def test_not_modified_check_does_not_read_lessons(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(2):
+            self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+
+class CalendarSubscriptionTest(TestCase):
+
+    fixtures = ['tutorials/tests/fixtures/default_user.json']
+
+    def setUp(self):
+        self.url = reverse('calendar_subscription')
+        self.client.login(username='@charlie', password='Password123')
+
+    def test_login_required(self):
+        self.client.logout()
+        response = self.client.get(self.url)
+        self.assertRedirects(response, f'/log_in/?next={self.url}')
+
+    def test_shows_feed_address(self):
+        response = self.client.get(self.url)
+        feed = CalendarFeed.objects.get(user__username='@charlie')
+        self.assertEqual(response.context['feed_url'],
+                         'http://testserver' + reverse('calendar_feed', kwargs={'token': feed.token}))
+        self.assertEqual(self.client.get(self.url).context['feed_url'], response.context['feed_url'])
+
+    def test_replace_token(self):
+        old_url = self.client.get(self.url).context['feed_url']
+        response = self.client.post(self.url)
+        self.assertRedirects(response, self.url)
+        self.assertNotEqual(self.client.get(self.url).context['feed_url'], old_url)
+        self.assertEqual(self.client.get(old_url).status_code, 404)
+        messages = list(get_messages(response.wsgi_request))
+        self.assertTrue(any("new address" in str(m) for m in messages))
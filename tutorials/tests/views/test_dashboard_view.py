@@ -1,6 +1,10 @@
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.core.cache import cache
 from django.urls import reverse
 from django.utils.timezone import now, timedelta
+from tutorials.invoices import unpaid_invoice_count
 from tutorials.models import User, Tutor, LessonRequest, AllocatedLesson, Invoice
 
 class DashboardViewTest(TestCase):
@@ -161,6 +165,99 @@ class DashboardViewTest(TestCase):
         # No invoice action needed now
         self.assertNotContains(response, 'You have')
 
+    def _add_lessons(self, count):
+        """Allocate count more lessons, each from its own request, to the student and tutor."""
+        for i in range(count):
+            lesson_request = LessonRequest.objects.create(
+                student_id=self.student_user,
+                tutor_id=self.tutor_user,
+                language='Python',
+                term='Sept-Christmas',
+                day_of_the_week='Wednesday',
+                frequency='Weekly',
+                duration=60,
+                status='allocated'
+            )
+            AllocatedLesson.objects.create(
+                lesson_request=lesson_request,
+                occurrence=1,
+                date=self.future_date + timedelta(days=i + 1),
+                time=self.lesson_time,
+                language='Python',
+                student_id=self.student_user,
+                tutor_id=self.tutor_user
+            )
+
+    def _dashboard_queries(self, username):
+        self.client.login(username=username, password='Password123')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_student_dashboard_queries_do_not_grow_with_lessons(self):
+        """Student dashboard runs a constant number of queries however many lessons there are."""
+        unpaid_invoice_count(self.student_user)  # Create the invoice summary so it is not counted
+        few = self._dashboard_queries('@studentuser')
+        self._add_lessons(20)
+        self.assertEqual(self._dashboard_queries('@studentuser'), few)
+        cache.clear()
+        # The cache is kept in the database, so filling it takes queries of its own
+        with self.assertNumQueries(25):
+            self.client.get(reverse('dashboard'))
+
+    def test_tutor_dashboard_queries_do_not_grow_with_lessons(self):
+        """Tutor dashboard runs a constant number of queries however many lessons there are."""
+        few = self._dashboard_queries('@tutoruser')
+        self._add_lessons(20)
+        self.assertEqual(self._dashboard_queries('@tutoruser'), few)
+        cache.clear()
+        with self.assertNumQueries(16):
+            self.client.get(reverse('dashboard'))
+
+    def test_repeat_student_dashboard_is_served_from_cache(self):
+        cache.clear()
+        self.client.login(username='@studentuser', password='Password123')
+        first = self.client.get(reverse('dashboard'))
+        # Only the session and user are loaded, besides reading the cached fragments back
+        with self.assertNumQueries(6):
+            second = self.client.get(reverse('dashboard'))
+        self.assertEqual(first.content, second.content)
+
+    def test_cached_dashboard_changes_with_lessons(self):
+        cache.clear()
+        self.client.login(username='@tutoruser', password='Password123')
+        self.client.get(reverse('dashboard'))
+        self.allocated_lesson.delete()
+        response = self.client.get(reverse('dashboard'))
+        self.assertContains(response, 'You have no allocated lessons at the moment.')
+
+    def test_cached_invoice_badge_changes_with_invoices(self):
+        cache.clear()
+        self.client.login(username='@studentuser', password='Password123')
+        self.assertContains(self.client.get(reverse('dashboard')), 'You have 1 unpaid invoice')
+        Invoice.objects.create(lesson_request=self.lesson_request, amount='50.00', is_paid=False)
+        self.assertContains(self.client.get(reverse('dashboard')), 'You have 2 unpaid invoices')
+
+    def test_other_users_changes_do_not_invalidate_dashboard(self):
+        cache.clear()
+        other = User.objects.create_user(username='@otherstudent', first_name='Other', last_name='Student',
+                                         email='other@example.com', role='student', password='Password123')
+        self.client.login(username='@studentuser', password='Password123')
+        self.client.get(reverse('dashboard'))
+        LessonRequest.objects.create(student_id=other, language='Java', term='Jan-Easter',
+                                     day_of_the_week='Friday', frequency='Weekly', duration=60)
+        with self.assertNumQueries(6):
+            self.client.get(reverse('dashboard'))
+
+    def test_dashboard_lessons_are_in_date_order(self):
+        self._add_lessons(3)
+        AllocatedLesson.objects.filter(pk=self.allocated_lesson.pk).update(date=self.future_date + timedelta(days=10))
+        self.client.login(username='@studentuser', password='Password123')
+        response = self.client.get(reverse('dashboard'))
+        dates = [lesson.date for lesson in response.context['allocated_lessons']]
+        self.assertEqual(dates, sorted(dates))
+
     # ---------------------------------------
     # Comprehensive Tests for Tutor Role
     # ---------------------------------------
@@ -213,6 +310,24 @@ class DashboardViewTest(TestCase):
         self.assertNotContains(response, 'Your Allocated Lessons')
         self.assertNotContains(response, 'You have no allocated lessons at the moment.')
 
+    def test_admin_dashboard_shows_overview(self):
+        """Admin sees summary figures computed from aggregates, not a list of lessons."""
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client.login(username='@adminuser', password='Password123')
+        response = self.client.get(reverse('dashboard'))
+        overview = response.context['overview']
+        self.assertEqual(overview['unallocated_requests'], 0)
+        self.assertEqual(overview['unpaid_invoices'], 1)
+        self.assertNotIn('allocated_lessons', response.context)
+        self.assertContains(response, 'Unpaid Invoices')
+        self.assertContains(response, '£100.00')
+        self.assertContains(response, 'Tutor Utilization This Week')
+
+        # The figures are cached, so later visits only load the session and user and read the cache
+        with self.assertNumQueries(3):
+            self.client.get(reverse('dashboard'))
+
     def test_admin_dashboard_no_lessons(self):
         """Admin with no allocated lessons at all. Still, admins do not show any lesson text."""
         AllocatedLesson.objects.all().delete()
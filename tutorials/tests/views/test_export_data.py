@@ -0,0 +1,96 @@
+"""Tests for the export_data view."""
+import csv
+import json
+from tempfile import TemporaryDirectory
+from django.http import StreamingHttpResponse
+from django.test import TestCase
+from django.urls import reverse
+from tutorials import jobs
+from tutorials.models import Job
+
+
+class ExportDataTestCase(TestCase):
+
+    fixtures = ['tutorials/tests/fixtures/default_user.json',
+                'tutorials/tests/fixtures/lesson_requests.json',
+                'tutorials/tests/fixtures/allocated_lessons.json',
+                'tutorials/tests/fixtures/invoices.json']
+
+    def setUp(self):
+        self.client.login(username='@johndoe', password='Password123')
+
+    def _content(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_login_required(self):
+        self.client.logout()
+        url = reverse('export_data', args=['invoices', 'csv'])
+        response = self.client.get(url)
+        self.assertRedirects(response, f'/log_in/?next={url}')
+
+    def test_admins_only(self):
+        self.client.login(username='@janedoe', password='Password123')
+        response = self.client.get(reverse('export_data', args=['invoices', 'csv']))
+        self.assertEqual(response.status_code, 403)
+
+    def test_unknown_export_or_format(self):
+        self.assertEqual(self.client.get(reverse('export_data', args=['users', 'csv'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('export_data', args=['invoices', 'xml'])).status_code, 404)
+
+    def test_lesson_requests_csv(self):
+        response = self.client.get(reverse('export_data', args=['lesson_requests', 'csv']))
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment; filename="lesson_requests-', response['Content-Disposition'])
+        rows = list(csv.DictReader(self._content(response).splitlines()))
+        self.assertEqual([row['id'] for row in rows], ['1', '2'])
+        self.assertEqual(rows[0]['student_name'], 'John Doe')
+        self.assertEqual(rows[0]['tutor_name'], 'Jane Doe')
+        self.assertEqual(rows[1]['tutor_name'], '')
+
+    def test_lessons_ndjson(self):
+        response = self.client.get(reverse('export_data', args=['lessons', 'ndjson']))
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in self._content(response).splitlines()]
+        self.assertEqual([row['date'] for row in rows], ['2024-12-02', '2024-12-09', '2024-12-16'])
+        self.assertEqual(rows[0]['student_name'], 'Charlie Johnson')
+
+    def test_export_is_one_query_however_many_rows(self):
+        response = self.client.get(reverse('export_data', args=['invoices', 'csv']))
+        with self.assertNumQueries(1):
+            content = self._content(response)
+        self.assertEqual(len(content.splitlines()), 3)
+
+    def test_large_export_is_written_by_a_job(self):
+        with TemporaryDirectory() as directory, self.settings(EXPORT_STREAM_ROWS=1, EXPORT_ROOT=directory):
+            url = reverse('export_data', args=['invoices', 'csv'])
+            response = self.client.get(url)
+            self.assertTemplateUsed(response, 'export_data.html')
+            self.assertContains(response, 'Start Export')
+
+            response = self.client.post(url, {'idempotency_key': 'export-1'})
+            job = Job.objects.get(name='export_data')
+            self.assertRedirects(response, f'{url}?job={job.pk}')
+            self.assertEqual(job.payload, {'name': 'invoices', 'format': 'csv'})
+            response = self.client.get(f'{url}?job={job.pk}')
+            self.assertContains(response, 'id="job-progress"')
+            self.assertContains(response, reverse('job_status', args=[job.pk]))
+
+            jobs.run_pending_jobs()
+            job.refresh_from_db()
+            self.assertEqual(job.result, {'file': f'invoices-{job.pk}.csv', 'rows': 2})
+            download_url = reverse('export_download', args=[job.pk])
+            self.assertContains(self.client.get(f'{url}?job={job.pk}'), download_url)
+
+            response = self.client.get(download_url)
+            self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+            self.assertIn('attachment; filename="invoices-', response['Content-Disposition'])
+            rows = list(csv.DictReader(b''.join(response.streaming_content).decode().splitlines()))
+            self.assertEqual([row['id'] for row in rows], ['1', '2'])
+            response.close()
+
+    def test_download_needs_a_finished_export_job(self):
+        job = jobs.enqueue('export_data', {'name': 'invoices', 'format': 'csv'})
+        self.assertEqual(self.client.get(reverse('export_download', args=[job.pk])).status_code, 404)
+        self.client.login(username='@janedoe', password='Password123')
+        self.assertEqual(self.client.get(reverse('export_download', args=[job.pk])).status_code, 403)
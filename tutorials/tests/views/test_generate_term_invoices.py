@@ -0,0 +1,79 @@
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils.timezone import localdate
+from tutorials.jobs import run_pending_jobs
+from tutorials.models import Invoice, Job, PricingRule
+from tutorials.pricing import clear_pricing_rule_cache
+
+
+class GenerateTermInvoicesTest(TestCase):
+
+    fixtures = [
+        'tutorials/tests/fixtures/default_user.json',
+        'tutorials/tests/fixtures/lesson_requests.json',
+        'tutorials/tests/fixtures/allocated_lessons.json',
+        'tutorials/tests/fixtures/invoices.json'
+    ]
+
+    def setUp(self):
+        clear_pricing_rule_cache()
+        self.addCleanup(clear_pricing_rule_cache)
+        self.client.force_login(get_user_model().objects.get(username='@johndoe'))
+        self.url = reverse('generate_term_invoices')
+        Invoice.objects.filter(lesson_request_id=1).delete()
+
+    def test_get_shows_pricing_rules(self):
+        PricingRule.objects.create(language='Python', hourly_rate=Decimal('40.00'), discount_percent=Decimal('5'))
+        response = self.client.get(self.url)
+        self.assertTemplateUsed(response, 'generate_term_invoices.html')
+        self.assertContains(response, '£40.00')
+        self.assertContains(response, '5.00%')
+
+    def test_post_queues_a_job_and_shows_its_result(self):
+        response = self.client.post(self.url, {'term': 'Sept-Christmas', 'year': '2024', 'idempotency_key': 'abc'})
+        job = Job.objects.get(name='generate_invoices')
+        self.assertEqual(job.payload, {'term': 'Sept-Christmas', 'year': 2024})
+        self.assertRedirects(response, f'{self.url}?job={job.pk}')
+        self.assertContains(self.client.get(self.url, {'job': job.pk}), 'Generating invoices… This page will refresh')
+
+        run_pending_jobs()
+        response = self.client.get(self.url, {'job': job.pk})
+        self.assertEqual(response.context['result']['created'], 1)
+        self.assertContains(response, '1 invoices created')
+        self.assertTrue(Invoice.objects.filter(lesson_request_id=1).exists())
+
+    def test_repeated_submission_queues_one_job(self):
+        self.client.post(self.url, {'term': '', 'year': '2024', 'idempotency_key': 'abc'})
+        self.client.post(self.url, {'term': '', 'year': '2024', 'idempotency_key': 'abc'})
+        self.assertEqual(Job.objects.filter(name='generate_invoices').count(), 1)
+        self.assertEqual(Job.objects.get().payload, {'term': None, 'year': 2024})
+
+    def test_invalid_term(self):
+        response = self.client.post(self.url, {'term': 'Summer'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Job.objects.exists())
+        self.assertContains(response, 'Choose a valid term.')
+
+    def test_invalid_year(self):
+        for year in ['', 'last', '1999']:
+            response = self.client.post(self.url, {'term': 'Sept-Christmas', 'year': year})
+            self.assertContains(response, 'Choose a valid year.')
+        self.assertFalse(Job.objects.exists())
+
+    def test_get_defaults_to_this_year(self):
+        response = self.client.get(self.url)
+        self.assertContains(response, f'name="year" value="{localdate().year}"')
+
+    def test_shows_requests_skipped_for_their_price(self):
+        PricingRule.objects.create(hourly_rate=Decimal('0.00'))
+        self.client.post(self.url, {'term': '', 'year': '2024', 'idempotency_key': 'abc'})
+        run_pending_jobs()
+        response = self.client.get(self.url, {'job': Job.objects.get().pk})
+        self.assertContains(response, '1 requests were skipped because their price was £0.00')
+        self.assertFalse(Invoice.objects.filter(lesson_request_id=1).exists())
+
+    def test_admins_only(self):
+        self.client.force_login(get_user_model().objects.get(username='@janedoe'))
+        self.assertEqual(self.client.get(self.url).status_code, 403)
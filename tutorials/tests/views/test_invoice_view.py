@@ -3,7 +3,8 @@
 from django.test import TestCase, Client
 from django.urls import reverse
 from django.contrib.auth import get_user_model
-from tutorials.models import Invoice, LessonRequest
+from tutorials.models import Invoice, LessonRequest, AllocatedLesson
+from tutorials.pricing import clear_pricing_rule_cache
 from tutorials.forms import InvoiceForm
 from decimal import Decimal
 from django.utils.timezone import now, timedelta
@@ -150,3 +151,21 @@ class InvoiceViewTests(TestCase):
         self.assertEqual(updated_invoice.is_paid, True)
 
         self.assertRedirects(response, reverse('admin_view_requests'))
+
+    def test_generate_invoice_suggests_amount_from_pricing_rules(self):
+        clear_pricing_rule_cache()
+        self.addCleanup(clear_pricing_rule_cache)
+        self.client.login(username=self.admin.username, password='Password123')
+        url = reverse('generate_invoice', args=[self.lesson_request1.pk])
+        self.assertIsNone(self.client.get(url).context['suggested_amount'])
+
+        self.invoice1.delete()
+        for occurrence in (1, 2):
+            AllocatedLesson.objects.create(
+                lesson_request=self.lesson_request1, occurrence=occurrence, date=now().date(), time=now().time(),
+                language='Python', student_id=self.student, tutor_id=self.tutor,
+            )
+        with self.settings(LESSON_HOURLY_RATE=Decimal('25.00')):
+            response = self.client.get(url)
+        self.assertEqual(response.context['suggested_amount'], Decimal('50.00'))
+        self.assertContains(response, 'value="50.00"')
@@ -0,0 +1,49 @@
+"""Tests for the job_status view."""
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from tutorials.jobs import enqueue, run_pending_jobs
+
+
+class JobStatusViewTest(TestCase):
+
+    fixtures = ['tutorials/tests/fixtures/default_user.json',
+                'tutorials/tests/fixtures/other_users.json',
+                'tutorials/tests/fixtures/lesson_requests.json']
+
+    def setUp(self):
+        self.admin_user = get_user_model().objects.get(username='@johndoe')
+        self.job = enqueue('allocate_lesson_requests', {'assignments': [[2, 2, '14:00']]}, user=self.admin_user)
+        self.url = reverse('job_status', kwargs={'pk': self.job.pk})
+
+    def test_login_required(self):
+        response = self.client.get(self.url)
+        self.assertRedirects(response, f'/log_in/?next={self.url}')
+
+    def test_queued_job(self):
+        self.client.force_login(self.admin_user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['status'], 'queued')
+        self.assertFalse(data['finished'])
+        self.assertIsNone(data['result'])
+
+    def test_finished_job(self):
+        run_pending_jobs()
+        self.client.force_login(self.admin_user)
+        data = self.client.get(self.url).json()
+        self.assertEqual(data['status'], 'succeeded')
+        self.assertEqual(data['progress'], 100)
+        self.assertTrue(data['finished'])
+        self.assertTrue(data['result'][0]['success'])
+
+    def test_other_users_cannot_see_job(self):
+        self.client.force_login(get_user_model().objects.get(username='@janedoe'))
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+
+    def test_unknown_job(self):
+        self.client.force_login(self.admin_user)
+        response = self.client.get(reverse('job_status', kwargs={'pk': 999}))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,60 @@
+"""Tests for the lesson_calendar view."""
+from datetime import date, time
+from django.test import TestCase
+from django.urls import reverse
+from tutorials.models import AllocatedLesson
+
+
+class LessonCalendarViewTest(TestCase):
+
+    fixtures = ['tutorials/tests/fixtures/default_user.json',
+                'tutorials/tests/fixtures/lesson_requests.json',
+                'tutorials/tests/fixtures/allocated_lessons.json']
+
+    def setUp(self):
+        self.url = reverse('lesson_calendar')
+
+    def _lessons_by_day(self, response):
+        return {day: [lesson.pk for lesson in lessons]
+                for week in response.context['weeks'] for day, lessons in week if lessons}
+
+    def test_login_required(self):
+        response = self.client.get(self.url)
+        self.assertRedirects(response, f'/log_in/?next={self.url}')
+
+    def test_week_view(self):
+        self.client.login(username='@charlie', password='Password123')
+        response = self.client.get(self.url, {'date': '2024-12-11'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'lesson_calendar.html')
+        self.assertEqual(response.context['view'], 'week')
+        lesson = AllocatedLesson.objects.get(date=date(2024, 12, 9))
+        self.assertEqual(self._lessons_by_day(response), {date(2024, 12, 9): [lesson.pk]})
+        self.assertContains(response, 'Week of 9 December 2024')
+
+    def test_month_view(self):
+        self.client.login(username='@janedoe', password='Password123')
+        response = self.client.get(self.url, {'view': 'month', 'date': '2024-12-20'})
+        self.assertEqual(sorted(self._lessons_by_day(response)),
+                         [date(2024, 12, 2), date(2024, 12, 9), date(2024, 12, 16)])
+        self.assertContains(response, 'December 2024')
+        self.assertContains(response, '?view=month&date=2025-01-01')
+
+    def test_only_the_users_lessons_are_shown(self):
+        AllocatedLesson.objects.create(lesson_request_id=1, occurrence=10, date=date(2024, 12, 10), time=time(9, 0),
+                                       language='Python', student_id_id=1, tutor_id_id=2)
+        self.client.login(username='@charlie', password='Password123')
+        response = self.client.get(self.url, {'date': '2024-12-11'})
+        self.assertNotIn(date(2024, 12, 10), self._lessons_by_day(response))
+
+    def test_lessons_are_loaded_with_one_query(self):
+        self.client.login(username='@janedoe', password='Password123')
+        with self.assertNumQueries(3):
+            self.client.get(self.url, {'view': 'month', 'date': '2024-12-20'})
+
+    def test_invalid_parameters_fall_back_to_this_week(self):
+        self.client.login(username='@charlie', password='Password123')
+        response = self.client.get(self.url, {'view': 'decade', 'date': 'soon'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['view'], 'week')
+        self.assertEqual(response.context['anchor'], response.context['today'])
@@ -0,0 +1,93 @@
+"""Tests for the past_lessons view and the dashboard's upcoming lesson pages."""
+from datetime import time, timedelta
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils.timezone import localdate
+from tutorials.models import User, LessonRequest, AllocatedLesson
+
+
+@override_settings(LESSON_PAGE_SIZE=2)
+class LessonPagesTest(TestCase):
+
+    fixtures = ['tutorials/tests/fixtures/default_user.json',
+                'tutorials/tests/fixtures/lesson_requests.json']
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        lesson_request = LessonRequest.objects.get(pk=1)
+        today = localdate()
+        # Three past and three upcoming lessons for student @charlie and tutor @janedoe
+        AllocatedLesson.objects.bulk_create(
+            AllocatedLesson(
+                lesson_request=lesson_request,
+                occurrence=offset + 4,
+                date=today + timedelta(days=offset * 7),
+                time=time(10, 0),
+                language='Python',
+                student_id_id=3,
+                tutor_id_id=2,
+            )
+            for offset in (-3, -2, -1, 0, 1, 2)
+        )
+        self.today = today
+        self.url = reverse('past_lessons')
+
+    def test_login_required(self):
+        response = self.client.get(self.url)
+        self.assertRedirects(response, f'/log_in/?next={self.url}')
+
+    def test_dashboard_shows_upcoming_lessons_a_page_at_a_time(self):
+        self.client.login(username='@charlie', password='Password123')
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual([lesson.date for lesson in response.context['allocated_lessons']],
+                         [self.today, self.today + timedelta(days=7)])
+        self.assertContains(response, 'Next page')
+
+        response = self.client.get(reverse('dashboard'), {'after': response.context['next_cursor']})
+        self.assertEqual([lesson.date for lesson in response.context['allocated_lessons']],
+                         [self.today + timedelta(days=14)])
+        self.assertIsNone(response.context['next_cursor'])
+        self.assertNotContains(response, 'Next page')
+
+    def test_dashboard_ignores_malformed_cursor(self):
+        self.client.login(username='@janedoe', password='Password123')
+        response = self.client.get(reverse('dashboard'), {'after': 'nonsense'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['allocated_lessons'][0].date, self.today)
+
+    def test_past_lessons_most_recent_first(self):
+        self.client.login(username='@janedoe', password='Password123')
+        response = self.client.get(self.url)
+        self.assertTemplateUsed(response, 'past_lessons.html')
+        self.assertEqual([lesson.date for lesson in response.context['lessons']],
+                         [self.today - timedelta(days=7), self.today - timedelta(days=14)])
+
+        response = self.client.get(self.url, {'after': response.context['next_cursor']})
+        self.assertEqual([lesson.date for lesson in response.context['lessons']],
+                         [self.today - timedelta(days=21)])
+
+    def test_past_lessons_only_show_the_users_own_lessons(self):
+        other = User.objects.create_user(username='@other', email='other@example.com', password='Password123',
+                                         first_name='Other', last_name='Student', role='student')
+        self.client.force_login(other)
+        response = self.client.get(self.url)
+        self.assertEqual(list(response.context['lessons']), [])
+        self.assertContains(response, 'You have no past lessons.')
+
+    def test_page_cost_does_not_grow_with_history(self):
+        self.client.login(username='@charlie', password='Password123')
+        with self.assertNumQueries(3):
+            self.client.get(self.url)
+
+        lesson_request = LessonRequest.objects.get(pk=1)
+        AllocatedLesson.objects.bulk_create(
+            AllocatedLesson(lesson_request=lesson_request, occurrence=100 + week,
+                            date=self.today - timedelta(weeks=week), time=time(10, 0),
+                            language='Python', student_id_id=3, tutor_id_id=2)
+            for week in range(4, 100)
+        )
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.context['lessons']), 2)
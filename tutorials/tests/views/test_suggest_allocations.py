@@ -0,0 +1,43 @@
+"""Tests for the suggest_allocations view."""
+from datetime import time
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from tutorials.models import Tutor, Schedule
+
+
+class SuggestAllocationsTest(TestCase):
+
+    fixtures = ['tutorials/tests/fixtures/default_user.json',
+                'tutorials/tests/fixtures/lesson_requests.json']
+
+    def setUp(self):
+        self.admin_user = get_user_model().objects.get(username='@johndoe')
+        self.tutor_user = get_user_model().objects.get(username='@janedoe')
+        self.url = reverse('suggest_allocations')
+
+    def test_non_admin_forbidden(self):
+        self.client.force_login(self.tutor_user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+
+    def test_lists_requests_without_a_suitable_tutor(self):
+        self.client.force_login(self.admin_user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'lesson_requests/suggest_allocations.html')
+        self.assertEqual(response.context['suggestions'], [])
+        self.assertEqual([r.pk for r in response.context['unmatched']], [2])
+        self.assertContains(response, "No allocations can be suggested")
+
+    def test_suggestions_post_to_batch_allocation(self):
+        Tutor.objects.create(user=self.tutor_user, subjects='Java')
+        Schedule.objects.create(user=self.tutor_user, day_of_week='Wednesday', start_time=time(9), end_time=time(11))
+        self.client.force_login(self.admin_user)
+        response = self.client.get(self.url)
+        suggestion = response.context['suggestions'][0]
+        self.assertEqual(suggestion['lesson_request'].pk, 2)
+        self.assertEqual(suggestion['tutor'], self.tutor_user)
+        self.assertEqual(suggestion['start_time'], '09:00')
+        self.assertContains(response, f'action="{reverse("batch_allocate_requests")}"')
+        self.assertContains(response, 'name="start_time_2" value="09:00"')
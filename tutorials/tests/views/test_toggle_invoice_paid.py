@@ -1,7 +1,8 @@
 from django.test import TestCase
 from django.urls import reverse
 from django.contrib.auth import get_user_model
-from tutorials.models import Invoice
+from tutorials.invoices import unpaid_invoice_count
+from tutorials.models import Invoice, InvoiceSummary
 
 class ToggleInvoicePaidTest(TestCase):
 
@@ -25,6 +26,14 @@ class ToggleInvoicePaidTest(TestCase):
         self.assertRedirects(response, reverse('admin_view_requests'))
         self.assertEqual(self.invoice.is_paid, not current_is_paid)
 
+    def test_toggle_invoice_paid_updates_unpaid_count(self):
+        student = self.invoice.lesson_request.student_id
+        self.assertEqual(unpaid_invoice_count(student), 1)
+        self.client.get(self.url)
+        self.assertEqual(InvoiceSummary.objects.get(student=student).unpaid_count, 0)
+        self.client.get(self.url)
+        self.assertEqual(InvoiceSummary.objects.get(student=student).unpaid_count, 1)
+
     def test_toggle_invoice_paid_not_authenticated(self):
         self.client.logout()
         response = self.client.get(self.url)
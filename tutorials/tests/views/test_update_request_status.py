@@ -1,11 +1,17 @@
 """Tests for the update_request_status view with decorators @login_required and @is_admin."""
 
-from datetime import datetime, time, timedelta
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.contrib.messages import get_messages
-from tutorials.models import LessonRequest, AllocatedLesson
+from tutorials.models import LessonRequest, AllocatedLesson, TermCalendar, TermExclusion
+from tutorials.pricing import pricing_rules
+from tutorials.recurrence import TERM_CALENDAR_VERSION, clear_term_calendar_cache, refresh_term_calendars, term_calendars
+from tutorials.versions import bump_version
 
 class UpdateRequestStatusTest(TestCase):
 
@@ -76,6 +82,20 @@ class UpdateRequestStatusTest(TestCase):
         messages = list(get_messages(response.wsgi_request))
         self.assertTrue(any("You must assign a tutor before allocating the lesson." in str(m) for m in messages))
 
+    def test_allocation_rejects_a_user_who_is_not_a_tutor(self):
+        self.client.login(username='@johndoe', password='Password123')
+        for tutor_id in (self.student_user.id, self.admin_user.id, 999, 'abc'):
+            self.valid_post_data['lesson_requests_as_tutor'] = tutor_id
+            for data in (self.valid_post_data, {**self.valid_post_data, 'status': 'unallocated'},
+                         {**self.valid_post_data, 'preview': '1'}):
+                response = self.client.post(self.url, data)
+                self.assertEqual(response.status_code, 200)
+                messages = list(get_messages(response.wsgi_request))
+                self.assertTrue(any("Selected user is not a tutor." in str(m) for m in messages))
+        lesson_request = LessonRequest.objects.get(pk=self.lesson_request.pk)
+        self.assertEqual(lesson_request.tutor_id, self.tutor_user)
+        self.assertEqual(AllocatedLesson.objects.filter(lesson_request=lesson_request).count(), 3)
+
     def test_allocation_missing_start_time(self):
         self.valid_post_data.pop('start_time')
         self.client.login(username='@johndoe', password='Password123')
@@ -131,4 +151,205 @@ class UpdateRequestStatusTest(TestCase):
 
         # Verify success message
         messages = list(get_messages(response.wsgi_request))
-        self.assertTrue(any("Allocated lessons have been deleted." in str(m) for m in messages))
\ No newline at end of file
+        self.assertTrue(any("Allocated lessons have been deleted." in str(m) for m in messages))
+
+    def test_allocation_writes_lessons_in_a_constant_number_of_queries(self):
+        self.client.login(username='@johndoe', password='Password123')
+        refresh_term_calendars()
+        term_calendars()  # Load the term calendar cache so it is not counted
+        pricing_rules()  # Likewise the pricing rules, which price the allocation preview
+        # Checking the term calendar and pricing rule versions takes one query each, and saving the
+        # request and syncing its lessons each invalidate dashboards, with one query
+        with self.assertNumQueries(18):
+            self.client.post(self.url, self.valid_post_data)
+        weekly_count = AllocatedLesson.objects.filter(lesson_request=self.lesson_request).count()
+
+        self.lesson_request.frequency = 'Monthly'
+        self.lesson_request.save()
+        # The monthly dates that are also weekly ones keep their lessons, renumbered with one more UPDATE,
+        # and the dashboards were already invalidated by the save above in this transaction
+        with self.assertNumQueries(17):
+            self.client.post(self.url, self.valid_post_data)
+        monthly_count = AllocatedLesson.objects.filter(lesson_request=self.lesson_request).count()
+
+        self.assertGreater(weekly_count, monthly_count)
+
+    def test_allocation_replaces_existing_lessons(self):
+        self.client.login(username='@johndoe', password='Password123')
+        self.client.post(self.url, self.valid_post_data)
+        self.client.post(self.url, self.valid_post_data)
+        lessons = AllocatedLesson.objects.filter(lesson_request=self.lesson_request).order_by('occurrence')
+        self.assertEqual(
+            list(lessons.values_list('occurrence', flat=True)),
+            list(range(1, lessons.count() + 1))
+        )
+        self.assertTrue(all(lesson.time == time(10, 0) for lesson in lessons))
+
+    def test_allocation_with_conflicting_lessons_writes_nothing(self):
+        other_request = LessonRequest.objects.get(pk=2)
+        AllocatedLesson.objects.create(
+            lesson_request=other_request,
+            occurrence=1,
+            date=datetime(2024, 9, 9).date(),
+            time=time(10, 30),
+            language=other_request.language,
+            student_id=other_request.student_id,
+            tutor_id=self.tutor_user,
+        )
+        existing_ids = set(AllocatedLesson.objects.filter(lesson_request=self.lesson_request).values_list('id', flat=True))
+
+        self.client.login(username='@johndoe', password='Password123')
+        response = self.client.post(self.url, self.valid_post_data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['conflicts'], [datetime(2024, 9, 9).date()])
+        self.assertContains(response, '2024-09-09')
+        self.assertEqual(
+            set(AllocatedLesson.objects.filter(lesson_request=self.lesson_request).values_list('id', flat=True)),
+            existing_ids
+        )
+        messages = list(get_messages(response.wsgi_request))
+        self.assertTrue(any("@janedoe is already booked on 2024-09-09." in str(m) for m in messages))
+
+    def test_allocation_outside_availability_warns(self):
+        self.client.login(username='@johndoe', password='Password123')
+        response = self.client.post(self.url, self.valid_post_data, follow=True)
+        messages = list(get_messages(response.wsgi_request))
+        self.assertTrue(any("outside @janedoe's availability" in str(m) for m in messages))
+
+    def test_allocation_with_invalid_start_time(self):
+        self.valid_post_data['start_time'] = '25:00'
+        self.client.login(username='@johndoe', password='Password123')
+        response = self.client.post(self.url, self.valid_post_data)
+        self.assertEqual(response.status_code, 200)
+        messages = list(get_messages(response.wsgi_request))
+        self.assertTrue(any("Start time must be in HH:MM format." in str(m) for m in messages))
+
+    def test_preview_shows_dates_conflicts_and_amount_without_writing(self):
+        other_request = LessonRequest.objects.get(pk=2)
+        AllocatedLesson.objects.create(
+            lesson_request=other_request,
+            occurrence=1,
+            date=datetime(2024, 9, 9).date(),
+            time=time(10, 0),
+            language=other_request.language,
+            student_id=other_request.student_id,
+            tutor_id=self.tutor_user,
+        )
+        self.valid_post_data['preview'] = '1'
+        self.client.login(username='@johndoe', password='Password123')
+        # Start the shared versions, which would otherwise be written to the cache on first use
+        refresh_term_calendars()
+        pricing_rules()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, self.valid_post_data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any(
+            query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE')) and 'django_session' not in query['sql']
+            for query in queries.captured_queries
+        ))
+        preview = response.context['preview']
+        self.assertEqual(len(preview['dates']), 17)
+        self.assertEqual(preview['conflicts'], [datetime(2024, 9, 9).date()])
+        self.assertEqual(preview['amount'], Decimal('425.00'))
+        self.assertContains(response, 'Allocation Preview')
+        self.assertContains(response, 'Tutor already booked')
+        self.assertContains(response, 'value="10:00"')
+        self.assertEqual(LessonRequest.objects.get(pk=self.lesson_request.pk).tutor_id, self.tutor_user)
+        self.assertEqual(AllocatedLesson.objects.filter(lesson_request=self.lesson_request).count(), 3)
+
+    def test_preview_uses_term_calendars_changed_by_another_process(self):
+        refresh_term_calendars()
+        term_calendars()
+        self.addCleanup(clear_term_calendar_cache)
+        # bulk_create sends no signals; another process saving the calendar would bump the shared version
+        calendar = TermCalendar.objects.bulk_create([TermCalendar(
+            term='Sept-Christmas', year=2024, start_date=date(2024, 9, 2), end_date=date(2024, 12, 20)
+        )])[0]
+        TermExclusion.objects.bulk_create([TermExclusion(
+            calendar=calendar, start_date=date(2024, 10, 28), end_date=date(2024, 11, 1), description='Half term'
+        )])
+        bump_version(TERM_CALENDAR_VERSION)
+        self.valid_post_data['preview'] = '1'
+        self.client.login(username='@johndoe', password='Password123')
+        response = self.client.post(self.url, self.valid_post_data)
+        self.assertNotIn(date(2024, 10, 28), response.context['preview']['dates'])
+        self.assertEqual(len(response.context['preview']['dates']), 15)
+
+    def test_preview_with_unallocated_status_writes_nothing(self):
+        self.valid_post_data['status'] = 'unallocated'
+        self.valid_post_data['preview'] = '1'
+        self.client.login(username='@johndoe', password='Password123')
+        response = self.client.post(self.url, self.valid_post_data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['preview']['dates']), 17)
+        lesson_request = LessonRequest.objects.get(pk=self.lesson_request.pk)
+        self.assertEqual(lesson_request.status, 'allocated')
+        self.assertEqual(lesson_request.last_update_token, self.lesson_request.last_update_token)
+        self.assertEqual(AllocatedLesson.objects.filter(lesson_request=self.lesson_request).count(), 3)
+
+    def test_preview_requires_a_tutor_and_start_time(self):
+        self.valid_post_data['preview'] = '1'
+        self.valid_post_data['start_time'] = ''
+        self.client.login(username='@johndoe', password='Password123')
+        response = self.client.post(self.url, self.valid_post_data)
+
+        self.assertIsNone(response.context['preview'])
+        messages = list(get_messages(response.wsgi_request))
+        self.assertTrue(any("You must provide a start time to preview the allocation." in str(m) for m in messages))
+
+    def test_reallocation_with_new_tutor_and_time_keeps_lesson_ids(self):
+        self.client.login(username='@johndoe', password='Password123')
+        self.client.post(self.url, self.valid_post_data)
+        lesson_ids = list(
+            AllocatedLesson.objects.filter(lesson_request=self.lesson_request).order_by('occurrence').values_list('id', flat=True)
+        )
+
+        other_tutor = get_user_model().objects.create_user(
+            username='@othertutor', first_name='Other', last_name='Tutor',
+            email='othertutor@example.org', password='Password123', role='tutor'
+        )
+        self.valid_post_data['lesson_requests_as_tutor'] = other_tutor.id
+        self.valid_post_data['start_time'] = '15:00'
+        self.client.post(self.url, self.valid_post_data)
+
+        lessons = AllocatedLesson.objects.filter(lesson_request=self.lesson_request).order_by('occurrence')
+        self.assertEqual(list(lessons.values_list('id', flat=True)), lesson_ids)
+        self.assertTrue(all(lesson.tutor_id == other_tutor and lesson.time == time(15, 0) for lesson in lessons))
+
+    def test_form_carries_an_update_token(self):
+        self.client.login(username='@johndoe', password='Password123')
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.context['update_token']), 32)
+        self.assertContains(response, f'name="update_token" value="{response.context["update_token"]}"')
+
+    def test_repeated_submission_is_only_applied_once(self):
+        self.client.login(username='@johndoe', password='Password123')
+        data = dict(self.valid_post_data, update_token='a' * 32)
+        self.client.post(self.url, data)
+        lesson_ids = set(AllocatedLesson.objects.filter(lesson_request=self.lesson_request).values_list('id', flat=True))
+
+        # Resubmitting the same form, even with different values, changes nothing
+        data['start_time'] = '15:00'
+        with self.assertNumQueries(6):
+            response = self.client.post(self.url, data)
+        self.assertRedirects(response, reverse('admin_view_requests'))
+        lessons = AllocatedLesson.objects.filter(lesson_request=self.lesson_request)
+        self.assertEqual(set(lessons.values_list('id', flat=True)), lesson_ids)
+        self.assertTrue(all(lesson.time == time(10, 0) for lesson in lessons))
+        messages = list(get_messages(response.wsgi_request))
+        self.assertTrue(any("This update has already been applied." in str(m) for m in messages))
+
+    def test_failed_submission_can_be_retried_with_the_same_token(self):
+        self.client.login(username='@johndoe', password='Password123')
+        data = dict(self.valid_post_data, update_token='b' * 32, start_time='25:00')
+        response = self.client.post(self.url, data)
+        self.assertEqual(response.context['update_token'], 'b' * 32)
+
+        data['start_time'] = '15:00'
+        self.client.post(self.url, data)
+        lessons = AllocatedLesson.objects.filter(lesson_request=self.lesson_request)
+        self.assertTrue(all(lesson.time == time(15, 0) for lesson in lessons))
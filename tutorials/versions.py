@@ -0,0 +1,27 @@
+"""Version stamps kept in the shared cache, so that every process can tell when its own copy of something is stale."""
+from time import time_ns
+from django.core.cache import cache
+
+
+def current_version(key):
+    """
+    Return the version stored under key, starting a new one if there is none.
+
+    A missing version starts from the current time rather than from zero, so
+    that once it is evicted or bumped, anything tagged with the old version
+    is never taken to be current again.
+    """
+
+    version = cache.get(key)
+    if version is None:
+        version = time_ns()
+        if not cache.add(key, version, None):
+            # Another process started a version first
+            version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    """Make the version stored under key stale; a new one is started on next use."""
+
+    cache.delete(key)
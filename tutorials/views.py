@@ -1,28 +1,91 @@
-from datetime import datetime, timedelta
+from pathlib import Path
+from secrets import token_urlsafe
+from uuid import uuid4
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import login, logout, get_user_model
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.core.exceptions import ImproperlyConfigured
-from django.http import HttpResponseNotAllowed
+from django.core.exceptions import ImproperlyConfigured, PermissionDenied
+from django.http import FileResponse, Http404, HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
 from django.shortcuts import redirect, render, get_object_or_404, get_object_or_404, get_object_or_404
+from django.template.loader import render_to_string
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_POST, require_safe
 from django.views import View
 from django.views.generic.edit import FormView, UpdateView
 from django.views.generic.list import ListView
 from django.views.generic.base import TemplateView
 from django.urls import reverse
-from django.db.models import Prefetch
-from tutorials.forms import LogInForm, PasswordForm, UserForm, SignUpForm, InvoiceForm
+from django.utils.timezone import localdate
+from django.db import transaction
+from django.db.models import Count, Max, Prefetch
+from tutorials.forms import LogInForm, PasswordForm, UserForm, SignUpForm, InvoiceForm, LessonRequestFilterForm
 from tutorials.helpers import login_prohibited
-from tutorials.models import Invoice
+from tutorials.models import Invoice, Job, CalendarFeed
 from .models import User, Tutor, Schedule
 from .forms import ScheduleForm
 from .models import LessonRequest, AllocatedLesson
 from .forms import LessonRequestForm
+from .recurrence import get_term_date_range
+from .allocation import format_dates, parse_start_time, preview_allocation, sync_allocated_lessons
+from .matching import propose_allocations
+from .jobs import enqueue
+from .pagination import keyset_page
+from .overview import cached_admin_overview
+from .dashboard_cache import cached_dashboard_fragment, csrf_cache_key
+from .invoices import delete_invoices, set_invoices_paid, unpaid_invoice_count
+from .pricing import pricing_rules, projected_invoice_amount
+from .ical import lesson_feed
+from .lesson_calendar import VIEWS as CALENDAR_VIEWS, calendar_window, group_by_day, parse_anchor
+from .request_search import cached_request_facets, filter_lesson_requests, legacy_filter_params
+from .exports import EXPORTS, FORMATS, export_row_count
+from .api import LESSON_FIELDS, LESSON_REQUEST_FIELDS, INVOICE_FIELDS, api_listing
 from .helpers import *
 
 
+def user_lessons(user):
+    """Return the allocated lessons a user takes or teaches, with their request, student and tutor."""
+
+    # The lesson tables show each lesson's request, student and tutor, so join them in up front
+    lessons = AllocatedLesson.objects.select_related('lesson_request__student_id', 'lesson_request__tutor_id')
+    if user.role == 'student':
+        return lessons.filter(student_id=user)
+    if user.role == 'tutor':
+        return lessons.filter(tutor_id=user)
+    return lessons
+
+
+def lesson_page(request, lessons, descending=False):
+    """Return one keyset-paginated page of lessons in (date, time, id) order and the next page's cursor."""
+
+    try:
+        return keyset_page(lessons, ('date', 'time', 'id'), request.GET.get('after'),
+                           size=settings.LESSON_PAGE_SIZE, descending=descending)
+    except ValueError:
+        # A malformed cursor falls back to the first page
+        return keyset_page(lessons, ('date', 'time', 'id'), size=settings.LESSON_PAGE_SIZE, descending=descending)
+
+
+def dashboard_lesson_table(request):
+    """Return the rendered table of the current user's upcoming lessons, from the cache if possible."""
+
+    def render_table():
+        allocated_lessons, next_cursor = lesson_page(request, user_lessons(request.user).filter(date__gte=localdate()))
+        return render_to_string('partials/dashboard_lessons.html', {
+            'user': request.user,
+            'allocated_lessons': allocated_lessons,
+            'next_cursor': next_cursor,
+        }, request=request)
+
+    get_token(request)
+    return cached_dashboard_fragment(
+        request.user.id, 'lessons', render_table, localdate(), request.GET.get('after', ''), csrf_cache_key(request),
+    )
+
+
 @login_required
 def dashboard(request):
     """Display the current user's dashboard."""
@@ -30,43 +93,140 @@ def dashboard(request):
     current_user = request.user
 
     if current_user.role == 'student':
-        # Fetch lessons allocated to the current student
-        allocated_lessons = AllocatedLesson.objects.filter(student_id=current_user)
-        invoices = Invoice.objects.filter(lesson_request_id__student_id=current_user)
-
-        # Count unpaid invoices
-        invoice_actions_needed = invoices.filter(is_paid=False).count()
+        # The lesson table and invoice badge are cached per user until their lessons or invoices change
+        lesson_table = dashboard_lesson_table(request)
+        invoice_actions_needed = cached_dashboard_fragment(
+            current_user.id, 'unpaid_invoices',
+            lambda: unpaid_invoice_count(current_user),
+        )
 
         context = {
             'user': current_user,
-            'allocated_lessons': allocated_lessons,
+            'lesson_table': lesson_table,
             'invoice_actions_needed': invoice_actions_needed
         }
 
     elif current_user.role == 'tutor':
-        # Fetch lessons allocated to the current tutor
-        allocated_lessons = AllocatedLesson.objects.filter(tutor_id=current_user)
+        lesson_table = dashboard_lesson_table(request)
 
         # Tutors don't need invoice_actions_needed logic
         context = {
             'user': current_user,
-            'allocated_lessons': allocated_lessons
+            'lesson_table': lesson_table,
         }
 
-    else:
-        # If the user is an admin or another role
-        # Show all allocated lessons or apply custom logic
-        allocated_lessons = AllocatedLesson.objects.all()
+    elif current_user.role == 'admin':
+        # Admins see summary figures rather than individual lessons
+        context = {
+            'user': current_user,
+            'overview': cached_admin_overview(),
+        }
 
-        # Admins or other roles don't need invoice_actions_needed logic
+    else:
+        # Other roles don't see a lesson table or need invoice_actions_needed logic
         context = {
             'user': current_user,
-            'allocated_lessons': allocated_lessons
         }
 
     return render(request, 'dashboard.html', context)
 
 
+@login_required
+def past_lessons(request):
+    """Display the current user's past lessons, most recent first."""
+
+    lessons, next_cursor = lesson_page(request, user_lessons(request.user).filter(date__lt=localdate()), descending=True)
+    return render(request, 'past_lessons.html', {
+        'lessons': lessons,
+        'next_cursor': next_cursor,
+    })
+
+
+@login_required
+def lesson_calendar(request):
+    """Display the current user's lessons for one week or month."""
+
+    view = request.GET.get('view', 'week')
+    if view not in CALENDAR_VIEWS:
+        view = 'week'
+    today = localdate()
+    anchor = parse_anchor(request.GET.get('date'), today)
+    start, end, previous_anchor, next_anchor = calendar_window(view, anchor)
+
+    # One range query over the (user, date) indexes, already in the order the days are walked in
+    lessons = user_lessons(request.user).filter(date__range=(start, end)).order_by('date', 'time', 'id')
+    return render(request, 'lesson_calendar.html', {
+        'view': view,
+        'anchor': anchor,
+        'today': today,
+        'start': start,
+        'end': end,
+        'weeks': group_by_day(lessons, start, end),
+        'previous_anchor': previous_anchor,
+        'next_anchor': next_anchor,
+    })
+
+
+def calendar_feed_for(user):
+    """Return the user's calendar feed, creating it with a new secret token if they have none."""
+
+    feed, _ = CalendarFeed.objects.get_or_create(user=user, defaults={'token': token_urlsafe(32)})
+    return feed
+
+
+@login_required
+def calendar_subscription(request):
+    """Show the address of the current user's calendar feed, and let them replace its token."""
+
+    feed = calendar_feed_for(request.user)
+    if request.method == 'POST':
+        # A new token stops anyone who has the old address from reading the feed
+        feed.token = token_urlsafe(32)
+        feed.save(update_fields=['token'])
+        messages.success(request, "Your calendar feed has a new address. Update your calendar subscriptions.")
+        return redirect('calendar_subscription')
+
+    return render(request, 'calendar_subscription.html', {
+        'feed_url': request.build_absolute_uri(reverse('calendar_feed', kwargs={'token': feed.token})),
+    })
+
+
+@require_safe
+def calendar_feed(request, token):
+    """
+    Serve a user's lessons as an iCalendar feed, authenticated by the token in the URL.
+
+    The feed carries an ETag and Last-Modified taken from the number of
+    lessons and the latest change to them, their requests, their students
+    and tutors and the feed's owner, whose details all appear in the feed,
+    so calendar clients that poll it get a 304 until something changes. The
+    body is streamed.
+    """
+
+    feed = get_object_or_404(CalendarFeed.objects.select_related('user'), token=token)
+    lessons = user_lessons(feed.user).order_by('date', 'time', 'id')
+
+    state = lessons.aggregate(
+        count=Count('id'),
+        lessons=Max('updated_at'),
+        requests=Max('lesson_request__updated_at'),
+        students=Max('lesson_request__student_id__updated_at'),
+        tutors=Max('lesson_request__tutor_id__updated_at'),
+    )
+    count = state.pop('count')
+    last_modified = max(value for value in [feed.created_at, feed.user.updated_at, *state.values()] if value)
+    etag = quote_etag(f"{count}-{last_modified.timestamp():.6f}")
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(last_modified.timestamp()))
+    if response is None:
+        name = f"{feed.user.first_name} {feed.user.last_name}'s lessons"
+        response = StreamingHttpResponse(lesson_feed(lessons, name, request.get_host()),
+                                         content_type='text/calendar; charset=utf-8')
+    response.headers['ETag'] = etag
+    response.headers['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+
 @login_prohibited
 def home(request):
     """Display the application's start/home screen."""
@@ -234,27 +394,67 @@ def student_view_invoices(request):
     return render(request, 'student_view_invoices.html', {'invoices': invoices})
 
 
+# Columns the admin request list can be sorted by, each ending in 'id' so that rows are ordered uniquely
+REQUEST_SORTS = {
+    'date_created': ('date_created', 'id'),
+    'status': ('status', 'id'),
+    'language': ('language', 'id'),
+    'student': ('student_id__last_name', 'student_id__first_name', 'id'),
+}
+DEFAULT_REQUEST_SORT = '-date_created'
+
+
+def request_sort(request):
+    """Return the (sort, fields, descending) of the admin request list, as given by ?sort=, e.g. 'language' or '-language'."""
+
+    sort = request.GET.get('sort') or DEFAULT_REQUEST_SORT
+    if sort.lstrip('-') not in REQUEST_SORTS:
+        sort = DEFAULT_REQUEST_SORT
+    return sort, REQUEST_SORTS[sort.lstrip('-')], sort.startswith('-')
+
+
 # Admin: View All Submitted Requests
 @login_required
 @is_admin
 def admin_view_requests(request):
-    filter = request.GET.get('filter') or ""
-    invoices = Invoice.objects.all()
-    requests = []
-    if filter in ["allocated", "unallocated"]:
-        requests = LessonRequest.objects.filter(status=filter)
-    elif filter == "paid":
-        requests = LessonRequest.objects.filter(invoice__is_paid=True)
-    elif filter == "unpaid":
-        requests = LessonRequest.objects.filter(invoice__is_paid=False)
-    elif filter == "invoice_generated":
-        requests = LessonRequest.objects.filter(invoice__isnull=False)
-    elif filter == "no_invoice_generated":
-        requests = LessonRequest.objects.filter(invoice__isnull=True)
-    else:
-        requests = LessonRequest.objects.all()
+    params = legacy_filter_params(request.GET)
+    filter_form = LessonRequestFilterForm(params)
+    # Invalid values are reported on the form; the filters that are valid still apply
+    filter_form.is_valid()
+    filter_form.show_counts(cached_request_facets())
+    requests = filter_lesson_requests(LessonRequest.objects.all(), filter_form.cleaned_data)
+
+    # Each row shows its student, tutor and invoices, so load them with the requests
+    requests = requests.select_related('student_id', 'tutor_id').prefetch_related('invoice')
+    sort, fields, descending = request_sort(request)
+    try:
+        requests, next_cursor = keyset_page(requests, fields, request.GET.get('after'),
+                                            size=settings.ADMIN_REQUEST_PAGE_SIZE, descending=descending)
+    except ValueError:
+        # A malformed cursor falls back to the first page
+        requests, next_cursor = keyset_page(requests, fields, size=settings.ADMIN_REQUEST_PAGE_SIZE,
+                                            descending=descending)
+    for name in ('sort', 'after'):
+        params.pop(name, None)
+    return render(request, 'lesson_requests/admin_view_requests.html', {
+        'requests': requests,
+        'filter_form': filter_form,
+        # The filters as a query string, for the sort and page links to carry along
+        'filter_query': params.urlencode(),
+        'sort': sort,
+        # The sort each column header links to: ascending, or descending if the list is already sorted by it
+        'sort_links': {key: f'-{key}' if sort == key else key for key in REQUEST_SORTS},
+        'next_cursor': next_cursor,
+    })
+
 
-    return render(request, 'lesson_requests/admin_view_requests.html', {'requests': requests, 'invoices': invoices, 'filter': filter})
+def find_tutor(tutors, tutor_id):
+    """Return the tutor in tutors with the given id, or None if there is none or the id is not a number."""
+
+    try:
+        return tutors.filter(id=tutor_id).first()
+    except ValueError:
+        return None
 
 
 # Admin: Update Request Status
@@ -263,120 +463,271 @@ def admin_view_requests(request):
 def update_request_status(request, pk):
     lesson_request = get_object_or_404(LessonRequest, pk=pk)
     tutors = User.objects.filter(role = "tutor")
+    conflicts = []
+    preview = None
+    # Each rendering of the form carries a token so that a repeated submission is only applied once
+    update_token = request.POST.get('update_token') or uuid4().hex
 
     if request.method == 'POST':
         new_status = request.POST.get('status')
         selected_tutor_id = request.POST.get('lesson_requests_as_tutor')
         start_time_str = request.POST.get('start_time')
 
+        if 'preview' in request.POST:
+            # A preview is a dry run of the proposed allocation, whatever the selected status, and writes nothing
+            if not selected_tutor_id:
+                messages.error(request, "You must assign a tutor to preview the allocation.")
+            elif not start_time_str:
+                messages.error(request, "You must provide a start time to preview the allocation.")
+            else:
+                tutor = find_tutor(tutors, selected_tutor_id)
+                try:
+                    start_time = parse_start_time(start_time_str)
+                except ValueError:
+                    start_time = None
+                    messages.error(request, "Start time must be in HH:MM format.")
+                if tutor is None:
+                    messages.error(request, "Selected user is not a tutor.")
+                elif start_time is not None:
+                    try:
+                        preview = preview_allocation(lesson_request, tutor, start_time)
+                        conflicts = preview['conflicts']
+                    except ValueError as error:
+                        messages.error(request, f"Cannot allocate this lesson request: {error}.")
         # Validate that a tutor is selected if allocating
-        if new_status == 'allocated' and not selected_tutor_id:
+        elif new_status == 'allocated' and not selected_tutor_id:
             messages.error(request, "You must assign a tutor before allocating the lesson.")
         elif new_status == 'allocated' and not start_time_str:
             messages.error(request, "You must provide a start time before allocating the lesson.")
         else:
-            # If status is changing from allocated to unallocated delete allocated lessons
-            if lesson_request.status == 'allocated' and new_status == 'unallocated':
-                AllocatedLesson.objects.filter(lesson_request_id=lesson_request).delete()
-                messages.success(request, "Allocated lessons have been deleted.")
-
-            # Assign the tutor if provided
-            if selected_tutor_id:
-                tutor = User.objects.get(id=selected_tutor_id)
-                lesson_request.tutor_id = tutor 
-                messages.success(request, f"Tutor {tutor.username} assigned successfully.")
-
-            # Update the status
-            lesson_request.status = new_status
-            lesson_request.save()
-
-            # Create allocated lessons if status is allocated
-            if new_status == 'allocated':
-                AllocatedLesson.objects.filter(lesson_request=lesson_request).delete()
-                term_start_date, term_end_date = get_term_date_range(lesson_request.term, lesson_request.date_created)
-
-                # Calculate lesson frequency
-                frequency_mapping = {
-                    'Weekly': timedelta(weeks=1),
-                    'Bi-Weekly': timedelta(weeks=2),
-                    'Monthly': timedelta(weeks=4),
-                }
-                delta = frequency_mapping.get(lesson_request.frequency)
-
-                if not delta:
-                    messages.error(request, "Invalid frequency specified for the lesson request.")
+            with transaction.atomic():
+                # Lock the request so that concurrent updates of it are applied one after the other
+                lesson_request = LessonRequest.objects.select_for_update().get(pk=pk)
+                if lesson_request.last_update_token == update_token:
+                    messages.info(request, "This update has already been applied.")
                     return redirect('admin_view_requests')
-                
-                # Loop to create lessons within the term date range
-                lesson_date = term_start_date
-                occurrence = 1
-
-                while lesson_date <= term_end_date:
-                    # Adjust lesson_date to match the day_of_the_week
-                    while lesson_date.weekday() != day_to_num(lesson_request.day_of_the_week):
-                        lesson_date += timedelta(days=1)
-
-                    if lesson_date > term_end_date:
-                        break
-                
-                # Create an AllocatedLesson instance
-                    AllocatedLesson.objects.create(
-                        lesson_request=lesson_request,
-                        occurrence=occurrence,
-                        date=lesson_date,
-                        time=datetime.strptime(request.POST.get('start_time'), '%H:%M').time(),
-                        language=lesson_request.language,
-                        student_id=lesson_request.student_id,
-                        tutor_id=lesson_request.tutor_id,
-                    )
-                    occurrence += 1
-                    lesson_date += delta
-
-            # Redirect with a success message
-            messages.success(request, f"Lesson request status updated to '{new_status}'.")
-            return redirect('admin_view_requests')
+
+                # Assign the tutor if provided, locking them so that their bookings are checked one at a time
+                tutor = None
+                if selected_tutor_id:
+                    tutor = find_tutor(tutors.select_for_update(), selected_tutor_id)
+                if selected_tutor_id and tutor is None:
+                    messages.error(request, "Selected user is not a tutor.")
+                else:
+                    # If status is changing from allocated to unallocated delete allocated lessons
+                    deallocating = lesson_request.status == 'allocated' and new_status == 'unallocated'
+
+                    if tutor:
+                        lesson_request.tutor_id = tutor
+
+                    # Update the status
+                    lesson_request.status = new_status
+                    lesson_request.last_update_token = update_token
+
+                    # Create allocated lessons if status is allocated
+                    if new_status == 'allocated':
+                        try:
+                            start_time = parse_start_time(start_time_str)
+                        except ValueError:
+                            start_time = None
+                            messages.error(request, "Start time must be in HH:MM format.")
+
+                        if start_time is not None:
+                            # Work out the dates and check them against the tutor's lessons before writing
+                            try:
+                                preview = preview_allocation(lesson_request, tutor, start_time)
+                            except ValueError as error:
+                                messages.error(request, f"Cannot allocate this lesson request: {error}.")
+                                return redirect('admin_view_requests')
+                            conflicts = preview['conflicts']
+
+                            if conflicts:
+                                messages.error(request, f"{tutor.username} is already booked on "
+                                                        f"{format_dates(conflicts)}. Choose another tutor or start time.")
+                            else:
+                                if not preview['available']:
+                                    messages.warning(request,
+                                                     f"The lessons are outside {tutor.username}'s availability.")
+
+                                # Apply only the differences from the current allocation
+                                lesson_request.save()
+                                sync_allocated_lessons([(lesson_request, start_time, preview['dates'])])
+                                messages.success(request, f"Tutor {tutor.username} assigned successfully.")
+                                messages.success(request, f"Lesson request status updated to '{new_status}'.")
+                                return redirect('admin_view_requests')
+                    else:
+                        lesson_request.save()
+                        if deallocating:
+                            AllocatedLesson.objects.filter(lesson_request=lesson_request).delete()
+                            messages.success(request, "Allocated lessons have been deleted.")
+                        if tutor:
+                            messages.success(request, f"Tutor {tutor.username} assigned successfully.")
+
+                        # Redirect with a success message
+                        messages.success(request, f"Lesson request status updated to '{new_status}'.")
+                        return redirect('admin_view_requests')
 
     return render(request, 'lesson_requests/update_request_status.html', {
         'lesson_request': lesson_request,
-        'tutors': tutors
+        'tutors': tutors,
+        'conflicts': conflicts,
+        'preview': preview,
+        'start_time': request.POST.get('start_time', ''),
+        'update_token': update_token,
     })
 
 
-def day_to_num(day):
-    days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    return days.index(day)
+# Admin: Allocate many lesson requests at once
+@login_required
+@is_admin
+def batch_allocate_requests(request):
+    if request.method == 'POST':
+        assignments = [
+            (lesson_request_id, request.POST.get(f'tutor_{lesson_request_id}'),
+             request.POST.get(f'start_time_{lesson_request_id}'))
+            for lesson_request_id in request.POST.getlist('lesson_request_ids')
+        ]
+        if not assignments:
+            messages.error(request, "Select at least one lesson request to allocate.")
+        else:
+            # Allocation runs in the background worker; the page polls the job until it finishes
+            job = enqueue('allocate_lesson_requests', {'assignments': assignments}, user=request.user,
+                          idempotency_key=request.POST.get('idempotency_key') or None)
+            messages.success(request, f"Allocation of {len(assignments)} lesson requests queued.")
+            return redirect(f"{reverse('batch_allocate_requests')}?job={job.pk}")
+
+    job = None
+    report = None
+    if request.GET.get('job', '').isdigit():
+        job = get_object_or_404(Job, pk=request.GET['job'], name='allocate_lesson_requests')
+        if job.is_finished:
+            # A failed job keeps the report of the chunks it committed before failing
+            report = job.result
+
+    unallocated_requests = LessonRequest.objects.exclude(status='allocated').select_related('student_id', 'tutor_id')
+    tutors = User.objects.filter(role='tutor')
+    return render(request, 'lesson_requests/batch_allocate.html', {
+        'idempotency_key': uuid4().hex,
+        'requests': unallocated_requests,
+        'tutors': tutors,
+        'job': job,
+        'report': report,
+        'succeeded': sum(1 for result in report if result['success']) if report else 0,
+    })
 
 
-def get_term_date_range(term, date_created):
-    if not isinstance(date_created, datetime):
-        raise TypeError("date_created must be a datetime object")
+# Progress of a background job, polled by pages waiting for it to finish
+@login_required
+def job_status(request, pk):
+    job = get_object_or_404(Job, pk=pk)
+    if job.created_by_id != request.user.id and request.user.role != 'admin':
+        raise PermissionDenied
+    return JsonResponse({
+        'id': job.pk,
+        'name': job.name,
+        'status': job.status,
+        'progress': job.progress,
+        'attempts': job.attempts,
+        'finished': job.is_finished,
+        'result': job.result,
+        'error': job.error.strip().splitlines()[-1] if job.error else '',
+    })
 
-    current_year = date_created.year
-    if term == 'Sept-Christmas':
-        lower_date = datetime(current_year, 9, 1)
-        upper_date = datetime(current_year, 12, 25)
-    elif term == 'Jan-Easter':
-        lower_date = datetime(current_year, 1, 1)
-        upper_date = datetime(current_year, 4, 15)
-    elif term == 'March-June':
-        lower_date = datetime(current_year, 3, 1)
-        upper_date = datetime(current_year, 6, 30)
-    else:
-        raise ValueError(f"Unknown term: {term}")
 
-    # Ensure both are offset-naive
-    if date_created.tzinfo is not None:
-        date_created = date_created.replace(tzinfo=None)  # Remove timezone info
+# Admin: Download every lesson request, lesson or invoice as CSV or NDJSON
+@login_required
+@is_admin
+def export_data(request, name, format):
+    if name not in EXPORTS or format not in FORMATS:
+        raise Http404("Unknown export")
+    if request.method == 'POST':
+        # Large exports are written to a file by the background worker; the page polls the job until it finishes
+        job = enqueue('export_data', {'name': name, 'format': format}, user=request.user,
+                      idempotency_key=request.POST.get('idempotency_key') or None)
+        return redirect(f"{reverse('export_data', args=[name, format])}?job={job.pk}")
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD', 'POST'])
+
+    job = None
+    if request.GET.get('job', '').isdigit():
+        job = get_object_or_404(Job, pk=request.GET['job'], name='export_data')
+    elif export_row_count(name) <= settings.EXPORT_STREAM_ROWS:
+        export, content_type = FORMATS[format]
+        response = StreamingHttpResponse(export(name), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{name}-{localdate():%Y-%m-%d}.{format}"'
+        return response
+    return render(request, 'export_data.html', {
+        'idempotency_key': uuid4().hex,
+        'name': name,
+        'format': format,
+        'job': job,
+    })
 
-    if upper_date.tzinfo is not None:
-        upper_date = upper_date.replace(tzinfo=None)  # Remove timezone info
 
-    # If the term has already passed this year, set it for next year
-    if date_created > upper_date:
-        lower_date = lower_date.replace(year=current_year + 1)
-        upper_date = upper_date.replace(year=current_year + 1)
+# Admin: Download the file written by an export job
+@login_required
+@is_admin
+@require_safe
+def export_download(request, pk):
+    job = get_object_or_404(Job, pk=pk, name='export_data', status=Job.SUCCEEDED)
+    path = Path(settings.EXPORT_ROOT) / job.result['file']
+    if not path.is_file():
+        raise Http404("Export file not found")
+    _, content_type = FORMATS[job.payload['format']]
+    filename = f"{job.payload['name']}-{localdate(job.finished_at):%Y-%m-%d}.{job.payload['format']}"
+    return FileResponse(path.open('rb'), as_attachment=True, filename=filename, content_type=content_type)
+
+
+# API: The lessons the user takes or teaches
+@require_safe
+@api_login_required
+def api_lessons(request):
+    return api_listing(request, user_lessons(request.user), LESSON_FIELDS, ('date', 'time', 'id'))
+
+
+# API: The lesson requests the user made or teaches; admins see every request
+@require_safe
+@api_login_required
+def api_lesson_requests(request):
+    lesson_requests = LessonRequest.objects.all()
+    if request.user.role == 'student':
+        lesson_requests = lesson_requests.filter(student_id=request.user)
+    elif request.user.role == 'tutor':
+        lesson_requests = lesson_requests.filter(tutor_id=request.user)
+    return api_listing(request, lesson_requests, LESSON_REQUEST_FIELDS, ('id',))
+
+
+# API: The invoices for the user's lesson requests; admins see every invoice
+@require_safe
+@api_login_required
+def api_invoices(request):
+    invoices = Invoice.objects.all()
+    if request.user.role != 'admin':
+        invoices = invoices.filter(lesson_request__student_id=request.user)
+    return api_listing(request, invoices, INVOICE_FIELDS, ('id',))
 
-    return lower_date, upper_date
+
+# Admin: Suggest tutors and start times for unallocated requests
+@login_required
+@is_admin
+def suggest_allocations(request):
+    proposals, unmatched = propose_allocations()
+    lesson_requests = LessonRequest.objects.select_related('student_id').in_bulk(
+        [proposal['lesson_request_id'] for proposal in proposals] + unmatched
+    )
+    tutors = User.objects.in_bulk([proposal['tutor_id'] for proposal in proposals])
+    suggestions = [
+        {
+            'lesson_request': lesson_requests[proposal['lesson_request_id']],
+            'tutor': tutors[proposal['tutor_id']],
+            'start_time': proposal['start_time'],
+        }
+        for proposal in proposals
+    ]
+    return render(request, 'lesson_requests/suggest_allocations.html', {
+        'suggestions': suggestions,
+        'unmatched': [lesson_requests[lesson_request_id] for lesson_request_id in unmatched],
+    })
 
 
 @login_required
@@ -516,14 +867,70 @@ class TutorAvailabilityUpdateView(LoginRequiredMixin, TemplateView):
 @is_admin
 def toggle_invoice_paid(request, invoice_id):
     if request.method == 'GET':
-        invoice = get_object_or_404(Invoice, id=invoice_id)
-        invoice.is_paid = not invoice.is_paid
-        invoice.save()
+        with transaction.atomic():
+            invoice = get_object_or_404(Invoice.objects.select_for_update(), id=invoice_id)
+            invoice.is_paid = not invoice.is_paid
+            # Saving also adjusts the student's unpaid invoice count, in the same transaction
+            invoice.save()
         return redirect('admin_view_requests')
     
     return HttpResponseNotAllowed(['GET'])
 
 
+# Admin: Mark many invoices paid or unpaid, or delete them, at once
+@login_required
+@is_admin
+@require_POST
+def bulk_invoice_action(request):
+    invoice_ids = [value for value in request.POST.getlist('invoice_ids') if value.isdigit()]
+    action = request.POST.get('action')
+    if not invoice_ids:
+        messages.error(request, "Select at least one invoice.")
+    elif action == 'mark_paid':
+        messages.success(request, f"{set_invoices_paid(invoice_ids, True)} invoices marked as paid.")
+    elif action == 'mark_unpaid':
+        messages.success(request, f"{set_invoices_paid(invoice_ids, False)} invoices marked as unpaid.")
+    elif action == 'delete':
+        messages.success(request, f"{delete_invoices(invoice_ids)} invoices deleted.")
+    else:
+        messages.error(request, "Choose what to do with the selected invoices.")
+    return redirect('admin_view_requests')
+
+
+# Admin: Invoice every allocated request in a term using the pricing rules
+@login_required
+@is_admin
+def generate_term_invoices(request):
+    terms = [term for term, _ in LessonRequest.TERM_CHOICES]
+    year = localdate().year
+    if request.method == 'POST':
+        term = request.POST.get('term') or None
+        year = request.POST.get('year', '')
+        if term is not None and term not in terms:
+            messages.error(request, "Choose a valid term.")
+        elif not year.isdigit() or not 2000 <= int(year) <= 2100:
+            messages.error(request, "Choose a valid year.")
+        else:
+            # Invoicing runs in the background worker; the page polls the job until it finishes
+            job = enqueue('generate_invoices', {'term': term, 'year': int(year)}, user=request.user,
+                          idempotency_key=request.POST.get('idempotency_key') or None)
+            messages.success(request, f"Invoice generation for {term or 'every term'} of {year} queued.")
+            return redirect(f"{reverse('generate_term_invoices')}?job={job.pk}")
+
+    job = None
+    if request.GET.get('job', '').isdigit():
+        job = get_object_or_404(Job, pk=request.GET['job'], name='generate_invoices')
+    return render(request, 'generate_term_invoices.html', {
+        'idempotency_key': uuid4().hex,
+        'terms': terms,
+        'year': year,
+        'rules': pricing_rules(),
+        'default_rate': settings.LESSON_HOURLY_RATE,
+        'job': job,
+        'result': job.result if job and job.status == Job.SUCCEEDED else None,
+    })
+
+
 @login_required
 @is_admin
 def generate_invoice(request, lesson_request_id):
@@ -535,15 +942,22 @@ def generate_invoice(request, lesson_request_id):
 
     if request.method == 'POST':
         form = InvoiceForm(request.POST)
-        if invoice:
-            invoice.delete()
-
-        if form.is_valid():
-            invoice = form.save(commit=False)
-            invoice.lesson_request = lesson_request 
-            invoice.save()
-            return redirect('admin_view_requests') 
+        # Replacing the invoice and adjusting the student's unpaid invoice count happen together
+        with transaction.atomic():
+            if invoice:
+                invoice.delete()
+
+            if form.is_valid():
+                invoice = form.save(commit=False)
+                invoice.lesson_request = lesson_request
+                invoice.save()
+                return redirect('admin_view_requests')
     else:
         form = InvoiceForm(initial={'lesson_request': lesson_request, 'is_paid': False})
-    
-    return render(request, 'generate_invoice.html', {'form': form, 'lesson_request': lesson_request, 'invoice': invoice})
+
+    # Suggest the amount the pricing rules give for the lessons allocated so far
+    lesson_count = lesson_request.allocated_lessons.count()
+    suggested_amount = projected_invoice_amount(lesson_request, lesson_count) if lesson_count else None
+    return render(request, 'generate_invoice.html', {
+        'form': form, 'lesson_request': lesson_request, 'invoice': invoice, 'suggested_amount': suggested_amount,
+    })